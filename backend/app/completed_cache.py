@@ -0,0 +1,134 @@
+"""
+Per-User Cache für absolvierte LVAs (completed_lvas JOIN lvas).
+
+Die Daten ändern sich nur über PUT /profile/lvas/completed, der Endpoint ruft
+danach invalidate(user_id) auf. Geteilt von den Profile-Routes (IDs) und dem
+HybridRetriever (Namen), sync (psycopg2) und async (asyncpg-Pool) nutzbar.
+Die TTL begrenzt die Veraltung bei mehreren Worker-Prozessen (Invalidierung ist prozesslokal).
+"""
+
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Tuple
+import psycopg2
+from cachetools import TTLCache
+from .db import init_db_pool
+
+COMPLETED_CACHE_SIZE = int(os.getenv("COMPLETED_CACHE_SIZE", "10000"))
+COMPLETED_CACHE_TTL = int(os.getenv("COMPLETED_CACHE_TTL", "3600"))
+
+COMPLETED_QUERY = """
+    SELECT l.id, l.name
+    FROM completed_lvas cl
+             JOIN lvas l ON cl.lva_id = l.id
+    WHERE cl.user_id = %s
+    ORDER BY l.id
+"""
+
+
+@dataclass(frozen=True)
+class CompletedLvas:
+    """
+    Absolvierte LVAs eines Users: IDs (Profile/Eligibility) und Namen (Retriever/Prompt).
+    version ist ein Digest der IDs (gleiches Set → gleiche Version, z.B. für ETags).
+    """
+    ids: FrozenSet[int]
+    names: Tuple[str, ...]
+    version: str
+
+
+def completed_version(ids) -> str:
+    return hashlib.sha1(",".join(str(lva_id) for lva_id in sorted(ids)).encode()).hexdigest()[:16]
+
+
+class CompletedLvaCache:
+    def __init__(self, maxsize: int = COMPLETED_CACHE_SIZE, ttl: int = COMPLETED_CACHE_TTL):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        # Ein monoton steigender Zähler für alle User (keine ungebundene Map pro User):
+        # ein Load, der vor invalidate()/clear() gestartet wurde, wird nicht gespeichert.
+        # Trifft selten auch Loads anderer User, die dann nur nicht gecacht werden.
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _lookup(self, user_id: int) -> Tuple[CompletedLvas, int]:
+        with self._lock:
+            entry = self._cache.get(user_id)
+            if entry is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry, self._generation
+
+    def _store(self, user_id: int, generation: int, rows) -> CompletedLvas:
+        ids = frozenset(row[0] for row in rows)
+        entry = CompletedLvas(
+            ids=ids,
+            names=tuple(row[1] for row in rows),
+            version=completed_version(ids),
+        )
+        with self._lock:
+            if self._generation == generation:
+                self._cache[user_id] = entry
+        return entry
+
+    def get(self, user_id: int, db_url: str) -> CompletedLvas:
+        """Sync Zugriff (psycopg2), lädt bei Cache-Miss."""
+        entry, generation = self._lookup(user_id)
+        if entry is not None:
+            return entry
+
+        conn = psycopg2.connect(db_url)
+        try:
+            cur = conn.cursor()
+            cur.execute(COMPLETED_QUERY, [user_id])
+            rows = cur.fetchall()
+            cur.close()
+        finally:
+            conn.close()
+        return self._store(user_id, generation, rows)
+
+    async def aget(self, user_id: int) -> CompletedLvas:
+        """Async Zugriff (asyncpg-Pool), lädt bei Cache-Miss."""
+        entry, generation = self._lookup(user_id)
+        if entry is not None:
+            return entry
+
+        pool = await init_db_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(COMPLETED_QUERY.replace("%s", "$1"), user_id)
+        return self._store(user_id, generation, [(row["id"], row["name"]) for row in rows])
+
+    def invalidate(self, user_id: int) -> None:
+        """Nach jeder Änderung an completed_lvas des Users aufrufen."""
+        with self._lock:
+            self._cache.pop(user_id, None)
+            self._generation += 1
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            # nicht zurücksetzen: laufende Loads dürfen danach nichts Veraltetes speichern
+            self._generation += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "ttl": self._cache.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# Ein Cache pro Prozess, geteilt von Profile-Routes und HybridRetriever
+completed_lva_cache = CompletedLvaCache()
@@ -2,6 +2,7 @@ import os
 import asyncpg
 from dotenv import load_dotenv
 import ssl
+from pgvector.asyncpg import register_vector
 
 # Load environment variables
 load_dotenv(dotenv_path=".env")
@@ -13,12 +14,17 @@ pool = None
 # Create SSL context for NeonDB
 ssl_context = ssl.create_default_context()
 
+# Register the pgvector codec on every pooled connection,
+# so embeddings can be passed to asyncpg queries directly
+async def _init_connection(conn):
+    await register_vector(conn)
+
 # Initialize the asyncpg connection pool
 async def init_db_pool():
     global pool
     if pool is None:
         print("📡 Connecting to DB:", DATABASE_URL)
-        pool = await asyncpg.create_pool(DATABASE_URL, ssl=ssl_context)
+        pool = await asyncpg.create_pool(DATABASE_URL, ssl=ssl_context, init=_init_connection)
     return pool
 
 # Close the pool on shutdown
@@ -0,0 +1,121 @@
+"""
+Context Packer: packt die LVA-Liste für den LLM-Prompt in ein festes Token-Budget.
+
+Die LVAs werden nach Relevanz (similarity aus dem Retrieval) und Planungs-Priorität
+(gewünschte LVAs, Semester im idealtypischen Studienplan) gerankt. Die besten LVAs
+bekommen den vollen Eintrag inkl. Studienhandbuch-Content, die restlichen nur eine
+Zeile (Nr, Name, Typ, ECTS, Termin, Voraussetzungen). Passt auch eine Zeile nicht
+mehr ins Budget, werden die restlichen LVAs ausgelassen und gezählt.
+
+Damit bleiben Prompt-Größe, Latenz und Kosten begrenzt, auch wenn der Katalog wächst.
+"""
+
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+# Token-Budget für die LVA-Liste im Prompt (0 = unbegrenzt, alle LVAs mit vollem Eintrag)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "12000"))
+
+# Grobe Schätzung wie in _save_prompt_to_file: 1 Token ≈ 4 Zeichen
+CHARS_PER_TOKEN = 4
+
+# Gewichte für das Ranking (similarity liegt zwischen 0 und 1)
+DESIRED_WEIGHT = 1.0
+IDEAL_PLAN_WEIGHT = 0.5
+
+LvaFormatter = Callable[[Dict[str, Any]], str]
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class ContextPacker:
+    """Rankt LVAs und formatiert sie innerhalb eines Token-Budgets."""
+
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET):
+        self.token_budget = token_budget
+
+    @staticmethod
+    def _catalog():
+        # lazy import: retrieval importiert seinerseits llm_connection (rag_pipeline)
+        from ..retrieval.catalog import catalog_manager
+        return catalog_manager.current()
+
+    def rank(self, lvas: List[Dict[str, Any]], desired_lvas: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Sortiert nach similarity + Bonus für gewünschte LVAs + Bonus für frühe Semester
+        im idealtypischen Plan (stabil: bei Gleichstand bleibt die Retrieval-Reihenfolge).
+        """
+        try:
+            catalog = self._catalog()
+        except Exception as e:
+            print(f"[CONTEXT] Catalog unavailable, ranking by similarity only: {e}")
+            return sorted(lvas, key=lambda lva: -(lva.get("similarity") or 0.0))
+
+        semesters = catalog.ideal_semesters()
+        desired_ids = catalog.lva_index.resolve_many(desired_lvas or [])
+
+        def score(lva: Dict[str, Any]) -> float:
+            metadata = lva.get("metadata", {})
+            lva_ids = catalog.lva_index.resolve_document(
+                metadata.get("lva_name") or "", metadata.get("lva_type") or "", metadata.get("lva_nr")
+            )
+            value = lva.get("similarity") or 0.0
+            if lva_ids & desired_ids:
+                value += DESIRED_WEIGHT
+            ideal_semester = min((semesters[lva_id] for lva_id in lva_ids if lva_id in semesters), default=None)
+            if ideal_semester:
+                value += IDEAL_PLAN_WEIGHT / ideal_semester
+            return value
+
+        return sorted(lvas, key=lambda lva: -score(lva))
+
+    def pack(
+        self,
+        lvas: List[Dict[str, Any]],
+        format_full: LvaFormatter,
+        format_compact: LvaFormatter,
+        desired_lvas: Optional[List[str]] = None,
+    ) -> str:
+        """
+        Formatiert die gerankten LVAs: volle Einträge solange das Budget reicht,
+        danach Kurzform, danach werden die restlichen LVAs ausgelassen.
+        """
+        if not self.token_budget:
+            return "\n\n".join(format_full(lva) for lva in lvas)
+
+        remaining = self.token_budget
+        full_records: List[str] = []
+        compact_records: List[str] = []
+        omitted = 0
+
+        for lva in self.rank(lvas, desired_lvas):
+            if not compact_records and not omitted:
+                record = format_full(lva)
+                cost = estimate_tokens(record)
+                if cost <= remaining:
+                    full_records.append(record)
+                    remaining -= cost
+                    continue
+
+            record = format_compact(lva)
+            cost = estimate_tokens(record)
+            if cost <= remaining:
+                compact_records.append(record)
+                remaining -= cost
+            else:
+                omitted += 1
+
+        sections = full_records
+        if compact_records:
+            sections = sections + [
+                "WEITERE VERFÜGBARE LVAs (Kurzform, Details aus Platzgründen ausgelassen):\n"
+                + "\n".join(compact_records)
+            ]
+        if omitted:
+            sections = sections + [f"(+{omitted} weitere LVAs wegen Kontext-Limit ausgelassen)"]
+
+        print(f"[CONTEXT] {len(full_records)} full, {len(compact_records)} compact, {omitted} omitted "
+              f"(~{self.token_budget - remaining}/{self.token_budget} tokens)")
+        return "\n\n".join(sections)
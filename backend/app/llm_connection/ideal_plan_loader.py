@@ -1,11 +1,10 @@
 """
-Ideal Study Plan Loader: Lädt den idealtypischen Studienplan aus der DB
+Ideal Study Plan Loader: Lädt den idealtypischen Studienplan (ideal_study_plan, über den CourseCatalog)
 Der idealtypische Plan wird dem LLM als Kontext übergeben für bessere Entscheidungen.
 """
 
 import os
-import psycopg2
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,7 +12,7 @@ load_dotenv()
 
 class IdealPlanLoader:
     """
-    Lädt den idealtypischen Studienplan aus der Datenbank.
+    Lädt den idealtypischen Studienplan aus dem CourseCatalog (einmal aus der Datenbank geladen).
     Dieser Plan gibt die empfohlene Reihenfolge der LVAs pro Semester an.
     """
 
@@ -21,37 +20,35 @@ class IdealPlanLoader:
         self.db_url = os.getenv("DATABASE_URL")
         if not self.db_url:
             raise ValueError("DATABASE_URL not set in environment")
+        # formatierter Plan pro Katalog-Version (wird nach einem Katalog-Swap neu erstellt)
+        self._formatted: Optional[Tuple[str, str]] = None
+
+    @staticmethod
+    def _catalog():
+        # lazy import: retrieval importiert seinerseits llm_connection (rag_pipeline)
+        from ..retrieval.catalog import catalog_manager
+        return catalog_manager.current()
+
+    async def arefresh(self) -> None:
+        """
+        Versions-Check des Katalogs über den asyncpg-Pool. Danach ist der Check für
+        _catalog() nicht fällig und der Prompt-Aufbau blockiert den Event-Loop nicht.
+        """
+        from ..retrieval.catalog import catalog_manager
+        try:
+            await catalog_manager.acurrent()
+        except Exception as e:
+            print(f"Error loading ideal study plan: {e}")
 
     def load_ideal_plan(self) -> List[Dict[str, Any]]:
         """
-        Lädt den kompletten idealtypischen Studienplan aus der DB.
+        Lädt den kompletten idealtypischen Studienplan (aus dem In-Memory-Katalog).
 
         Returns:
             Liste von Dictionaries mit LVA-Zuordnungen zu Semestern
         """
         try:
-            conn = psycopg2.connect(self.db_url)
-            cur = conn.cursor()
-
-            # Hole alle Daten aus ideal_study_plan
-            cur.execute("""
-                SELECT DISTINCT *
-                FROM ideal_study_plan
-                WHERE study_mode = 'Teilzeit' AND study_start_mode = 'Start_WS'
-                ORDER BY semester_num, lva_name
-            """)
-
-            columns = [desc[0] for desc in cur.description]
-            rows = cur.fetchall()
-
-            ideal_plan = []
-            for row in rows:
-                ideal_plan.append(dict(zip(columns, row)))
-
-            cur.close()
-            conn.close()
-
-            return ideal_plan
+            return self._catalog().ideal_plan(study_mode="Teilzeit", study_start_mode="Start_WS")
 
         except Exception as e:
             print(f"Error loading ideal study plan: {e}")
@@ -64,8 +61,22 @@ class IdealPlanLoader:
         Returns:
             Formatierter String für LLM-Prompt
         """
-        ideal_plan = self.load_ideal_plan()
+        try:
+            version = self._catalog().version
+        except Exception as e:
+            print(f"Error loading ideal study plan: {e}")
+            version = None
+
+        if version is not None and self._formatted is not None and self._formatted[0] == version:
+            return self._formatted[1]
+
+        formatted = self._format_ideal_plan(self.load_ideal_plan())
+        if version is not None:
+            self._formatted = (version, formatted)
+        return formatted
 
+    def _format_ideal_plan(self, ideal_plan: List[Dict[str, Any]]) -> str:
+        """Gruppiert die Einträge nach Semester und formatiert sie als Prompt-Text."""
         if not ideal_plan:
             return "Kein idealtypischer Studienplan verfügbar."
 
@@ -0,0 +1,218 @@
+"""
+LLM Scheduler: zentrale Zugangskontrolle für alle Gemini-Calls eines Prozesses.
+
+Das Free-Tier von gemini-2.5-flash-lite erlaubt nur LLM_REQUESTS_PER_MINUTE Calls pro
+Minute. Statt dass gleichzeitige User in Quota-Fehler laufen, holt sich jeder Call
+vorher ein Token:
+
+- Token-Bucket: Nachfüllrate LLM_REQUESTS_PER_MINUTE, dazu ein kleiner Vorrat von
+  LLM_BURST Tokens nach Leerlauf (im ersten Fenster nach einer Pause also höchstens
+  RPM + BURST Calls, daher BURST klein halten; meldet Gemini trotzdem 429, wird der
+  Bucket gesperrt)
+- Prioritäts-Queue: wer wartet, wird nach Priorität bedient (Planerstellung vor Chat),
+  bei gleicher Priorität in Ankunftsreihenfolge
+- Backpressure: sind LLM_MAX_QUEUE Calls in der Warteschlange oder wartet ein Call
+  länger als LLM_QUEUE_TIMEOUT, gibt es LLMRateLimitError (→ HTTP 429 + Retry-After)
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
+
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "15"))
+LLM_BURST = int(os.getenv("LLM_BURST", "2"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "20"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "60"))  # Sekunden
+
+# kleinere Zahl = höhere Priorität
+PRIORITY_PLAN = 0
+PRIORITY_CHAT = 1
+
+
+class LLMRateLimitError(Exception):
+    """LLM-Quota ausgeschöpft bzw. Warteschlange voll; retry_after in Sekunden."""
+
+    def __init__(self, retry_after: float, message: str = "LLM ist ausgelastet, bitte später erneut versuchen"):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    """Nicht thread-safe, wird nur unter dem Lock des Schedulers benutzt."""
+
+    def __init__(self, capacity: int, refill_per_minute: float):
+        self.capacity = max(1, capacity)
+        self.rate = max(refill_per_minute, 1e-6) / 60.0  # Tokens pro Sekunde
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def time_until_token(self) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def drain(self, seconds: float) -> None:
+        """Bucket leeren und für `seconds` sperren (Gemini hat trotzdem 429 geliefert)."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+@dataclass(order=True)
+class _Ticket:
+    priority: int
+    seq: int
+    granted: bool = field(default=False, compare=False)
+    wake: Callable[[], None] = field(default=lambda: None, compare=False)
+
+
+class LLMScheduler:
+    """Token-Bucket + Prioritäts-Queue, nutzbar aus Threads (acquire) und async (aacquire)."""
+
+    def __init__(
+        self,
+        requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+        burst: int = LLM_BURST,
+        max_queue: int = LLM_MAX_QUEUE,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT,
+    ):
+        burst = min(burst, requests_per_minute)
+        # Dauerrate = Quota pro Minute, der Burst gilt nur nach Leerlauf
+        self.bucket = TokenBucket(burst, requests_per_minute)
+        self.requests_per_minute = requests_per_minute
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._queue: List[_Ticket] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.quota_errors = 0
+        self.wait_seconds = 0.0
+
+    def _retry_after(self) -> float:
+        """Geschätzte Zeit, bis ein neuer Call an der Reihe wäre (mit Lock aufrufen)."""
+        return self.bucket.time_until_token() + len(self._queue) / self.bucket.rate
+
+    def _enqueue(self, priority: int, wake: Callable[[], None]) -> _Ticket:
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise LLMRateLimitError(self._retry_after())
+            ticket = _Ticket(priority, next(self._seq), wake=wake)
+            heapq.heappush(self._queue, ticket)
+            return ticket
+
+    def _dispatch(self) -> float:
+        """Vergibt freie Tokens an die Spitze der Queue; liefert die Zeit bis zum nächsten Token."""
+        with self._lock:
+            while self._queue and self.bucket.try_take():
+                ticket = heapq.heappop(self._queue)
+                ticket.granted = True
+                self.granted += 1
+                ticket.wake()
+            return self.bucket.time_until_token()
+
+    def _cancel(self, ticket: _Ticket) -> None:
+        with self._lock:
+            if not ticket.granted and ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+
+    def _timeout(self, ticket: _Ticket) -> LLMRateLimitError:
+        self._cancel(ticket)
+        with self._lock:
+            self.timeouts += 1
+            return LLMRateLimitError(self._retry_after())
+
+    def _record_wait(self, start: float) -> None:
+        with self._lock:
+            self.wait_seconds += time.monotonic() - start
+
+    def acquire(self, priority: int = PRIORITY_CHAT) -> None:
+        """Blockiert den aufrufenden Thread, bis der Call starten darf."""
+        event = threading.Event()
+        ticket = self._enqueue(priority, event.set)
+        start = time.monotonic()
+        try:
+            while True:
+                wait = self._dispatch()
+                if ticket.granted:
+                    break
+                remaining = self.queue_timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise self._timeout(ticket)
+                event.wait(min(wait, remaining))
+                event.clear()
+        except BaseException:
+            self._cancel(ticket)
+            raise
+        self._record_wait(start)
+
+    async def aacquire(self, priority: int = PRIORITY_CHAT) -> None:
+        """Async Variante von acquire(): wartet, ohne den Event-Loop zu blockieren."""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        ticket = self._enqueue(priority, lambda: loop.call_soon_threadsafe(event.set))
+        start = time.monotonic()
+        try:
+            while True:
+                wait = self._dispatch()
+                if ticket.granted:
+                    break
+                remaining = self.queue_timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise self._timeout(ticket)
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=min(wait, remaining))
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        except BaseException:
+            # auch bei Abbruch (Client getrennt): Platz in der Queue freigeben
+            self._cancel(ticket)
+            raise
+        self._record_wait(start)
+
+    def report_quota_error(self, retry_after: float = 60.0) -> LLMRateLimitError:
+        """Gemini meldet trotzdem Quota-Überschreitung: Bucket sperren, Fehler für den Caller."""
+        with self._lock:
+            self.quota_errors += 1
+            self.bucket.drain(retry_after)
+            return LLMRateLimitError(self._retry_after())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "burst": self.bucket.capacity,
+                "tokens": round(max(self.bucket.tokens, 0.0), 2),
+                "queued": len(self._queue),
+                "max_queue": self.max_queue,
+                "granted": self.granted,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "quota_errors": self.quota_errors,
+                "avg_wait_seconds": self.wait_seconds / self.granted if self.granted else 0.0,
+            }
+
+
+# Ein Scheduler pro Prozess: planning_routes und chat_routes teilen sich die Quota
+llm_scheduler = LLMScheduler()
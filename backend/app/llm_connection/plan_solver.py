@@ -0,0 +1,349 @@
+"""
+Plan Solver: deterministische Semesterplanung über die eligible LVAs (vor dem LLM).
+
+Die harten Regeln, die bisher nur im Prompt standen, löst ein Branch-and-Bound
+(0/1-Knapsack mit Konflikten) in Millisekunden:
+
+- ECTS-Ziel ist eine Obergrenze (Unterschreitung erlaubt, Überschreitung nie)
+- keine zwei LVAs zur selben Zeit (Wochentag + Uhrzeit überlappen nicht)
+- VL und UE einer LVA nur gemeinsam (ein Kurs = eine Einheit)
+- jede LVA (Name + Typ) höchstens einmal
+- nur bevorzugte Tage (falls angegeben)
+
+Zielfunktion (maximiert): STEOP-Kurse > gewünschte LVAs > frühes Semester im
+idealtypischen Plan > möglichst viele ECTS > Retrieval-Relevanz.
+
+Das LLM schreibt danach nur noch Begründungen und Zusammenfassung.
+"""
+
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Abbruch der Suche nach so vielen Knoten (bestes bis dahin gefundenes Ergebnis wird genutzt)
+SOLVER_NODE_LIMIT = int(os.getenv("SOLVER_NODE_LIMIT", "200000"))
+
+# STEOP-Kurse (wie im Planning-Context): müssen geplant werden, solange nicht absolviert
+STEOP_COURSES = (
+    "Einführung in die Softwareentwicklung",
+    "Grundlagen der BWL",
+    "Einführung in die Wirtschaftsinformatik",
+)
+
+# Gewichte der Zielfunktion (pro Kurs-Einheit)
+STEOP_WEIGHT = 1000.0
+DESIRED_WEIGHT = 500.0
+IDEAL_PLAN_WEIGHT = 100.0  # geteilt durch das Semester im idealtypischen Plan
+ECTS_WEIGHT = 10.0
+SIMILARITY_WEIGHT = 5.0
+
+WEEKDAYS = ("Mo.", "Di.", "Mi.", "Do.", "Fr.", "Sa.", "So.")
+TIME_RANGE_PATTERN = re.compile(r"(\d{1,2})[:.](\d{2})\s*[-–]\s*(\d{1,2})[:.](\d{2})")
+
+
+def parse_ects(value: Any) -> Optional[float]:
+    """ECTS aus den Metadaten (int, float oder "3,00")."""
+    if value is None:
+        return None
+    try:
+        return float(str(value).replace(",", ".").strip())
+    except ValueError:
+        return None
+
+
+@dataclass(frozen=True)
+class TimeSlot:
+    day: str
+    start: int  # Minuten seit Mitternacht
+    end: int
+
+    @classmethod
+    def parse(cls, day: Optional[str], uhrzeit: Optional[str]) -> Optional["TimeSlot"]:
+        if not day or not uhrzeit:
+            return None
+        match = TIME_RANGE_PATTERN.search(uhrzeit)
+        if not match:
+            return None
+        start_h, start_m, end_h, end_m = (int(part) for part in match.groups())
+        return cls(day=day.strip(), start=start_h * 60 + start_m, end=end_h * 60 + end_m)
+
+    def overlaps(self, other: "TimeSlot") -> bool:
+        return self.day == other.day and self.start < other.end and other.start < self.end
+
+
+@dataclass
+class PlanItem:
+    """Eine LVA (Dokument aus dem Retrieval) im Plan."""
+    lva: Dict[str, Any]
+    name: str
+    type: str
+    ects: float
+    day: Optional[str]
+    time: Optional[str]
+    instructor: Optional[str]
+    slot: Optional[TimeSlot]
+
+
+@dataclass
+class CourseUnit:
+    """Planungs-Einheit: alle LVAs eines Kurses (VL + UE gemeinsam) oder eine einzelne LVA."""
+    name: str
+    items: List[PlanItem]
+    value: float = 0.0
+    reasons: List[str] = field(default_factory=list)
+
+    @property
+    def ects(self) -> float:
+        return sum(item.ects for item in self.items)
+
+    @property
+    def slots(self) -> List[TimeSlot]:
+        return [item.slot for item in self.items if item.slot is not None]
+
+    def conflicts_with(self, other: "CourseUnit") -> bool:
+        return any(a.overlaps(b) for a in self.slots for b in other.slots)
+
+
+@dataclass
+class SolverResult:
+    units: List[CourseUnit]
+    total_ects: float
+    nodes: int
+    optimal: bool
+    elapsed_ms: float
+    warnings: List[str]
+
+    def to_plan_json(self, semester: Optional[str]) -> Dict[str, Any]:
+        """Gleiches Format wie der bisherige LLM-Plan (summary/reasons ergänzt das LLM)."""
+        items = [item for unit in self.units for item in unit.items]
+        reasons = {id(item): "; ".join(unit.reasons) for unit in self.units for item in unit.items}
+        days = {item.day for item in items if item.day}
+        return {
+            "semester": semester or "",
+            "total_ects": self.total_ects,
+            "uni_days": sorted(days, key=lambda day: WEEKDAYS.index(day) if day in WEEKDAYS else len(WEEKDAYS)),
+            "lvas": [
+                {
+                    "name": item.name,
+                    "type": item.type,
+                    "ects": item.ects,
+                    "day": item.day or "",
+                    "time": item.time or "",
+                    "instructor": item.instructor or "",
+                    "reason": reasons[id(item)],
+                }
+                for item in sorted(items, key=lambda item: (
+                    WEEKDAYS.index(item.day) if item.day in WEEKDAYS else len(WEEKDAYS),
+                    item.slot.start if item.slot else 0,
+                ))
+            ],
+            "summary": "",
+            "warnings": "; ".join(self.warnings),
+        }
+
+
+class PlanSolver:
+    """Branch-and-Bound über Kurs-Einheiten (ECTS-Kapazität + Zeitkonflikte)."""
+
+    def __init__(self, node_limit: int = SOLVER_NODE_LIMIT):
+        self.node_limit = node_limit
+
+    @staticmethod
+    def _catalog():
+        # lazy import: retrieval importiert seinerseits llm_connection (rag_pipeline)
+        from ..retrieval.catalog import catalog_manager
+        return catalog_manager.current()
+
+    def build_units(
+        self,
+        lvas: List[Dict[str, Any]],
+        preferred_days: Optional[List[str]] = None,
+        desired_lvas: Optional[List[str]] = None,
+    ) -> Tuple[List[CourseUnit], List[str]]:
+        """
+        Dedupliziert, filtert nach Tagen, gruppiert VL/UE und bewertet jede Einheit.
+        Fällt ein Teil eines Kurses weg (anderer Tag, ECTS unbekannt) und gibt es keine
+        Alternative desselben Typs, wird der ganze Kurs nicht eingeplant.
+        """
+        warnings: List[str] = []
+        preferred = set(preferred_days or [])
+        seen: Set[Tuple[str, str]] = set()
+        dropped: Dict[Tuple[str, str], str] = {}
+        units_by_name: Dict[str, CourseUnit] = {}
+        similarity: Dict[str, List[float]] = {}
+        skipped_days = 0
+
+        for lva in lvas:
+            metadata = lva.get("metadata", {})
+            name = (metadata.get("lva_name") or "").strip()
+            lva_type = (metadata.get("lva_type") or "").strip()
+            if not name or (name, lva_type) in seen:
+                continue
+
+            ects = parse_ects(metadata.get("ects"))
+            if ects is None:
+                dropped.setdefault((name, lva_type), "ECTS unbekannt")
+                continue
+
+            day = metadata.get("tag")
+            if preferred and day and day not in preferred:
+                skipped_days += 1
+                dropped.setdefault((name, lva_type), "nicht an den bevorzugten Tagen")
+                continue
+
+            # erst hier: eine weggefilterte Gruppe blockiert keine spätere, passende Gruppe
+            seen.add((name, lva_type))
+            item = PlanItem(
+                lva=lva,
+                name=name,
+                type=lva_type,
+                ects=ects,
+                day=day,
+                time=metadata.get("uhrzeit"),
+                instructor=metadata.get("lva_leiter"),
+                slot=TimeSlot.parse(day, metadata.get("uhrzeit")),
+            )
+            units_by_name.setdefault(name, CourseUnit(name=name, items=[])).items.append(item)
+            similarity.setdefault(name, []).append(lva.get("similarity") or 0.0)
+
+        if skipped_days:
+            print(f"[SOLVER] {skipped_days} LVAs outside the preferred days skipped")
+
+        # VL/UE nur gemeinsam: Kurse ohne (passenden) Partner fallen komplett weg
+        for (name, lva_type), reason in dropped.items():
+            if (name, lva_type) in seen:
+                continue
+            if name in units_by_name:
+                del units_by_name[name]
+                warnings.append(f"{name}: {lva_type} {reason}, Kurs daher nicht eingeplant")
+            elif reason == "ECTS unbekannt":
+                warnings.append(f"{lva_type} {name}: ECTS unbekannt, nicht eingeplant".strip())
+
+        self._score_units(units_by_name, similarity, desired_lvas or [])
+        return list(units_by_name.values()), warnings
+
+    def _score_units(
+        self,
+        units_by_name: Dict[str, CourseUnit],
+        similarity: Dict[str, List[float]],
+        desired_lvas: List[str],
+    ) -> None:
+        try:
+            catalog = self._catalog()
+        except Exception as e:
+            print(f"[SOLVER] Catalog unavailable, scoring by ECTS and similarity only: {e}")
+            catalog = None
+
+        steop_ids: Set[int] = set()
+        desired_ids: Set[int] = set()
+        semesters: Dict[int, int] = {}
+        if catalog is not None:
+            steop_ids = catalog.lva_index.resolve_many(STEOP_COURSES)
+            desired_ids = catalog.lva_index.resolve_many(desired_lvas)
+            semesters = catalog.ideal_semesters()
+
+        for name, unit in units_by_name.items():
+            unit_ids: Set[int] = set()
+            if catalog is not None:
+                for item in unit.items:
+                    unit_ids |= catalog.lva_index.resolve_document(
+                        item.name, item.type, item.lva.get("metadata", {}).get("lva_nr")
+                    )
+
+            value = ECTS_WEIGHT * unit.ects
+            value += SIMILARITY_WEIGHT * max(similarity.get(name, [0.0]))
+            if unit_ids & steop_ids:
+                value += STEOP_WEIGHT
+                unit.reasons.append("STEOP-LVA, muss vor weiteren Kursen absolviert werden")
+            if unit_ids & desired_ids:
+                value += DESIRED_WEIGHT
+                unit.reasons.append("explizit gewünscht")
+            ideal_semester = min((semesters[lva_id] for lva_id in unit_ids if lva_id in semesters), default=None)
+            if ideal_semester:
+                value += IDEAL_PLAN_WEIGHT / ideal_semester
+                unit.reasons.append(f"idealtypischer Studienplan: Semester {ideal_semester}")
+            if len(unit.items) > 1:
+                unit.reasons.append("VL und UE gemeinsam geplant")
+            if not unit.reasons:
+                unit.reasons.append("passt ins ECTS-Ziel und in die bevorzugten Tage")
+            unit.value = value
+
+    def solve(
+        self,
+        lvas: List[Dict[str, Any]],
+        ects_target: float,
+        preferred_days: Optional[List[str]] = None,
+        desired_lvas: Optional[List[str]] = None,
+    ) -> SolverResult:
+        start = time.perf_counter()
+        units, warnings = self.build_units(lvas, preferred_days, desired_lvas)
+
+        # Einheiten, die alleine schon zu groß sind oder in sich überschneiden, fallen weg
+        feasible = []
+        for unit in units:
+            if unit.ects > ects_target:
+                warnings.append(f"{unit.name}: {unit.ects:g} ECTS überschreiten das ECTS-Ziel")
+            elif any(a.overlaps(b) for i, a in enumerate(unit.slots) for b in unit.slots[i + 1:]):
+                warnings.append(f"{unit.name}: VL und UE überschneiden sich zeitlich")
+            else:
+                feasible.append(unit)
+
+        # nach Wert pro ECTS sortieren: gute Lösungen früh, enge Schranken
+        feasible.sort(key=lambda unit: unit.value / max(unit.ects, 0.5), reverse=True)
+        n = len(feasible)
+        conflicts = [
+            {j for j in range(n) if j != i and feasible[i].conflicts_with(feasible[j])}
+            for i in range(n)
+        ]
+
+        best_value = 0.0
+        best: List[int] = []
+        nodes = 0
+        chosen: List[int] = []
+
+        def bound(index: int, capacity: float, value: float) -> float:
+            # fraktionaler Knapsack ohne Zeitkonflikte als obere Schranke
+            for unit in feasible[index:]:
+                if unit.ects <= capacity:
+                    capacity -= unit.ects
+                    value += unit.value
+                else:
+                    return value + unit.value * capacity / unit.ects if unit.ects else value + unit.value
+            return value
+
+        def search(index: int, capacity: float, value: float, blocked: Set[int]) -> None:
+            nonlocal best_value, best, nodes
+            nodes += 1
+            if value > best_value:
+                best_value, best = value, list(chosen)
+            if index == n or nodes >= self.node_limit or bound(index, capacity, value) <= best_value:
+                return
+
+            unit = feasible[index]
+            if unit.ects <= capacity and index not in blocked:
+                chosen.append(index)
+                search(index + 1, capacity - unit.ects, value + unit.value, blocked | conflicts[index])
+                chosen.pop()
+            search(index + 1, capacity, value, blocked)
+
+        search(0, float(ects_target), 0.0, set())
+
+        selected = [feasible[index] for index in best]
+        total_ects = sum(unit.ects for unit in selected)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        optimal = nodes < self.node_limit
+        if not optimal:
+            warnings.append("Suche nach Knoten-Limit abgebrochen, Plan ist evtl. nicht optimal")
+
+        print(f"[SOLVER] {len(selected)}/{n} units, {total_ects:g}/{ects_target:g} ECTS, "
+              f"{nodes} nodes, {elapsed_ms:.1f} ms")
+        return SolverResult(
+            units=selected,
+            total_ects=total_ects,
+            nodes=nodes,
+            optimal=optimal,
+            elapsed_ms=elapsed_ms,
+            warnings=warnings,
+        )
@@ -0,0 +1,187 @@
+"""
+Prefix Cache: der statische Teil des Chat-Prompts wird einmal pro Planning registriert.
+
+Jede Chat-Nachricht schickt sonst den kompletten planning_context (LVA-Liste,
+idealtypischer Plan, Regeln) erneut an Gemini, obwohl er sich für eine Planning nie
+ändert. Der Prefix (planning_context + Antwort-Anweisungen) wird daher einmal beim
+Backend registriert, pro Turn geht nur noch die Frage raus:
+
+- "off":    kein Prefix-Caching, immer der volle Prompt (Default, Caching ist opt-in)
+- "gemini": Gemini Context Caching (CachedContent), der Prefix liegt serverseitig
+- "local":  Fake für Tests/Entwicklung, hängt den gespeicherten Prefix lokal vor die Frage
+
+Key ist der Hash des Prefix (gleicher planning_context = gleiche Planning). Prefixe
+unter PREFIX_CACHE_MIN_TOKENS werden nicht registriert (Gemini verlangt ein Minimum);
+schlägt die Registrierung fehl, wird der volle Prompt gesendet. Ist ein registrierter
+Prefix serverseitig nicht mehr vorhanden (NotFound), vergisst der SemesterPlanner ihn
+(invalidate) und wiederholt den Call mit dem vollen Prompt.
+"""
+
+import datetime
+import hashlib
+import os
+import threading
+from typing import Any, Dict, Optional
+from cachetools import TTLCache
+from .context_packer import estimate_tokens
+
+PREFIX_CACHE_BACKEND = os.getenv("PREFIX_CACHE_BACKEND", "off").lower()
+PREFIX_CACHE_TTL = int(os.getenv("PREFIX_CACHE_TTL", "3600"))  # Sekunden (serverseitige Lebensdauer)
+PREFIX_CACHE_MIN_TOKENS = int(os.getenv("PREFIX_CACHE_MIN_TOKENS", "1024"))
+PREFIX_CACHE_SIZE = int(os.getenv("PREFIX_CACHE_SIZE", "128"))
+
+# Lokal etwas früher vergessen als Gemini löscht, damit nie ein abgelaufener Cache benutzt wird
+_LOCAL_TTL_FACTOR = 0.9
+
+
+class GeminiPrefixBackend:
+    """Gemini Context Caching: Prefix als CachedContent, Calls über from_cached_content."""
+
+    name = "gemini"
+
+    def create(self, prefix: str, model_name: str, ttl: int) -> Any:
+        # genai.configure() ist bereits im SemesterPlanner passiert
+        from google.generativeai import caching
+        return caching.CachedContent.create(
+            model=model_name,
+            display_name=f"studyverse-{hashlib.sha256(prefix.encode('utf-8')).hexdigest()[:16]}",
+            contents=[prefix],
+            ttl=datetime.timedelta(seconds=ttl),
+        )
+
+    def model_for(self, handle: Any, base_model: Any) -> Any:
+        import google.generativeai as genai
+        return genai.GenerativeModel.from_cached_content(cached_content=handle)
+
+
+class _PrefixedModel:
+    """Verhält sich wie ein GenerativeModel mit gecachtem Prefix."""
+
+    def __init__(self, base_model: Any, prefix: str):
+        self.base_model = base_model
+        self.prefix = prefix
+
+    def generate_content(self, contents: str, **kwargs):
+        return self.base_model.generate_content(self.prefix + contents, **kwargs)
+
+
+class LocalPrefixBackend:
+    """Fake-Backend (Tests/Entwicklung): speichert den Prefix im Prozess."""
+
+    name = "local"
+
+    def create(self, prefix: str, model_name: str, ttl: int) -> Any:
+        return prefix
+
+    def model_for(self, handle: Any, base_model: Any) -> Any:
+        return _PrefixedModel(base_model, handle)
+
+
+def make_backend(name: str = PREFIX_CACHE_BACKEND):
+    if name == "gemini":
+        return GeminiPrefixBackend()
+    if name == "local":
+        return LocalPrefixBackend()
+    return None
+
+
+class PrefixCache:
+    """Registrierte Prompt-Prefixe pro Prozess (Hash des Prefix → Backend-Handle)."""
+
+    def __init__(
+        self,
+        backend=None,
+        ttl: int = PREFIX_CACHE_TTL,
+        min_tokens: int = PREFIX_CACHE_MIN_TOKENS,
+        maxsize: int = PREFIX_CACHE_SIZE,
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self._handles: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl * _LOCAL_TTL_FACTOR)
+        # fehlgeschlagene Registrierungen nicht bei jedem Turn wiederholen
+        self._failed: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._create_lock = threading.Lock()
+        self.registrations = 0
+        self.hits = 0
+        self.skipped = 0
+        self.failures = 0
+        self.tokens_saved = 0
+
+    @staticmethod
+    def make_key(prefix: str) -> str:
+        return hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str, tokens: int) -> Optional[Any]:
+        """Registrierter Handle (zählt als Treffer), mit Lock aufrufen."""
+        handle = self._handles.get(key)
+        if handle is not None:
+            self.hits += 1
+            self.tokens_saved += tokens
+        return handle
+
+    def model_for(self, prefix: str, base_model: Any) -> Optional[Any]:
+        """
+        Modell, das den Prefix bereits kennt (dann nur noch die Frage senden),
+        oder None → voller Prompt über base_model.
+        """
+        tokens = estimate_tokens(prefix)
+        if self.backend is None or tokens < self.min_tokens:
+            with self._lock:
+                self.skipped += 1
+            return None
+
+        key = self.make_key(prefix)
+        with self._lock:
+            handle = self._lookup(key, tokens)
+            if handle is None and key in self._failed:
+                self.skipped += 1
+                return None
+
+        if handle is None:
+            # Registrierung ist ein API-Call: außerhalb von _lock, aber nur einmal pro Prefix
+            with self._create_lock:
+                with self._lock:
+                    handle = self._lookup(key, tokens)
+                if handle is None:
+                    try:
+                        handle = self.backend.create(prefix, base_model.model_name, self.ttl)
+                    except Exception as e:
+                        print(f"[PREFIX CACHE] Registration failed, sending full prompts: {e}")
+                        with self._lock:
+                            self.failures += 1
+                            self._failed[key] = True
+                        return None
+                    with self._lock:
+                        self._handles[key] = handle
+                        self.registrations += 1
+                    print(f"[PREFIX CACHE] Registered prefix (~{tokens} tokens, backend={self.backend.name})")
+
+        return self.backend.model_for(handle, base_model)
+
+    def invalidate(self, prefix: str) -> None:
+        """Handle vergessen (z.B. serverseitig abgelaufen); der nächste Turn registriert neu."""
+        with self._lock:
+            self._handles.pop(self.make_key(prefix), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._handles.clear()
+            self._failed.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.backend.name if self.backend is not None else "off",
+                "size": len(self._handles),
+                "registrations": self.registrations,
+                "hits": self.hits,
+                "skipped": self.skipped,
+                "failures": self.failures,
+                "tokens_saved": self.tokens_saved,
+            }
+
+
+# Ein Cache pro Prozess: planning_routes und chat_routes haben je einen eigenen SemesterPlanner
+prefix_cache = PrefixCache(make_backend())
@@ -0,0 +1,159 @@
+"""
+Response Cache: In-Process Cache für LLM-Antworten im Chat.
+
+Viele Studierende stellen dieselben Folgefragen zu ähnlichen Plänen
+("Muss ich in BWL eine Klausur schreiben?"). Der Cache sitzt vor
+SemesterPlanner.create_chat_answer und answer_study_question:
+
+- Key = (Art, Katalog-Version, Hash des Kontexts, normalisierte Frage)
+- optional semantisch: liegt für denselben Kontext eine Frage mit
+  Cosine-Similarity >= RESPONSE_CACHE_SIMILARITY vor, wird deren Antwort genutzt
+- TTL + maximale Größe (TTLCache, LRU-Verdrängung)
+- ändert sich die Katalog-Version, wird der komplette Cache verworfen
+"""
+
+import hashlib
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from cachetools import TTLCache
+
+# Default-Werte, können über .env überschrieben werden
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # Sekunden
+# Cosine-Similarity-Schwelle für Near-Duplicate-Fragen (0 = nur exakte Treffer)
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))
+
+# (kind, catalog_version, context_hash, normalized_question)
+ResponseKey = Tuple[str, str, str, str]
+
+
+def _normalize_question(question: str) -> str:
+    # lazy import: retrieval importiert seinerseits llm_connection (rag_pipeline)
+    from ..retrieval.embedding_cache import normalize_query
+    return normalize_query(question).rstrip("?!. ")
+
+
+def _catalog_version() -> str:
+    from ..retrieval.catalog import catalog_manager
+    return catalog_manager.current().version
+
+
+class ResponseCache:
+    """Begrenzter TTL-Cache für Chat-Antworten mit optionalem semantischem Lookup."""
+
+    def __init__(
+        self,
+        maxsize: int = RESPONSE_CACHE_SIZE,
+        ttl: int = RESPONSE_CACHE_TTL,
+        similarity_threshold: float = RESPONSE_CACHE_SIMILARITY,
+    ):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # pro (kind, version, context_hash): Fragen-Embeddings für den semantischen Lookup
+        self._embeddings: Dict[Tuple[str, str, str], Dict[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.similarity_threshold = similarity_threshold
+        self._version: Optional[str] = None
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def semantic(self) -> bool:
+        return self.similarity_threshold > 0
+
+    @staticmethod
+    def make_key(kind: str, context: str, question: str, catalog_version: Optional[str] = None) -> ResponseKey:
+        version = catalog_version if catalog_version is not None else _catalog_version()
+        context_hash = hashlib.sha256(context.encode("utf-8")).hexdigest()
+        return kind, version, context_hash, _normalize_question(question)
+
+    def _check_version(self, version: str) -> None:
+        """Neue Katalog-Version → alle Antworten verwerfen (mit Lock aufrufen)."""
+        if self._version != version:
+            if self._version is not None:
+                self._cache.clear()
+                self._embeddings.clear()
+                self.invalidations += 1
+            self._version = version
+
+    def contains(self, key: ResponseKey) -> bool:
+        """Exakter Treffer vorhanden (ohne Zähler), um unnötige Embedding-Calls zu sparen."""
+        with self._lock:
+            return key in self._cache
+
+    def get(self, key: ResponseKey, embedding: Optional[List[float]] = None) -> Optional[str]:
+        """Exakter Treffer, sonst (mit embedding) der ähnlichste Treffer über der Schwelle."""
+        with self._lock:
+            self._check_version(key[1])
+            answer = self._cache.get(key)
+            if answer is not None:
+                self.hits += 1
+                return answer
+
+            if embedding is not None and self.semantic:
+                answer = self._nearest(key, embedding)
+                if answer is not None:
+                    self.semantic_hits += 1
+                    return answer
+
+            self.misses += 1
+            return None
+
+    def _nearest(self, key: ResponseKey, embedding: List[float]) -> Optional[str]:
+        bucket = self._embeddings.get(key[:3])
+        if not bucket:
+            return None
+
+        # Fragen, deren Antwort inzwischen abgelaufen/verdrängt ist, aus dem Bucket entfernen
+        for question in [q for q in bucket if key[:3] + (q,) not in self._cache]:
+            del bucket[question]
+        if not bucket:
+            return None
+
+        questions = list(bucket)
+        matrix = np.stack([bucket[q] for q in questions])
+        query = np.array(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = matrix @ query
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        return self._cache.get(key[:3] + (questions[best],))
+
+    def put(self, key: ResponseKey, answer: str, embedding: Optional[List[float]] = None) -> None:
+        with self._lock:
+            self._check_version(key[1])
+            self._cache[key] = answer
+            if embedding is not None and self.semantic:
+                vector = np.array(embedding, dtype=np.float32)
+                vector /= np.linalg.norm(vector) or 1.0
+                self._embeddings.setdefault(key[:3], {})[key[3]] = vector
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._embeddings.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/Miss-Zähler für Monitoring/Debugging."""
+        with self._lock:
+            total = self.hits + self.semantic_hits + self.misses
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.semantic_hits) / total if total else 0.0,
+                "invalidations": self.invalidations,
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "ttl": self._cache.ttl,
+                "similarity_threshold": self.similarity_threshold,
+            }
+
+
+# Ein Cache pro Prozess: planning_routes und chat_routes haben je einen eigenen
+# SemesterPlanner, sollen sich aber die Antworten teilen
+response_cache = ResponseCache()
@@ -3,11 +3,26 @@ Semester Planner: LLM-basierte Logik für Semesterplanungsvorschläge
 Nutzt Gemini für intelligente Kursauswahl und Konfliktauflösung.
 """
 
+import asyncio
+import functools
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
-from typing import List, Dict, Any, Optional
+from google.api_core import exceptions as google_exceptions
+from typing import AsyncIterator, Iterator, List, Dict, Any, Optional
 from dotenv import load_dotenv
+from .context_packer import ContextPacker
 from .ideal_plan_loader import IdealPlanLoader
+from .llm_scheduler import PRIORITY_CHAT, PRIORITY_PLAN, LLMRateLimitError, llm_scheduler
+from .plan_solver import PlanSolver
+from .prefix_cache import prefix_cache
+from .response_cache import ResponseKey, response_cache
+from .structured_output import (
+    EXPLANATION_RESPONSE_SCHEMA, PLAN_REJECTED_REPAIRS, PLAN_RESPONSE_SCHEMA, parse_json_response,
+    structured_output_stats,
+)
 
 load_dotenv()
 
@@ -16,6 +31,21 @@ load_dotenv()
 # ============================================================================
 SAVE_PROMPTS_TO_FILE = False
 
+# Maximale Anzahl gleichzeitiger Gemini-Calls pro Prozess (weitere warten in der Executor-Queue)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+# Das Gemini-SDK blockiert: die async Varianten führen die Calls in diesem begrenzten
+# Thread-Pool aus, damit der Event-Loop weiter History-/Profile-Requests bedient
+_llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+
+# "solver": PlanSolver wählt die LVAs, das LLM schreibt nur Begründungen + Zusammenfassung
+# "llm":    bisheriger Ablauf, das LLM erstellt den kompletten Plan
+PLANNING_ENGINE = os.getenv("PLANNING_ENGINE", "solver").lower()
+
+# Plan-JSON per response_mime_type/response_schema anfordern (false = nur Prompt-Anweisung)
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "true").lower() == "true"
+
+
 class SemesterPlanner:
     """
     LLM-basierter Semester-Planer:
@@ -33,14 +63,351 @@ class SemesterPlanner:
         genai.configure(api_key=api_key)
 
         # Using gemini-2.5-flash-lite (free-tier limits: 15 requests/min, 1500/day)
-        # If you hit quota errors, wait ~15 seconds between runs
+        # All calls go through the shared llm_scheduler (LLM_REQUESTS_PER_MINUTE, plans before chat)
         self.model = genai.GenerativeModel(model_name="gemini-2.5-flash-lite")
+        self.scheduler = llm_scheduler
 
         # Load ideal study plan for LLM context
         self.ideal_plan_loader = IdealPlanLoader()
-        self.ideal_plan_context = self.ideal_plan_loader.format_ideal_plan_for_llm()
 
-    def create_chat_answer(
+        # Ranks the LVAs and keeps the LVA list within CONTEXT_TOKEN_BUDGET
+        self.context_packer = ContextPacker()
+
+        # Shared response cache for chat answers; question_embedder (embed_query/aembed_query,
+        # e.g. the HybridRetriever) enables the semantic lookup if RESPONSE_CACHE_SIMILARITY > 0
+        self.response_cache = response_cache
+        self.question_embedder = None
+
+        # Deterministic pre-planning (ECTS ceiling, time slots, VL/UE pairs, STEOP, ideal plan)
+        self.plan_solver = PlanSolver()
+
+        # Chat follow-ups: the static prompt prefix (planning_context) is registered once per
+        # planning (PREFIX_CACHE_BACKEND), every turn only sends the question
+        self.prefix_cache = prefix_cache
+
+    @property
+    def ideal_plan_context(self) -> str:
+        """Idealtypischer Studienplan für den LLM-Kontext (folgt dem aktuellen Katalog)."""
+        return self.ideal_plan_loader.format_ideal_plan_for_llm()
+
+    def _call_model(
+        self,
+        prompt: str,
+        temperature: float,
+        stream: bool = False,
+        response_schema: Optional[Dict[str, Any]] = None,
+        model: Any = None,
+    ):
+        """
+        Gemini-Call ohne Scheduling; Quota-Fehler von Gemini werden zu LLMRateLimitError.
+        model: z.B. ein Modell mit gecachtem Prefix (prefix_cache), sonst self.model.
+        """
+        generation_config: Dict[str, Any] = {"temperature": temperature}
+        if response_schema is not None and LLM_STRUCTURED_OUTPUT:
+            generation_config["response_mime_type"] = "application/json"
+            generation_config["response_schema"] = response_schema
+        try:
+            return (model or self.model).generate_content(
+                prompt,
+                generation_config=generation_config,
+                stream=stream,
+            )
+        except google_exceptions.ResourceExhausted as e:
+            print(f"[LLM] Gemini quota exceeded: {e}")
+            raise self.scheduler.report_quota_error() from e
+
+    def _generate(
+        self,
+        prompt: str,
+        temperature: float,
+        priority: int = PRIORITY_CHAT,
+        response_schema: Optional[Dict[str, Any]] = None,
+        model: Any = None,
+    ) -> str:
+        """Blockierender Gemini-Call (sync Pfad), wartet vorher auf ein Token des Schedulers."""
+        self.scheduler.acquire(priority)
+        return self._call_model(prompt, temperature, response_schema=response_schema, model=model).text
+
+    async def _agenerate(
+        self,
+        prompt: str,
+        temperature: float,
+        priority: int = PRIORITY_CHAT,
+        response_schema: Optional[Dict[str, Any]] = None,
+        model: Any = None,
+    ) -> str:
+        """
+        Gemini-Call im begrenzten LLM-Executor, ohne den Event-Loop zu blockieren.
+        Auf das Scheduler-Token wird im Event-Loop gewartet, nicht in einem Executor-Thread.
+        """
+        await self.scheduler.aacquire(priority)
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self._call_model, prompt, temperature, response_schema=response_schema, model=model)
+        response = await loop.run_in_executor(_llm_executor, call)
+        return response.text
+
+    def _iter_stream(self, prompt: str, temperature: float, model: Any = None) -> Iterator[str]:
+        """Gemini-Call mit stream=True (ohne Scheduling), liefert die Text-Chunks."""
+        response = self._call_model(prompt, temperature, stream=True, model=model)
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunk ohne Text-Parts (z.B. nur finish_reason)
+                continue
+            if text:
+                yield text
+
+    def _generate_stream(
+        self, prompt: str, temperature: float, priority: int = PRIORITY_CHAT, model: Any = None
+    ) -> Iterator[str]:
+        """Blockierender Streaming-Call, wartet vorher auf ein Token des Schedulers."""
+        self.scheduler.acquire(priority)
+        yield from self._iter_stream(prompt, temperature, model=model)
+
+    async def _agenerate_stream(
+        self, prompt: str, temperature: float, priority: int = PRIORITY_CHAT, model: Any = None
+    ) -> AsyncIterator[str]:
+        """
+        Streaming-Call im LLM-Executor: der Thread liest die Chunks und reicht sie über
+        eine asyncio.Queue an den Event-Loop weiter. Bricht der Consumer ab (z.B. Client
+        getrennt), hört der Thread nach dem nächsten Chunk auf.
+        """
+        await self.scheduler.aacquire(priority)
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def produce() -> None:
+            try:
+                for text in self._iter_stream(prompt, temperature, model=model):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, text)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        loop.run_in_executor(_llm_executor, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+    def _chat_request(self, user_query: str, context: str, prompt: str) -> tuple[Any, str]:
+        """
+        (model, contents) für eine Chat-Antwort: ist der Prefix zum planning_context
+        registriert, nur die Frage an das Prefix-Modell, sonst der volle Prompt.
+        """
+        cached_model = self.prefix_cache.model_for(self._build_chat_prefix(context), self.model)
+        if cached_model is None:
+            return self.model, prompt
+        return cached_model, self._build_chat_question(user_query)
+
+    async def _achat_request(self, user_query: str, context: str, prompt: str) -> tuple[Any, str]:
+        """Async Variante von _chat_request() (Registrierung ist ein API-Call → Executor)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_llm_executor, self._chat_request, user_query, context, prompt)
+
+    def _invalidate_chat_prefix(self, context: str, error: Exception) -> None:
+        """Gecachter Prefix existiert serverseitig nicht mehr (abgelaufen/gelöscht)."""
+        print(f"[PREFIX CACHE] Cached prefix not found, retrying with full prompt: {error}")
+        self.prefix_cache.invalidate(self._build_chat_prefix(context))
+
+    def _chat_generate(self, user_query: str, context: str, prompt: str) -> str:
+        """Chat-Call über den Prefix-Cache; NotFound → Prefix vergessen, voller Prompt."""
+        model, contents = self._chat_request(user_query, context, prompt)
+        try:
+            return self._generate(contents, temperature=0.3, model=model)
+        except google_exceptions.NotFound as e:
+            if model is self.model:
+                raise
+            self._invalidate_chat_prefix(context, e)
+            return self._generate(prompt, temperature=0.3)
+
+    async def _achat_generate(self, user_query: str, context: str, prompt: str) -> str:
+        """Async Variante von _chat_generate()."""
+        model, contents = await self._achat_request(user_query, context, prompt)
+        try:
+            return await self._agenerate(contents, temperature=0.3, model=model)
+        except google_exceptions.NotFound as e:
+            if model is self.model:
+                raise
+            self._invalidate_chat_prefix(context, e)
+            return await self._agenerate(prompt, temperature=0.3)
+
+    def _chat_stream(self, user_query: str, context: str, prompt: str) -> Iterator[str]:
+        """Streaming-Variante von _chat_generate() (Retry nur, solange noch nichts geliefert wurde)."""
+        model, contents = self._chat_request(user_query, context, prompt)
+        started = False
+        try:
+            for text in self._generate_stream(contents, temperature=0.3, model=model):
+                started = True
+                yield text
+        except google_exceptions.NotFound as e:
+            if model is self.model or started:
+                raise
+            self._invalidate_chat_prefix(context, e)
+            yield from self._generate_stream(prompt, temperature=0.3)
+
+    async def _achat_stream(self, user_query: str, context: str, prompt: str) -> AsyncIterator[str]:
+        """Async Variante von _chat_stream()."""
+        model, contents = await self._achat_request(user_query, context, prompt)
+        started = False
+        try:
+            async for text in self._agenerate_stream(contents, temperature=0.3, model=model):
+                started = True
+                yield text
+        except google_exceptions.NotFound as e:
+            if model is self.model or started:
+                raise
+            self._invalidate_chat_prefix(context, e)
+            async for text in self._agenerate_stream(prompt, temperature=0.3):
+                yield text
+
+    def _question_embedding(self, cache_key: ResponseKey, question: str) -> Optional[List[float]]:
+        """Frage-Embedding für den semantischen Cache-Lookup (nur wenn kein exakter Treffer)."""
+        if not self.response_cache.semantic or self.question_embedder is None or self.response_cache.contains(cache_key):
+            return None
+        try:
+            return self.question_embedder.embed_query(question)
+        except Exception as e:
+            print(f"[RESPONSE CACHE] Embedding failed, exact lookup only: {e}")
+            return None
+
+    async def _aquestion_embedding(self, cache_key: ResponseKey, question: str) -> Optional[List[float]]:
+        """Async Variante von _question_embedding()."""
+        if not self.response_cache.semantic or self.question_embedder is None or self.response_cache.contains(cache_key):
+            return None
+        try:
+            return await self.question_embedder.aembed_query(question)
+        except Exception as e:
+            print(f"[RESPONSE CACHE] Embedding failed, exact lookup only: {e}")
+            return None
+
+    def create_chat_answer(self, user_query: str, **kwargs) -> str:
+        """
+        Erstellt eine Text-Antwort für das Chat-Fenster (Parameter siehe _prepare_chat_prompt).
+        Gleiche Frage zum gleichen Kontext wird aus dem Response-Cache beantwortet.
+
+        Returns:
+            Chat-Antwort als String
+        """
+        prompt, context, error = self._prepare_chat_prompt(user_query, **kwargs)
+        if error:
+            return error
+
+        cache_key = self.response_cache.make_key("chat", context, user_query)
+        embedding = self._question_embedding(cache_key, user_query)
+        cached = self.response_cache.get(cache_key, embedding)
+        if cached is not None:
+            print("[RESPONSE CACHE] Hit for chat answer")
+            return cached
+
+        # Generate Answer
+        try:
+            answer = self._chat_generate(user_query, context, prompt)
+
+        except LLMRateLimitError:
+            raise
+        except Exception as e:
+            return f"Fehler bei der Planungserstellung: {e}"
+
+        self.response_cache.put(cache_key, answer, embedding)
+        return answer
+
+    async def acreate_chat_answer(self, user_query: str, **kwargs) -> str:
+        """Async Variante von create_chat_answer() (LLM-Call im Executor)."""
+        await self.ideal_plan_loader.arefresh()
+        prompt, context, error = self._prepare_chat_prompt(user_query, **kwargs)
+        if error:
+            return error
+
+        cache_key = self.response_cache.make_key("chat", context, user_query)
+        embedding = await self._aquestion_embedding(cache_key, user_query)
+        cached = self.response_cache.get(cache_key, embedding)
+        if cached is not None:
+            print("[RESPONSE CACHE] Hit for chat answer")
+            return cached
+
+        try:
+            answer = await self._achat_generate(user_query, context, prompt)
+
+        except LLMRateLimitError:
+            raise
+        except Exception as e:
+            return f"Fehler bei der Planungserstellung: {e}"
+
+        self.response_cache.put(cache_key, answer, embedding)
+        return answer
+
+    def stream_chat_answer(self, user_query: str, **kwargs) -> Iterator[str]:
+        """Wie create_chat_answer(), liefert die Antwort aber in Text-Chunks (sync Generator)."""
+        prompt, context, error = self._prepare_chat_prompt(user_query, **kwargs)
+        if error:
+            yield error
+            return
+
+        cache_key = self.response_cache.make_key("chat", context, user_query)
+        embedding = self._question_embedding(cache_key, user_query)
+        cached = self.response_cache.get(cache_key, embedding)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        try:
+            for text in self._chat_stream(user_query, context, prompt):
+                chunks.append(text)
+                yield text
+
+        except LLMRateLimitError:
+            raise
+        except Exception as e:
+            yield f"Fehler bei der Planungserstellung: {e}"
+            return
+
+        self.response_cache.put(cache_key, "".join(chunks), embedding)
+
+    async def astream_chat_answer(self, user_query: str, **kwargs) -> AsyncIterator[str]:
+        """Async Variante von stream_chat_answer() (Streaming-Call im Executor)."""
+        await self.ideal_plan_loader.arefresh()
+        prompt, context, error = self._prepare_chat_prompt(user_query, **kwargs)
+        if error:
+            yield error
+            return
+
+        cache_key = self.response_cache.make_key("chat", context, user_query)
+        embedding = await self._aquestion_embedding(cache_key, user_query)
+        cached = self.response_cache.get(cache_key, embedding)
+        if cached is not None:
+            print("[RESPONSE CACHE] Hit for chat answer")
+            yield cached
+            return
+
+        chunks = []
+        try:
+            async for text in self._achat_stream(user_query, context, prompt):
+                chunks.append(text)
+                yield text
+
+        except LLMRateLimitError:
+            raise
+        except Exception as e:
+            yield f"Fehler bei der Planungserstellung: {e}"
+            return
+
+        self.response_cache.put(cache_key, "".join(chunks), embedding)
+
+    def _prepare_chat_prompt(
         self,
         user_query: str,
         retrieved_lvas: List[Dict[str, Any]] = None,
@@ -50,9 +417,9 @@ class SemesterPlanner:
         desired_lvas: Optional[List[str]] = None,
         filtered_lvas: Optional[List[Dict[str, Any]]] = None,
         planning_context: Optional[str] = None,
-    ) -> str:
+    ) -> tuple[Optional[str], Optional[str], Optional[str]]:
         """
-        Erstellt eine Text-Antwort für das Chat-Fenster.
+        Baut den Prompt für eine Text-Antwort im Chat-Fenster.
 
         Args:
             user_query: Original User Query
@@ -65,7 +432,7 @@ class SemesterPlanner:
             planning_context: Gespeicherter Planning-Context aus DB (bevorzugt, wenn vorhanden)
 
         Returns:
-            Chat-Antwort als String
+            Tuple: (prompt, context, error) - entweder prompt + context oder error ist gesetzt
         """
         # Use stored planning_context if available, otherwise build new one
         if planning_context:
@@ -74,9 +441,9 @@ class SemesterPlanner:
         else:
             # Fallback: Build new context from parameters (for backwards compatibility)
             if retrieved_lvas is None or ects_target is None or preferred_days is None:
-                return "Fehler: Entweder planning_context oder alle Parameter (retrieved_lvas, ects_target, preferred_days) müssen angegeben werden."
+                return None, None, "Fehler: Entweder planning_context oder alle Parameter (retrieved_lvas, ects_target, preferred_days) müssen angegeben werden."
 
-            lva_list = self._format_lvas_for_prompt(retrieved_lvas)
+            lva_list = self._format_lvas_for_prompt(retrieved_lvas, desired_lvas)
             context = self._build_planning_context(
                 user_query=user_query,
                 lva_list=lva_list,
@@ -97,18 +464,103 @@ class SemesterPlanner:
         lva_count = len(retrieved_lvas) if retrieved_lvas else 0
         self._save_prompt_to_file(prompt, user_query, lva_count)
 
-        # Generate Answer
+        return prompt, context, None
+
+    def create_semester_plan_json(self, user_query: str, retrieved_lvas: List[Dict[str, Any]], **kwargs) -> tuple[Dict[str, Any], str]:
+        """
+        Erstellt einen Semesterplan als JSON für die Planning-Detail-Ansicht.
+        Wird aufgerufen wenn "Planung starten" Button geklickt wird.
+        Parameter siehe _prepare_semester_plan_prompt.
+
+        Returns:
+            Tuple: (plan_json, planning_context)
+        """
+        if PLANNING_ENGINE == "solver":
+            plan_json, prompt, planning_context = self._prepare_solved_plan(user_query, retrieved_lvas, **kwargs)
+            try:
+                explanation = self._parse_plan_json(
+                    self._generate(prompt, temperature=0.3, priority=PRIORITY_PLAN,
+                                   response_schema=EXPLANATION_RESPONSE_SCHEMA),
+                    schema=EXPLANATION_RESPONSE_SCHEMA,
+                )
+            except LLMRateLimitError:
+                raise
+            except Exception as e:
+                print(f"[ERROR] Error generating plan explanation: {e}")
+                explanation = {}
+            return self._merge_plan_explanation(plan_json, explanation), planning_context
+
+        prompt, planning_context = self._prepare_semester_plan_prompt(user_query, retrieved_lvas, **kwargs)
+
+        # Generate Plan
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={"temperature": 0.3}
-            )
-            return response.text
+            response_text = self._generate(prompt, temperature=0.3, priority=PRIORITY_PLAN,
+                                           response_schema=PLAN_RESPONSE_SCHEMA)
+        except LLMRateLimitError:
+            raise
+        except Exception as e:
+            print(f"[ERROR] Error generating semester plan: {e}")
+            return {"error": str(e)}, planning_context
 
+        return self._parse_plan_json(response_text, schema=PLAN_RESPONSE_SCHEMA), planning_context
+
+    async def acreate_semester_plan_json(self, user_query: str, retrieved_lvas: List[Dict[str, Any]], **kwargs) -> tuple[Dict[str, Any], str]:
+        """Async Variante von create_semester_plan_json() (LLM-Call im Executor)."""
+        await self.ideal_plan_loader.arefresh()
+        if PLANNING_ENGINE == "solver":
+            plan_json, prompt, planning_context = self._prepare_solved_plan(user_query, retrieved_lvas, **kwargs)
+            try:
+                explanation = self._parse_plan_json(
+                    await self._agenerate(prompt, temperature=0.3, priority=PRIORITY_PLAN,
+                                          response_schema=EXPLANATION_RESPONSE_SCHEMA),
+                    schema=EXPLANATION_RESPONSE_SCHEMA,
+                )
+            except LLMRateLimitError:
+                raise
+            except Exception as e:
+                print(f"[ERROR] Error generating plan explanation: {e}")
+                explanation = {}
+            return self._merge_plan_explanation(plan_json, explanation), planning_context
+
+        prompt, planning_context = self._prepare_semester_plan_prompt(user_query, retrieved_lvas, **kwargs)
+
+        try:
+            response_text = await self._agenerate(prompt, temperature=0.3, priority=PRIORITY_PLAN,
+                                                  response_schema=PLAN_RESPONSE_SCHEMA)
+        except LLMRateLimitError:
+            raise
         except Exception as e:
-            return f"Fehler bei der Planungserstellung: {e}"
+            print(f"[ERROR] Error generating semester plan: {e}")
+            return {"error": str(e)}, planning_context
+
+        return self._parse_plan_json(response_text, schema=PLAN_RESPONSE_SCHEMA), planning_context
 
-    def create_semester_plan_json(
+    def solve_semester_plan(
+        self,
+        user_query: str,
+        retrieved_lvas: List[Dict[str, Any]],
+        ects_target: int,
+        preferred_days: List[str],
+        desired_lvas: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Regelbasierter Semesterplan ohne LLM (PlanSolver), im selben JSON-Format wie
+        create_semester_plan_json; reason enthält die Regel-Begründungen, summary ist leer.
+        """
+        result = self.plan_solver.solve(
+            retrieved_lvas,
+            ects_target=ects_target,
+            preferred_days=preferred_days,
+            desired_lvas=desired_lvas,
+        )
+        return result.to_plan_json(self._semester_from_query(user_query))
+
+    @staticmethod
+    def _semester_from_query(user_query: str) -> Optional[str]:
+        match = re.search(r"\b(SS|WS)\s?(\d{2})\b", user_query, re.IGNORECASE)
+        return f"{match.group(1).upper()}{match.group(2)}" if match else None
+
+    def _prepare_solved_plan(
         self,
         user_query: str,
         retrieved_lvas: List[Dict[str, Any]],
@@ -117,10 +569,109 @@ class SemesterPlanner:
         completed_lvas: Optional[List[str]] = None,
         desired_lvas: Optional[List[str]] = None,
         filtered_lvas: Optional[List[Dict[str, Any]]] = None,
-    ) -> tuple[Dict[str, Any], str]:
+    ) -> tuple[Dict[str, Any], str, str]:
         """
-        Erstellt einen Semesterplan als JSON für die Planning-Detail-Ansicht.
-        Wird aufgerufen wenn "Planung starten" Button geklickt wird.
+        Plant mit dem PlanSolver und baut den (kleinen) Prompt, mit dem das LLM nur
+        Begründungen und Zusammenfassung schreibt.
+
+        Returns:
+            Tuple: (plan_json, explanation_prompt, planning_context)
+        """
+        plan_json = self.solve_semester_plan(
+            user_query=user_query,
+            retrieved_lvas=retrieved_lvas,
+            ects_target=ects_target,
+            preferred_days=preferred_days,
+            desired_lvas=desired_lvas,
+        )
+
+        # Planning-Context wie bisher (wird in DB gespeichert und vom Chat wiederverwendet)
+        planning_context = self._build_planning_context(
+            user_query=user_query,
+            lva_list=self._format_lvas_for_prompt(retrieved_lvas, desired_lvas),
+            ects_target=ects_target,
+            preferred_days=preferred_days,
+            completed_lvas=completed_lvas or [],
+            desired_lvas=desired_lvas or [],
+            filtered_lvas=filtered_lvas or [],
+        )
+
+        planned = "\n".join(
+            f"- {lva['name']} ({lva['type']}) | {lva['ects']:g} ECTS | {lva['day']} {lva['time']} | "
+            f"Leiter: {lva['instructor']} | Regeln: {lva['reason']}"
+            for lva in plan_json["lvas"]
+        ) or "Keine LVA passt in die Vorgaben."
+
+        prompt = f"""Du bist UNI, ein **Studienplanungs-Assistent** für Bachelor Wirtschaftsinformatik an der JKU.
+
+Der folgende Semesterplan wurde bereits regelbasiert erstellt. ECTS-Obergrenze, Zeitkonflikte,
+VL/UE-Paare, doppelte LVAs, STEOP und der idealtypische Studienplan sind geprüft.
+**Ändere NICHTS an der Auswahl**, erkläre sie nur.
+
+**USER-ANFRAGE:**
+{user_query}
+
+**ZIEL-PARAMETER:**
+- maximales ECTS-Ziel: {ects_target} ECTS (geplant: {plan_json['total_ects']:g} ECTS)
+- Bevorzugte Tage: {", ".join(preferred_days) if preferred_days else "Keine Angabe"}
+- Bereits absolvierte LVAs: {", ".join(completed_lvas) if completed_lvas else "Keine"}
+- Gewünschte LVAs: {", ".join(desired_lvas) if desired_lvas else "Keine spezifischen Wünsche"}
+
+**GEPLANTE LVAs:**
+{planned}
+
+**HINWEISE DES PLANERS:**
+{plan_json['warnings'] or "Keine"}
+
+**OUTPUT-FORMAT:**
+Antworte AUSSCHLIESSLICH mit einem gültigen JSON-Objekt (KEIN anderer Text):
+
+{{
+  "lvas": [
+    {{"name": "LVA-Name wie oben", "type": "Typ wie oben", "reason": "Kurze Begründung"}}
+  ],
+  "summary": "Zusammenfassung der Planungsentscheidungen",
+  "warnings": "Hinweise oder leerer String"
+}}
+"""
+        self._save_prompt_to_file(prompt, user_query, len(retrieved_lvas))
+        return plan_json, prompt, planning_context
+
+    @staticmethod
+    def _merge_plan_explanation(plan_json: Dict[str, Any], explanation: Dict[str, Any]) -> Dict[str, Any]:
+        """Übernimmt Begründungen/Zusammenfassung des LLM; die LVA-Auswahl bleibt die des Solvers."""
+        reasons = {}
+        for entry in explanation.get("lvas") or []:
+            if isinstance(entry, dict) and entry.get("reason"):
+                reasons[(str(entry.get("name", "")).strip(), str(entry.get("type", "")).strip())] = entry["reason"]
+
+        for lva in plan_json["lvas"]:
+            lva["reason"] = reasons.get((lva["name"], lva["type"]), lva["reason"])
+
+        summary = explanation.get("summary")
+        if isinstance(summary, str) and summary.strip():
+            plan_json["summary"] = summary.strip()
+        else:
+            plan_json["summary"] = (f"Regelbasierter Plan mit {len(plan_json['lvas'])} LVAs "
+                                    f"und {plan_json['total_ects']:g} ECTS.")
+
+        llm_warnings = explanation.get("warnings")
+        if isinstance(llm_warnings, str) and llm_warnings.strip():
+            plan_json["warnings"] = "; ".join(part for part in (plan_json["warnings"], llm_warnings.strip()) if part)
+        return plan_json
+
+    def _prepare_semester_plan_prompt(
+        self,
+        user_query: str,
+        retrieved_lvas: List[Dict[str, Any]],
+        ects_target: int,
+        preferred_days: List[str],
+        completed_lvas: Optional[List[str]] = None,
+        desired_lvas: Optional[List[str]] = None,
+        filtered_lvas: Optional[List[Dict[str, Any]]] = None,
+    ) -> tuple[str, str]:
+        """
+        Baut den JSON-Prompt und den Planning-Context für einen Semesterplan.
 
         Args:
             user_query: Original User Query
@@ -132,14 +683,12 @@ class SemesterPlanner:
             filtered_lvas: LVAs die aufgrund fehlender Voraussetzungen gefiltert wurden (optional)
 
         Returns:
-            Tuple: (plan_json, planning_context)
-            - plan_json: Dictionary mit Semesterplan-Daten (JSON-kompatibel)
+            Tuple: (prompt, planning_context)
+            - prompt: LLM-Prompt mit JSON-Output-Format
             - planning_context: String mit Planning-Context (für DB-Speicherung und Chat)
         """
-        import json
-
         # Format LVA list for prompt
-        lva_list = self._format_lvas_for_prompt(retrieved_lvas)
+        lva_list = self._format_lvas_for_prompt(retrieved_lvas, desired_lvas)
 
         # Build Planning Context (wird in DB gespeichert für Chat-Antworten)
         planning_context = self._build_planning_context(
@@ -166,41 +715,29 @@ class SemesterPlanner:
         # Save prompt to file for debugging/testing in other LLMs
         self._save_prompt_to_file(prompt, user_query, len(retrieved_lvas))
 
-        # Generate Plan
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={"temperature": 0.3}
-            )
+        return prompt, planning_context
 
-            # Parse JSON response
-            response_text = response.text.strip()
-
-            # Remove markdown code blocks if present
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.startswith("```"):
-                response_text = response_text[3:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            response_text = response_text.strip()
-
-            # Parse JSON
-            plan_json = json.loads(response_text)
-            return plan_json, planning_context
-
-        except json.JSONDecodeError as e:
-            print(f"[ERROR] Failed to parse LLM response as JSON: {e}")
-            print(f"[ERROR] Response was: {response.text[:500]}")
+    def _parse_plan_json(self, response_text: str, schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Parst die LLM-Antwort als Plan-JSON. Kaputtes JSON (Codeblöcke, Text drumherum,
+        nicht escapte Anführungszeichen, ...) wird lokal repariert statt neu generiert.
+        Abgeschnittene Pläne bzw. LVAs mit fehlenden Feldern ergeben einen Fehler
+        (werden also auch nicht gecacht).
+        """
+        reject = PLAN_REJECTED_REPAIRS if schema is PLAN_RESPONSE_SCHEMA else ()
+        result = parse_json_response(response_text, schema, reject=reject)
+        structured_output_stats.record(result)
+
+        if not result.ok:
+            print(f"[ERROR] Failed to parse LLM response as JSON: {result.error}")
+            print(f"[ERROR] Response was: {response_text[:500]}")
             return {
                 "error": "JSON parsing failed",
-                "raw_response": response.text[:500]
-            }, planning_context
-        except Exception as e:
-            print(f"[ERROR] Error generating semester plan: {e}")
-            return {
-                "error": str(e)
-            }, planning_context
+                "raw_response": response_text[:500]
+            }
+        if result.repairs:
+            print(f"[JSON] Repaired LLM response locally: {sorted(set(result.repairs))}")
+        return result.data
 
     def _save_prompt_to_file(self, prompt: str, user_query: str, lva_count: int) -> None:
         """
@@ -261,29 +798,42 @@ class SemesterPlanner:
         except Exception as e:
             print(f"[WARNING] Could not save prompt to file: {e}")
 
-    def _format_lvas_for_prompt(self, lvas: List[Dict[str, Any]]) -> str:
-        """Formatiert LVA-Liste für LLM-Prompt."""
-        formatted = []
-
-        for lva in lvas:
-            metadata = lva.get("metadata", {})
-            content = lva.get("content", "")
-
-            # Extrahiere wichtige Info
-            lva_info = {
-                "Nr": metadata.get("lva_nr", "N/A"),
-                "Name": metadata.get("lva_name", "N/A"),
-                "Type": metadata.get("lva_type", "N/A"),
-                "ECTS": metadata.get("ects", "N/A"),
-                "Semester": metadata.get("semester", "N/A"),
-                "Tag": metadata.get("tag", "N/A"),
-                "Uhrzeit": metadata.get("uhrzeit", "N/A"),
-                "Leiter": metadata.get("lva_leiter", "N/A"),
-                "Voraussetzungen": metadata.get("anmeldevoraussetzungen", "Keine"),
-            }
+    def _format_lvas_for_prompt(self, lvas: List[Dict[str, Any]], desired_lvas: Optional[List[str]] = None) -> str:
+        """
+        Formatiert LVA-Liste für LLM-Prompt innerhalb des Token-Budgets (CONTEXT_TOKEN_BUDGET):
+        die relevantesten LVAs mit vollem Eintrag, der Rest als Einzeiler.
+        """
+        return self.context_packer.pack(
+            lvas,
+            format_full=self._format_lva_full,
+            format_compact=self._format_lva_compact,
+            desired_lvas=desired_lvas,
+        )
 
-            # Format als Stichpunkte mit vollständigem Content
-            formatted_lva = f"""
+    @staticmethod
+    def _lva_info(lva: Dict[str, Any]) -> Dict[str, Any]:
+        metadata = lva.get("metadata", {})
+
+        # Extrahiere wichtige Info
+        return {
+            "Nr": metadata.get("lva_nr", "N/A"),
+            "Name": metadata.get("lva_name", "N/A"),
+            "Type": metadata.get("lva_type", "N/A"),
+            "ECTS": metadata.get("ects", "N/A"),
+            "Semester": metadata.get("semester", "N/A"),
+            "Tag": metadata.get("tag", "N/A"),
+            "Uhrzeit": metadata.get("uhrzeit", "N/A"),
+            "Leiter": metadata.get("lva_leiter", "N/A"),
+            "Voraussetzungen": metadata.get("anmeldevoraussetzungen", "Keine"),
+        }
+
+    def _format_lva_full(self, lva: Dict[str, Any]) -> str:
+        """Voller Eintrag inkl. Content aus dem Studienhandbuch."""
+        lva_info = self._lva_info(lva)
+        content = lva.get("content", "")
+
+        # Format als Stichpunkte mit vollständigem Content
+        formatted_lva = f"""
 ================================================================
 LVA {lva_info['Nr']}: {lva_info['Name']} ({lva_info['Type']})
 ================================================================
@@ -296,9 +846,19 @@ LVA {lva_info['Nr']}: {lva_info['Name']} ({lva_info['Type']})
   DETAILLIERTE INFORMATIONEN AUS STUDIENHANDBUCH:
   {content if content else "Keine weiteren Details verfügbar."}
 """
-            formatted.append(formatted_lva.strip())
-
-        return "\n\n".join(formatted)
+        return formatted_lva.strip()
+
+    def _format_lva_compact(self, lva: Dict[str, Any]) -> str:
+        """Einzeiler ohne Content (für LVAs außerhalb des Token-Budgets für volle Einträge)."""
+        lva_info = self._lva_info(lva)
+        prerequisites = " ".join(str(lva_info["Voraussetzungen"]).split())
+        if len(prerequisites) > 120:
+            prerequisites = prerequisites[:117] + "..."
+        return (
+            f"- LVA {lva_info['Nr']}: {lva_info['Name']} ({lva_info['Type']}) | {lva_info['ECTS']} ECTS | "
+            f"{lva_info['Semester']} | {lva_info['Tag']} um {lva_info['Uhrzeit']} | "
+            f"Leiter: {lva_info['Leiter']} | Voraussetzungen: {prerequisites}"
+        )
 
     def _build_planning_prompt(
         self,
@@ -307,6 +867,7 @@ LVA {lva_info['Nr']}: {lva_info['Name']} ({lva_info['Type']})
     ) -> str:
         """
         Erstellt den LLM-Prompt für Chat-Antworten basierend auf dem Planning-Context.
+        Statischer Teil zuerst (Prefix, siehe prefix_cache), die Frage am Ende.
 
         Args:
             user_query: User-Anfrage
@@ -315,23 +876,33 @@ LVA {lva_info['Nr']}: {lva_info['Name']} ({lva_info['Type']})
         Returns:
             LLM-Prompt als String
         """
-        prompt = f"""**AKTUELLE USER-ANFRAGE (zu beantworten):**
-================================
-{user_query}
-================================
-**vorherige Anfrage Beginn:**
+        return self._build_chat_prefix(planning_context) + self._build_chat_question(user_query)
+
+    @staticmethod
+    def _build_chat_prefix(planning_context: str) -> str:
+        """Für eine Planning unveränderlicher Teil des Chat-Prompts (wird gecacht)."""
+        return f"""**vorherige Anfrage Beginn:**
 {planning_context}
 ================================
 **vorherige Anfrage Ende:**
 
 **OUTPUT-FORMAT:**
-Beantworte die Frage des Users in natürlicher Sprache.
+Beantworte die aktuelle Frage des Users (folgt unten) in natürlicher Sprache.
 Antworte **ausschließlich** aufgrund Informationen, die dir zur Verfügung stehen. Wenn du Fragen zum Studium Bachelor
 Wirtschaftinformatik nicht weißt, verweise auf das Studienhandbuch der JKU für unter https://studienhandbuch.jku.at/curr/1193 und
 für allgemeine Fragen zum Studium an der JKU auf https://www.jku.at/
 Formuliere deine Antwort **kurz** und freundlich.
 """
-        return prompt
+
+    @staticmethod
+    def _build_chat_question(user_query: str) -> str:
+        """Pro Turn wechselnder Teil des Chat-Prompts."""
+        return f"""
+**AKTUELLE USER-ANFRAGE (zu beantworten):**
+================================
+{user_query}
+================================
+"""
 
     def _build_planning_context(
         self,
@@ -456,6 +1027,7 @@ WICHTIG:
     def answer_study_question(self, question: str, context_lvas: List[Dict[str, Any]]) -> str:
         """
         Beantwortet allgemeine Studienfragen basierend auf LVA-Daten.
+        Gleiche Frage zu denselben LVAs wird aus dem Response-Cache beantwortet.
 
         Args:
             question: User-Frage (z.B. "Muss ich in BWL eine Klausur schreiben?")
@@ -464,6 +1036,51 @@ WICHTIG:
         Returns:
             Antwort als String
         """
+        prompt, lva_context = self._build_study_question_prompt(question, context_lvas)
+
+        cache_key = self.response_cache.make_key("study_question", lva_context, question)
+        embedding = self._question_embedding(cache_key, question)
+        cached = self.response_cache.get(cache_key, embedding)
+        if cached is not None:
+            print("[RESPONSE CACHE] Hit for study question")
+            return cached
+
+        try:
+            answer = self._generate(prompt, temperature=0.1)
+
+        except LLMRateLimitError:
+            raise
+        except Exception as e:
+            return f"Fehler bei der Beantwortung: {e}"
+
+        self.response_cache.put(cache_key, answer, embedding)
+        return answer
+
+    async def aanswer_study_question(self, question: str, context_lvas: List[Dict[str, Any]]) -> str:
+        """Async Variante von answer_study_question() (LLM-Call im Executor)."""
+        await self.ideal_plan_loader.arefresh()
+        prompt, lva_context = self._build_study_question_prompt(question, context_lvas)
+
+        cache_key = self.response_cache.make_key("study_question", lva_context, question)
+        embedding = await self._aquestion_embedding(cache_key, question)
+        cached = self.response_cache.get(cache_key, embedding)
+        if cached is not None:
+            print("[RESPONSE CACHE] Hit for study question")
+            return cached
+
+        try:
+            answer = await self._agenerate(prompt, temperature=0.1)
+
+        except LLMRateLimitError:
+            raise
+        except Exception as e:
+            return f"Fehler bei der Beantwortung: {e}"
+
+        self.response_cache.put(cache_key, answer, embedding)
+        return answer
+
+    def _build_study_question_prompt(self, question: str, context_lvas: List[Dict[str, Any]]) -> tuple[str, str]:
+        """Erstellt den LLM-Prompt für allgemeine Studienfragen (prompt, LVA-Kontext)."""
         # Format LVAs
         lva_context = self._format_lvas_for_prompt(context_lvas)
 
@@ -482,13 +1099,4 @@ WICHTIG:
 
 **ANTWORT:**
 """
-
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={"temperature": 0.1}
-            )
-            return response.text
-
-        except Exception as e:
-            return f"Fehler bei der Beantwortung: {e}"
+        return prompt, lva_context
@@ -0,0 +1,319 @@
+"""
+Structured Output: JSON-Schemas für die Plan-Antworten + lokale Reparatur.
+
+Gemini bekommt response_mime_type="application/json" und das passende Schema,
+damit die Antwort direkt parsebar ist. Kommt trotzdem kaputtes JSON zurück, wird
+es lokal repariert statt einen neuen (mehrsekündigen) LLM-Call zu starten:
+
+- Markdown-Codeblöcke (```json ... ```) und Text vor/nach dem JSON-Objekt
+- nicht escapte Anführungszeichen und Zeilenumbrüche in Strings
+- Kommas vor } bzw. ]
+- abgeschnittene Antworten (offene Strings/Klammern werden geschlossen)
+
+Danach wird das Objekt gegen das Schema angeglichen (fehlende Pflichtfelder,
+"3,0" statt 3.0, ...). Reparaturen, bei denen Inhalt verloren geht (abgeschnittene
+Antwort, LVA ohne Tag/Zeit), kann der Aufrufer über reject als Fehler werten
+(PLAN_REJECTED_REPAIRS). Erfolgs-, Reparatur- und Fehlerquoten zählt
+structured_output_stats (/metrics/llm).
+"""
+
+import copy
+import json
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Schemas im Format von generation_config["response_schema"] (OpenAPI-Subset)
+_LVA_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "name": {"type": "STRING"},
+        "type": {"type": "STRING"},
+        "ects": {"type": "NUMBER"},
+        "day": {"type": "STRING"},
+        "time": {"type": "STRING"},
+        "instructor": {"type": "STRING"},
+        "reason": {"type": "STRING"},
+    },
+    "required": ["name", "type", "ects", "day", "time", "instructor", "reason"],
+}
+
+PLAN_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "semester": {"type": "STRING"},
+        "total_ects": {"type": "NUMBER"},
+        "uni_days": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "lvas": {"type": "ARRAY", "items": _LVA_SCHEMA},
+        "summary": {"type": "STRING"},
+        "warnings": {"type": "STRING"},
+    },
+    "required": ["semester", "total_ects", "uni_days", "lvas", "summary", "warnings"],
+}
+
+# Solver-Engine: das LLM liefert nur Begründungen + Zusammenfassung
+EXPLANATION_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "lvas": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "name": {"type": "STRING"},
+                    "type": {"type": "STRING"},
+                    "reason": {"type": "STRING"},
+                },
+                "required": ["name", "type", "reason"],
+            },
+        },
+        "summary": {"type": "STRING"},
+        "warnings": {"type": "STRING"},
+    },
+    "required": ["lvas", "summary", "warnings"],
+}
+
+_CODE_FENCE_PATTERN = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+_CLOSERS = {"{": "}", "[": "]"}
+_LITERALS = ("true", "false", "null")
+_DEFAULTS = {"STRING": "", "NUMBER": 0, "INTEGER": 0, "BOOLEAN": False, "ARRAY": [], "OBJECT": {}}
+
+# Plan-Antworten: abgeschnitten bzw. Pflichtfeld in einem Array-Element (z.B. LVA ohne
+# day/time) aufgefüllt -> kein gültiger Plan, darf weder angezeigt noch gecacht werden
+PLAN_REJECTED_REPAIRS = frozenset({"truncated", "missing_item_field"})
+
+
+@dataclass
+class ParseResult:
+    data: Optional[Dict[str, Any]]
+    repairs: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.data is not None
+
+
+def _closes_string(text: str, index: int) -> bool:
+    """Beendet das Anführungszeichen bei index den String? (sonst ist es Teil des Inhalts)"""
+    rest = text[index + 1:].lstrip()
+    if not rest or rest[0] in ":}]":
+        return True
+    if rest[0] != ",":
+        return False
+    after = rest[1:].lstrip()
+    return (
+        not after
+        or after[0] in '"{[}]-'
+        or after[0].isdigit()
+        or after.startswith(_LITERALS)
+    )
+
+
+def _scan_object(text: str) -> Tuple[str, List[str]]:
+    """
+    Extrahiert das erste JSON-Objekt aus text und repariert es dabei (string-aware).
+    Liefert (json_text, repairs).
+    """
+    repairs: List[str] = []
+    start = text.find("{")
+    if start < 0:
+        return "", repairs
+    if text[:start].strip():
+        repairs.append("leading_text")
+
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    index = start
+    while index < len(text):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                if _closes_string(text, index):
+                    in_string = False
+                else:
+                    out.append("\\")
+                    repairs.append("unescaped_quote")
+            elif char in "\n\r\t":
+                out.append({"\n": "\\n", "\r": "\\r", "\t": "\\t"}[char])
+                repairs.append("control_character")
+                index += 1
+                continue
+            out.append(char)
+        elif char == '"':
+            in_string = True
+            out.append(char)
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+            out.append(char)
+        elif char in "}]":
+            # Komma vor der schließenden Klammer entfernen
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+                repairs.append("trailing_comma")
+            if stack and stack[-1] == char:
+                stack.pop()
+            out.append(char)
+            if not stack:
+                if text[index + 1:].strip():
+                    repairs.append("trailing_text")
+                return "".join(out), repairs
+        else:
+            out.append(char)
+        index += 1
+
+    # abgeschnittene Antwort: offenen String und Klammern schließen
+    repairs.append("truncated")
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    tail = "".join(out).rstrip()
+    if tail.endswith(","):
+        tail = tail[:-1]
+    elif tail.endswith(":"):
+        tail += " null"
+    return tail + "".join(reversed(stack)), repairs
+
+
+def _to_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(str(value).replace(",", ".").strip())
+    except ValueError:
+        return None
+
+
+def conform(value: Any, schema: Dict[str, Any], repairs: List[str], in_array: bool = False) -> Any:
+    """
+    Gleicht value an das Schema an (Typen, fehlende Pflichtfelder); unbekannte Felder bleiben.
+    Fehlende Pflichtfelder in Array-Elementen zählen als "missing_item_field".
+    """
+    kind = schema.get("type")
+    if kind == "OBJECT":
+        if not isinstance(value, dict):
+            repairs.append("schema_type")
+            value = {}
+        properties = schema.get("properties", {})
+        for key in schema.get("required", []):
+            if key not in value or value[key] is None:
+                repairs.append("missing_item_field" if in_array else "missing_field")
+                value[key] = copy.deepcopy(_DEFAULTS.get(properties.get(key, {}).get("type")))
+        for key, sub_schema in properties.items():
+            if key in value:
+                value[key] = conform(value[key], sub_schema, repairs)
+        return value
+    if kind == "ARRAY":
+        if value is None:
+            repairs.append("schema_type")
+            return []
+        if not isinstance(value, list):
+            repairs.append("schema_type")
+            value = [value]
+        return [conform(item, schema.get("items", {}), repairs, in_array=True) for item in value]
+    if kind in ("NUMBER", "INTEGER"):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+        repairs.append("schema_type")
+        number = _to_number(value)
+        return number if number is not None else 0
+    if kind == "STRING":
+        if value is None:
+            repairs.append("schema_type")
+            return ""
+        if not isinstance(value, str):
+            repairs.append("schema_type")
+            return str(value)
+    return value
+
+
+def parse_json_response(
+    text: str,
+    schema: Optional[Dict[str, Any]] = None,
+    reject: Iterable[str] = (),
+) -> ParseResult:
+    """
+    Parst eine LLM-Antwort als JSON-Objekt: zuerst direkt, dann mit lokaler Reparatur.
+    Mit schema wird das Ergebnis zusätzlich an das Schema angeglichen.
+    Braucht es eine der Reparaturen in reject, gilt die Antwort als fehlgeschlagen.
+    """
+    text = (text or "").strip()
+    repairs: List[str] = []
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        data, error = None, str(e)
+        fenced = _CODE_FENCE_PATTERN.search(text)
+        if fenced:
+            repairs.append("code_fence")
+            text = fenced.group(1).strip()
+            try:
+                data = json.loads(text)
+            except json.JSONDecodeError as fence_error:
+                error = str(fence_error)
+        if data is None:
+            candidate, scan_repairs = _scan_object(text)
+            repairs.extend(scan_repairs)
+            try:
+                data = json.loads(candidate) if candidate else None
+            except json.JSONDecodeError as scan_error:
+                error = str(scan_error)
+            if data is None:
+                return ParseResult(data=None, repairs=repairs, error=error)
+
+    if not isinstance(data, dict):
+        return ParseResult(data=None, repairs=repairs, error=f"expected JSON object, got {type(data).__name__}")
+    if schema is not None:
+        data = conform(data, schema, repairs)
+    rejected = sorted(set(repairs) & set(reject))
+    if rejected:
+        return ParseResult(data=None, repairs=repairs, error=f"incomplete response ({', '.join(rejected)})")
+    return ParseResult(data=data, repairs=repairs)
+
+
+class StructuredOutputStats:
+    """Zähler: direkt parsebar / lokal repariert / fehlgeschlagen + Art der Reparaturen."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clean = 0
+        self.repaired = 0
+        self.failed = 0
+        self.repairs: Counter = Counter()
+
+    def record(self, result: ParseResult) -> None:
+        with self._lock:
+            if not result.ok:
+                self.failed += 1
+            elif result.repairs:
+                self.repaired += 1
+            else:
+                self.clean += 1
+            self.repairs.update(set(result.repairs))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.clean + self.repaired + self.failed
+            return {
+                "total": total,
+                "clean": self.clean,
+                "repaired": self.repaired,
+                "failed": self.failed,
+                "failure_rate": self.failed / total if total else 0.0,
+                "repair_rate": self.repaired / total if total else 0.0,
+                "repairs": dict(self.repairs),
+            }
+
+
+structured_output_stats = StructuredOutputStats()
@@ -2,7 +2,8 @@
 #frontend is deployed on localhost:4200
 #backend is deployed on localhost:8080
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware #needed for angular connection
 #package imports:
 from .routes import auth_routes
@@ -10,6 +11,15 @@ from .routes import planning_routes
 from .routes import profile_routes
 from .routes import chat_routes
 from .db import init_db_pool, close_db_pool
+from .completed_cache import completed_lva_cache
+from .plan_cache import plan_cache
+from .retrieval.embedding_cache import embedding_cache
+from .llm_connection.response_cache import response_cache
+from .llm_connection.prefix_cache import prefix_cache
+from .llm_connection.llm_scheduler import LLMRateLimitError, llm_scheduler
+from .llm_connection.structured_output import structured_output_stats
+import asyncio
+import os
 #lifespan event handler
 from contextlib import asynccontextmanager
 
@@ -19,6 +29,16 @@ from contextlib import asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Startup was successful")
     await init_db_pool()
+    # metadata filter needs studyverse_to_numeric() (created by Database/sql / the migration)
+    from .retrieval.hybrid_retriever import acheck_numeric_function
+    await acheck_numeric_function()
+    # static reference data (lvas, wahlfach, ideal plan, prerequisite graph) once at startup
+    from .retrieval.catalog import catalog_manager
+    await catalog_manager.aload()
+    # numpy retrieval engine: load the vector snapshot once at startup (not on the first request)
+    if os.getenv("RETRIEVAL_ENGINE", "postgres").lower() == "numpy":
+        from .retrieval.vector_snapshot import vector_snapshot_manager
+        await asyncio.to_thread(vector_snapshot_manager.load)
     yield
     print("Shutdown initiated")
     await close_db_pool()
@@ -41,6 +61,36 @@ app.include_router(planning_routes.router)
 app.include_router(profile_routes.router)
 app.include_router(chat_routes.router)
 
+# LLM queue full / Gemini quota exhausted -> 429, the client retries after Retry-After seconds
+@app.exception_handler(LLMRateLimitError)
+async def llm_rate_limit_handler(request: Request, exc: LLMRateLimitError):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 @app.get("/")
 async def root():
     return {"message": "StudyVerse API is running"}
+
+
+@app.get("/metrics/cache")
+async def cache_metrics():
+    """Hit-Rates der prozesslokalen Caches (Monitoring)."""
+    return {
+        "completed_lvas": completed_lva_cache.stats(),
+        "embeddings": embedding_cache.stats(),
+        "responses": response_cache.stats(),
+        "plans": plan_cache.stats(),
+        "prompt_prefixes": prefix_cache.stats(),
+    }
+
+
+@app.get("/metrics/llm")
+async def llm_metrics():
+    """Auslastung des LLM-Schedulers und Fehler-/Reparaturquote der Plan-JSON-Antworten."""
+    return {
+        "scheduler": llm_scheduler.stats(),
+        "structured_output": structured_output_stats.stats(),
+    }
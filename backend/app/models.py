@@ -44,6 +44,7 @@ class PlanningResponse(BaseModel):
     semester_plan_json: Optional[dict] = None  # LLM-generated semester plan as JSON
     created_at: datetime
     last_modified: datetime
+    from_cache: bool = False  # True if the semester plan came from the plan cache (POST /plannings/new)
 
     class Config:
         from_attributes = True
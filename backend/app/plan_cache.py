@@ -0,0 +1,111 @@
+"""
+Plan Cache: generierte Semesterpläne pro kanonischem Parameter-Set.
+
+Studierende desselben Jahrgangs starten oft mit identischen Eingaben
+(Semester, ECTS-Ziel, Tage, absolvierte LVAs, gewünschte LVAs). Für diese
+Kombination + Katalog-Version liefert der Cache Plan-JSON und Planning-Context
+direkt, ohne Retrieval und ohne Gemini-Call.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from cachetools import TTLCache
+
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "256"))
+PLAN_CACHE_TTL = int(os.getenv("PLAN_CACHE_TTL", "1800"))  # Sekunden
+
+# Trennzeichen im Freitext "mandatory_courses" (z.B. "Statistik, SOFT1 und BWL")
+_TERM_SEPARATORS = re.compile(r"[,;\n]|\s+und\s+", re.IGNORECASE)
+
+
+def mandatory_course_terms(mandatory_courses: Optional[str]) -> List[str]:
+    """Zerlegt den Freitext der Pflicht-LVAs in einzelne Begriffe (leere werden verworfen)."""
+    if not mandatory_courses:
+        return []
+    return [term.strip() for term in _TERM_SEPARATORS.split(mandatory_courses) if term.strip()]
+
+
+def canonical_desired_lvas(desired_lvas: Iterable[str], lva_index=None) -> List[str]:
+    """
+    Gewünschte LVAs kanonisch: über den LvaIndex auf lvas.id ("SOFT1" und der volle Name
+    ergeben denselben Key), nicht auflösbare Namen normalisiert.
+    """
+    canonical = set()
+    for term in desired_lvas:
+        ids = lva_index.resolve(term) if lva_index is not None else frozenset()
+        if ids:
+            canonical.update(f"id:{lva_id}" for lva_id in ids)
+        else:
+            canonical.add(" ".join(term.split()).casefold())
+    return sorted(canonical)
+
+
+class PlanCache:
+    def __init__(self, maxsize: int = PLAN_CACHE_SIZE, ttl: int = PLAN_CACHE_TTL):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(
+        semester: Optional[str],
+        ects_target: Any,
+        preferred_days: Iterable[str],
+        completed_ids: Iterable[int],
+        desired_lvas: Iterable[str],
+        catalog_version: str,
+    ) -> str:
+        """Hash über die kanonische Form der Planungs-Parameter (Reihenfolge egal)."""
+        canonical = {
+            "semester": (semester or "").upper(),
+            "ects_target": float(ects_target) if ects_target is not None else None,
+            "preferred_days": sorted(set(preferred_days or [])),
+            "completed_ids": sorted(set(completed_ids)),
+            "desired_lvas": sorted(set(desired_lvas)),
+            "catalog_version": catalog_version,
+        }
+        return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """(plan_json, planning_context) als Kopie, oder None."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        plan_json, planning_context = entry
+        return copy.deepcopy(plan_json), planning_context
+
+    def put(self, key: str, plan_json: Dict[str, Any], planning_context: str) -> None:
+        """Nur erfolgreiche Pläne speichern (keine "error"-Antworten)."""
+        if not plan_json or "error" in plan_json:
+            return
+        with self._lock:
+            self._cache[key] = (copy.deepcopy(plan_json), planning_context)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "ttl": self._cache.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# Ein Cache pro Prozess (create_new_planning)
+plan_cache = PlanCache()
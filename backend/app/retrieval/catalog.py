@@ -0,0 +1,328 @@
+"""
+Course Catalog: unveränderlicher, versionierter Snapshot der statischen Referenzdaten.
+
+Ein CourseCatalog bündelt alles, was sich nur durch die Ingestion ändert:
+- lvas (Profile-Routes, LvaIndex)
+- wahlfach (Wahlfach-Katalog + Matcher)
+- ideal_study_plan (IdealPlanLoader)
+- lva_prerequisites + lva_nr-Metadaten aus studyverse_data (Voraussetzungs-Graph)
+
+Der CatalogManager lädt den Katalog beim Startup, prüft höchstens alle
+CATALOG_CHECK_INTERVAL Sekunden einen Fingerprint über alle Quelltabellen und
+tauscht bei Änderungen (z.B. nach der ETL-Pipeline) den kompletten Katalog atomar
+aus. Leser halten sich eine Referenz auf einen Katalog und sehen nie einen halb
+geladenen Zustand.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+import asyncpg
+import psycopg2
+import psycopg2.errors
+from ..db import init_db_pool
+from .lva_index import LVA_NR_QUERY, LvaIndex
+from .prerequisite_graph import GRAPH_QUERY, PrerequisiteGraph
+from .wahlfach_matcher import WAHLFAECHER_QUERY, WahlfachCatalog
+
+# Wie oft (Sekunden) höchstens geprüft wird, ob sich die Referenzdaten geändert haben
+CATALOG_CHECK_INTERVAL = int(os.getenv("CATALOG_CHECK_INTERVAL", "60"))
+
+CATALOG_LVAS_QUERY = """
+    SELECT id, hierarchielevel0, hierarchielevel1, hierarchielevel2, type, name, ects
+    FROM lvas
+    ORDER BY id
+"""
+
+IDEAL_PLAN_QUERY = """
+    SELECT DISTINCT *
+    FROM ideal_study_plan
+    ORDER BY semester_num, lva_name
+"""
+
+# Fingerprint über alle Quelltabellen: ändert sich bei jedem Insert/Update/Delete
+_CATALOG_VERSION_TEMPLATE = """
+    SELECT md5(concat_ws('|',
+        (SELECT md5(COALESCE(string_agg(concat_ws(':', id, hierarchielevel0, hierarchielevel1, hierarchielevel2, type, name, ects), '|' ORDER BY id), '')) FROM lvas),
+        (SELECT md5(COALESCE(string_agg(lva_name, '|' ORDER BY lva_name), '')) FROM wahlfach),
+        (SELECT md5(COALESCE(string_agg(concat_ws(':', id, semester_num, lva_name, study_mode, study_start_mode), '|' ORDER BY id), '')) FROM ideal_study_plan),
+        {prerequisites},
+        (SELECT concat_ws(':', COUNT(*), MAX(id), MAX(created_at)) FROM studyverse_data)
+    ))
+"""
+CATALOG_VERSION_QUERY = _CATALOG_VERSION_TEMPLATE.format(
+    prerequisites="(SELECT md5(COALESCE(string_agg(concat_ws(':', lva_name, lva_type, required_lva_id), '|' "
+                  "ORDER BY lva_name, lva_type, required_lva_id), '')) FROM lva_prerequisites)"
+)
+# lva_prerequisites legt erst die ETL an (build_prerequisite_graph bzw. Database/sql)
+CATALOG_VERSION_QUERY_WITHOUT_PREREQUISITES = _CATALOG_VERSION_TEMPLATE.format(prerequisites="'no lva_prerequisites'")
+
+
+@dataclass(frozen=True)
+class CatalogLva:
+    id: int
+    hierarchielevel0: Optional[str]
+    hierarchielevel1: Optional[str]
+    hierarchielevel2: Optional[str]
+    type: Optional[str]
+    name: Optional[str]
+    ects: Decimal
+
+
+@dataclass(frozen=True)
+class CatalogModule:
+    """Vorberechnetes Modul der Profil-Hierarchie (hierarchielevel1 → LVAs)."""
+    module_name: str
+    lvas: Tuple[CatalogLva, ...]
+    total_ects: float
+
+
+def _build_modules(lvas: Tuple[CatalogLva, ...]) -> Tuple[CatalogModule, ...]:
+    """Gruppiert nach hierarchielevel1 (Reihenfolge des ersten Auftretens, wie bisher mit defaultdict)."""
+    grouped: Dict[str, List[CatalogLva]] = {}
+    for lva in lvas:
+        grouped.setdefault(lva.hierarchielevel1, []).append(lva)
+    return tuple(
+        CatalogModule(module_name=name, lvas=tuple(members), total_ects=sum(float(lva.ects) for lva in members))
+        for name, members in grouped.items()
+    )
+
+
+class CourseCatalog:
+    """Unveränderlicher Stand aller Referenzdaten (nur lesen, nie in-place ändern)."""
+
+    def __init__(
+        self,
+        version: str,
+        lva_rows: List[tuple],
+        wahlfach_names: List[str],
+        ideal_plan_rows: List[Dict[str, Any]],
+        prerequisite_edges: List[tuple],
+        lva_nr_rows: List[tuple],
+    ):
+        self.version = version
+        self.loaded_at = time.time()
+
+        self.lvas: Tuple[CatalogLva, ...] = tuple(CatalogLva(*row) for row in lva_rows)
+        self.lvas_by_id: Dict[int, CatalogLva] = {lva.id: lva for lva in self.lvas}
+
+        # Reihenfolge wie bisher in den Profile-Routes (ORDER BY ...)
+        self.pflichtfaecher: Tuple[CatalogLva, ...] = tuple(
+            sorted((lva for lva in self.lvas if lva.hierarchielevel0 == "Pflichtfach"), key=lambda lva: lva.id)
+        )
+        self.wahlfaecher: Tuple[CatalogLva, ...] = tuple(
+            sorted(
+                (lva for lva in self.lvas if lva.hierarchielevel0 == "Wahlfach"),
+                key=lambda lva: (lva.hierarchielevel1 or "", lva.hierarchielevel2 or "", lva.type or ""),
+            )
+        )
+
+        # Modul-Hierarchie für /profile/pflichfaecher und /profile/wahlfaecher
+        self.pflichtfach_modules = _build_modules(self.pflichtfaecher)
+        self.wahlfach_modules = _build_modules(self.wahlfaecher)
+
+        self.wahlfach = WahlfachCatalog(version, wahlfach_names)
+        self.lva_index = LvaIndex(
+            [(lva.id, lva.name, lva.hierarchielevel2, lva.type) for lva in self.lvas],
+            lva_nr_rows,
+        )
+        self.prerequisite_graph = PrerequisiteGraph(prerequisite_edges, self.lva_index)
+        self._ideal_plan_rows: Tuple[Dict[str, Any], ...] = tuple(dict(row) for row in ideal_plan_rows)
+        self._ideal_semesters: Dict[Tuple[str, str], Dict[int, int]] = {}
+
+    def ideal_plan(self, study_mode: str = "Teilzeit", study_start_mode: str = "Start_WS") -> List[Dict[str, Any]]:
+        """Einträge des idealtypischen Studienplans (Kopien, sortiert nach Semester und Name)."""
+        return [
+            dict(row) for row in self._ideal_plan_rows
+            if row.get("study_mode") == study_mode and row.get("study_start_mode") == study_start_mode
+        ]
+
+    def ideal_semesters(self, study_mode: str = "Teilzeit", study_start_mode: str = "Start_WS") -> Dict[int, int]:
+        """Frühestes Semester im idealtypischen Plan pro lvas.id (Ranking/Priorität, einmal pro Katalog)."""
+        key = (study_mode, study_start_mode)
+        semesters = self._ideal_semesters.get(key)
+        if semesters is None:
+            semesters = {}
+            for row in self.ideal_plan(study_mode, study_start_mode):
+                semester = row.get("semester_num")
+                if semester is None:
+                    continue
+                for lva_id in self.lva_index.resolve(row.get("lva_name") or ""):
+                    semesters[lva_id] = min(semester, semesters.get(lva_id, semester))
+            self._ideal_semesters[key] = semesters
+        return semesters
+
+
+class CatalogManager:
+    """
+    Hält den aktuellen Katalog und tauscht ihn atomar aus, sobald sich der
+    Fingerprint der Quelltabellen ändert.
+    """
+
+    def __init__(self, check_interval: int = CATALOG_CHECK_INTERVAL):
+        self.db_url = os.getenv("DATABASE_URL")
+        self.check_interval = check_interval
+        self.catalog: Optional[CourseCatalog] = None
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+        # async: höchstens ein Versions-Check/Reload gleichzeitig, die übrigen Requests warten
+        self._areload_lock = asyncio.Lock()
+
+    def _check_due(self) -> bool:
+        return self.catalog is None or time.time() - self._last_check >= self.check_interval
+
+    def _swap(self, catalog: CourseCatalog) -> CourseCatalog:
+        self.catalog = catalog
+        self._last_check = time.time()
+        print(f"[CATALOG] Loaded catalog version {catalog.version} ({len(catalog.lvas)} LVAs, "
+              f"{len(catalog.wahlfach.names)} Wahlfächer, {len(catalog.prerequisite_graph.requirements)} LVAs mit Voraussetzungen)")
+        if not catalog.prerequisite_graph.requirements:
+            print("[CATALOG WARNING] lva_prerequisites is empty - prerequisites are NOT checked! "
+                  "Run: python -m data_ingestion.build_prerequisite_graph")
+        return catalog
+
+    @staticmethod
+    def _fetch_with_prerequisites(cur, query: str, fallback: Optional[str]) -> List[tuple]:
+        """
+        Query auf lva_prerequisites (psycopg2); fehlt die Tabelle, weil die ETL noch nicht
+        gelaufen ist, stattdessen fallback (None = keine Zeilen) statt eines Fehlers.
+        """
+        cur.execute("SAVEPOINT lva_prerequisites")
+        try:
+            cur.execute(query)
+        except psycopg2.errors.UndefinedTable:
+            cur.execute("ROLLBACK TO SAVEPOINT lva_prerequisites")
+            if fallback is None:
+                return []
+            cur.execute(fallback)
+        return cur.fetchall()
+
+    @staticmethod
+    async def _afetch_with_prerequisites(conn, query: str, fallback: Optional[str]) -> List[asyncpg.Record]:
+        """Async Variante von _fetch_with_prerequisites() (Savepoint über conn.transaction())."""
+        try:
+            async with conn.transaction():
+                return await conn.fetch(query)
+        except asyncpg.exceptions.UndefinedTableError:
+            return await conn.fetch(fallback) if fallback is not None else []
+
+    def load(self) -> CourseCatalog:
+        """Lädt alle Referenzdaten (sync, psycopg2) und tauscht den Katalog aus."""
+        with self._reload_lock:
+            conn = psycopg2.connect(self.db_url)
+            try:
+                # ein Snapshot für alle Queries: Version und Daten passen garantiert zusammen
+                conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+                cur = conn.cursor()
+                version = self._fetch_with_prerequisites(
+                    cur, CATALOG_VERSION_QUERY, CATALOG_VERSION_QUERY_WITHOUT_PREREQUISITES
+                )[0][0]
+                cur.execute(CATALOG_LVAS_QUERY)
+                lva_rows = cur.fetchall()
+                cur.execute(WAHLFAECHER_QUERY)
+                wahlfach_names = [row[0] for row in cur.fetchall()]
+                cur.execute(IDEAL_PLAN_QUERY)
+                columns = [desc[0] for desc in cur.description]
+                ideal_plan_rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+                prerequisite_edges = self._fetch_with_prerequisites(cur, GRAPH_QUERY, None)
+                cur.execute(LVA_NR_QUERY)
+                lva_nr_rows = cur.fetchall()
+                cur.close()
+            finally:
+                conn.close()
+
+            return self._swap(CourseCatalog(
+                version, lva_rows, wahlfach_names, ideal_plan_rows, prerequisite_edges, lva_nr_rows
+            ))
+
+    async def aload(self) -> CourseCatalog:
+        """Lädt alle Referenzdaten über den asyncpg-Pool und tauscht den Katalog aus."""
+        pool = await init_db_pool()
+        async with pool.acquire() as conn:
+            # ein Snapshot für alle Queries: Version und Daten passen garantiert zusammen
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                version = (await self._afetch_with_prerequisites(
+                    conn, CATALOG_VERSION_QUERY, CATALOG_VERSION_QUERY_WITHOUT_PREREQUISITES
+                ))[0][0]
+                lva_rows = [tuple(row) for row in await conn.fetch(CATALOG_LVAS_QUERY)]
+                wahlfach_names = [row["lva_name"] for row in await conn.fetch(WAHLFAECHER_QUERY)]
+                ideal_plan_rows = [dict(row) for row in await conn.fetch(IDEAL_PLAN_QUERY)]
+                prerequisite_edges = [
+                    tuple(row) for row in await self._afetch_with_prerequisites(conn, GRAPH_QUERY, None)
+                ]
+                lva_nr_rows = [tuple(row) for row in await conn.fetch(LVA_NR_QUERY)]
+
+        return self._swap(CourseCatalog(
+            version, lva_rows, wahlfach_names, ideal_plan_rows, prerequisite_edges, lva_nr_rows
+        ))
+
+    def current(self) -> CourseCatalog:
+        """Sync Zugriff: lädt neu, falls noch kein Katalog existiert oder der Fingerprint sich geändert hat."""
+        if not self._check_due():
+            return self.catalog
+
+        if self.catalog is None:
+            return self.load()
+
+        try:
+            conn = psycopg2.connect(self.db_url)
+            try:
+                cur = conn.cursor()
+                version = self._fetch_with_prerequisites(
+                    cur, CATALOG_VERSION_QUERY, CATALOG_VERSION_QUERY_WITHOUT_PREREQUISITES
+                )[0][0]
+                cur.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"[CATALOG WARNING] Version check failed, keeping catalog: {e}")
+            self._last_check = time.time()
+            return self.catalog
+
+        self._last_check = time.time()
+        if version != self.catalog.version:
+            print(f"[CATALOG] Reference data changed ({self.catalog.version} -> {version}), reloading")
+            return self.load()
+        return self.catalog
+
+    async def acurrent(self) -> CourseCatalog:
+        """Async Zugriff: Versions-Check und (seltenes) Neuladen über den asyncpg-Pool."""
+        if not self._check_due():
+            return self.catalog
+
+        async with self._areload_lock:
+            # ein anderer Request hat währenddessen geprüft bzw. neu geladen
+            if not self._check_due():
+                return self.catalog
+
+            if self.catalog is None:
+                return await self.aload()
+
+            # vor dem await: Requests, die jetzt ankommen, nehmen den aktuellen Katalog
+            self._last_check = time.time()
+            try:
+                pool = await init_db_pool()
+                async with pool.acquire() as conn:
+                    version = (await self._afetch_with_prerequisites(
+                        conn, CATALOG_VERSION_QUERY, CATALOG_VERSION_QUERY_WITHOUT_PREREQUISITES
+                    ))[0][0]
+            except Exception as e:
+                print(f"[CATALOG WARNING] Version check failed, keeping catalog: {e}")
+                return self.catalog
+
+            if version != self.catalog.version:
+                print(f"[CATALOG] Reference data changed ({self.catalog.version} -> {version}), reloading")
+                return await self.aload()
+            return self.catalog
+
+    def invalidate(self) -> None:
+        """Erzwingt beim nächsten Zugriff einen Fingerprint-Check (z.B. direkt nach der Ingestion)."""
+        self._last_check = 0.0
+
+
+# Ein Katalog pro Prozess, geteilt von Routes, HybridRetriever und IdealPlanLoader
+catalog_manager = CatalogManager()
@@ -0,0 +1,129 @@
+"""
+Eligibility Engine: absolvierte LVAs und Voraussetzungen als Bitmasken.
+
+Jede lvas.id bekommt eine feste Bit-Position. Ein Set von LVAs ist damit ein
+uint64-Vektor mit W = ceil(Anzahl LVAs / 64) Wörtern (das Curriculum hat < 128 LVAs,
+also 2 Wörter). Für eine Kandidatenliste gilt dann vektorisiert:
+
+    bereits absolviert:       lva_mask != 0  and  (lva_mask    & ~completed_mask) == 0
+    Voraussetzungen erfüllt:                      (prereq_mask & ~completed_mask) == 0
+
+evaluate_batch() prüft so die Eligibility vieler Studierender auf einmal (Batch-Jobs).
+"""
+
+import threading
+from typing import Any, Dict, FrozenSet, Iterable, List, Set, Tuple
+import numpy as np
+from .lva_index import LvaIndex
+
+# (lva_name, lva_type, lva_nr) wie in den studyverse_data-Metadaten
+CandidateKey = Tuple[str, str, str]
+
+
+class EligibilityEngine:
+    """Vorberechnete Masken für Voraussetzungen (pro LVA-Dokument) und LVAs selbst."""
+
+    def __init__(self, requirements: Dict[Tuple[str, str], FrozenSet[int]], lva_index: LvaIndex):
+        self.requirements = requirements
+        self.lva_index = lva_index
+        self.bit_of: Dict[int, int] = {lva_id: bit for bit, lva_id in enumerate(sorted(lva_index.names_by_id))}
+        self.words = max(1, (len(self.bit_of) + 63) // 64)
+
+        # Zeilen pro Kandidat (lazy, der Katalog ist endlich): Voraussetzungs-Maske + LVA-Maske
+        self._rows: Dict[CandidateKey, int] = {}
+        self._prereq_rows: List[np.ndarray] = []
+        self._lva_rows: List[np.ndarray] = []
+        self._prereq_matrix = np.zeros((0, self.words), dtype=np.uint64)
+        self._lva_matrix = np.zeros((0, self.words), dtype=np.uint64)
+        self._lock = threading.Lock()
+
+    def mask(self, lva_ids: Iterable[int]) -> np.ndarray:
+        """Set von lvas.id → Bitmaske (unbekannte IDs werden ignoriert)."""
+        return self.masks([lva_ids])[0]
+
+    def masks(self, id_sets: List[Iterable[int]]) -> np.ndarray:
+        """Mehrere Sets von lvas.id → (len(id_sets), words) Bitmasken in einem Schritt."""
+        rows = []
+        bits = []
+        for row, lva_ids in enumerate(id_sets):
+            for lva_id in lva_ids:
+                bit = self.bit_of.get(lva_id)
+                if bit is not None:
+                    rows.append(row)
+                    bits.append(bit)
+
+        masks = np.zeros((len(id_sets), self.words), dtype=np.uint64)
+        if bits:
+            bits_array = np.array(bits, dtype=np.uint64)
+            np.bitwise_or.at(
+                masks,
+                (np.array(rows, dtype=np.int64), (bits_array // np.uint64(64)).astype(np.int64)),
+                np.left_shift(np.uint64(1), bits_array % np.uint64(64)),
+            )
+        return masks
+
+    def completed_mask(self, completed_ids: Set[int]) -> np.ndarray:
+        return self.mask(completed_ids)
+
+    @staticmethod
+    def candidate_key(metadata: Dict[str, Any]) -> CandidateKey:
+        return (
+            metadata.get("lva_name") or "",
+            metadata.get("lva_type") or "",
+            str(metadata.get("lva_nr") or ""),
+        )
+
+    def _row(self, key: CandidateKey) -> int:
+        row = self._rows.get(key)
+        if row is None:
+            lva_name, lva_type, lva_nr = key
+            self._prereq_rows.append(self.mask(self.requirements.get((lva_name, lva_type), frozenset())))
+            self._lva_rows.append(self.mask(self.lva_index.resolve_document(lva_name, lva_type, lva_nr or None)))
+            row = len(self._prereq_rows) - 1
+            self._rows[key] = row
+        return row
+
+    def _matrices(self, keys: List[CandidateKey]) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            rows = np.array([self._row(key) for key in keys], dtype=np.int64)
+            if len(self._prereq_matrix) != len(self._prereq_rows):
+                self._prereq_matrix = np.vstack(self._prereq_rows)
+                self._lva_matrix = np.vstack(self._lva_rows)
+            return self._prereq_matrix[rows], self._lva_matrix[rows]
+
+    def evaluate(self, keys: List[CandidateKey], completed_mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Bewertet alle Kandidaten für EINEN User.
+
+        Returns:
+            (already_completed, prerequisites_met) als bool-Arrays der Länge len(keys)
+        """
+        if not keys:
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=bool)
+
+        prereq_masks, lva_masks = self._matrices(keys)
+        not_completed = ~completed_mask
+        already_completed = lva_masks.any(axis=1) & ((lva_masks & not_completed) == 0).all(axis=1)
+        prerequisites_met = ((prereq_masks & not_completed) == 0).all(axis=1)
+        return already_completed, prerequisites_met
+
+    def evaluate_batch(self, keys: List[CandidateKey], completed_sets: List[Set[int]]) -> np.ndarray:
+        """
+        Eligibility (nicht absolviert UND Voraussetzungen erfüllt) für viele User.
+
+        Returns:
+            bool-Matrix (len(completed_sets), len(keys))
+        """
+        if not keys or not completed_sets:
+            return np.zeros((len(completed_sets), len(keys)), dtype=bool)
+
+        prereq_masks, lva_masks = self._matrices(keys)
+        not_completed = ~self.masks(completed_sets)[:, None, :]
+        prerequisites_met = ((prereq_masks[None, :, :] & not_completed) == 0).all(axis=2)
+        already_completed = lva_masks.any(axis=1)[None, :] & ((lva_masks[None, :, :] & not_completed) == 0).all(axis=2)
+        return prerequisites_met & ~already_completed
+
+    def missing(self, key: CandidateKey, completed_ids: Set[int]) -> List[str]:
+        """Namen der fehlenden Voraussetzungen (nur für gefilterte Kandidaten, für die Begründung)."""
+        lva_name, lva_type, _ = key
+        return self.lva_index.names(self.requirements.get((lva_name, lva_type), frozenset()) - completed_ids)
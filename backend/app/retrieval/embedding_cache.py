@@ -0,0 +1,77 @@
+"""
+Embedding Cache: In-Process Cache für Query-Embeddings
+Die Planungs-Queries aus create_new_planning sind fast immer gleich aufgebaut
+("Ich möchte 30 ECTS im SS26 machen, an Mo., Di."), daher lohnt sich ein Cache
+vor dem Remote-Embedding-Endpoint (spart pro Treffer einen Netzwerk-Roundtrip).
+"""
+
+import os
+import re
+import threading
+from typing import List, Optional, Tuple, Dict, Any
+from cachetools import TTLCache
+
+
+# Default-Werte, können über .env überschrieben werden
+DEFAULT_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+DEFAULT_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", "3600"))  # Sekunden
+
+
+def normalize_query(query: str) -> str:
+    """Normalisiert Query-Text für den Cache-Key (Whitespace + Groß/Kleinschreibung)."""
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+
+class EmbeddingCache:
+    """
+    Begrenzter LRU-Cache mit TTL für Query-Embeddings.
+    Key = (Embedding-Modell, normalisierte Query), damit ein Modellwechsel
+    keine alten Vektoren zurückliefert.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE, ttl: int = DEFAULT_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_name: str, query: str) -> Tuple[str, str]:
+        return model_name, normalize_query(query)
+
+    def get(self, model_name: str, query: str) -> Optional[List[float]]:
+        key = self.make_key(model_name, query)
+        with self._lock:
+            embedding = self._cache.get(key)
+            if embedding is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return embedding
+
+    def put(self, model_name: str, query: str, embedding: List[float]) -> None:
+        key = self.make_key(model_name, query)
+        with self._lock:
+            self._cache[key] = embedding
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/Miss-Zähler für Monitoring/Debugging."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "ttl": self._cache.ttl,
+            }
+
+
+# Ein Cache pro Prozess: planning_routes und chat_routes haben je eine eigene
+# HybridRetriever-Instanz, sollen sich aber die Embeddings teilen
+embedding_cache = EmbeddingCache()
@@ -1,41 +1,83 @@
-
 import os
 import psycopg2
 from typing import List, Dict, Any, Optional
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from dotenv import load_dotenv
 from difflib import SequenceMatcher
-import re
+import json
+from decimal import Decimal
+from ..completed_cache import completed_lva_cache
+from ..db import init_db_pool
+from .embedding_cache import embedding_cache
+from .catalog import CourseCatalog, catalog_manager
+from .wahlfach_matcher import WahlfachCatalog
 
 load_dotenv()
 
+# Kandidaten-Limit für den Vektor-Index (0 = exakter Scan über alle Zeilen, Default).
+# > 0: die innere Query holt nur die n nächsten Chunks (ORDER BY embedding <=> q LIMIT n),
+# das kann ein HNSW/IVFFlat-Index (data_ingestion/vector_index.py) bedienen; dedupliziert
+# wird danach. Der Metadaten-Filter greift innerhalb dieser n Chunks (der Index filtert
+# nach), n muss also alle Chunks der in Frage kommenden LVAs abdecken.
+VECTOR_CANDIDATE_LIMIT = int(os.getenv("VECTOR_CANDIDATE_LIMIT", "0"))
 
-class HybridRetriever:
+# pgvector: hnsw.ef_search ist auf 1000 begrenzt, HNSW liefert nie mehr als ef_search Zeilen
+HNSW_MAX_EF_SEARCH = 1000
+
+
+# Existenz-Check für studyverse_to_numeric(text) (NULL = Funktion fehlt)
+NUMERIC_FUNCTION_QUERY = "SELECT to_regprocedure('studyverse_to_numeric(text)')"
+
+
+async def acheck_numeric_function() -> None:
     """
-    Hybrid Retrieval to combine:
-    1. Metadata-Filtering (hard constraints: Semester, days, ECTS)
-    2. Vector Similarity Search (for free text field)
+    Startup-Check: ohne studyverse_to_numeric() scheitert jede Retrieval-Query mit
+    ECTS-Filter (und jeder Plan wäre leer) -> lieber gar nicht erst starten.
+    """
+    pool = await init_db_pool()
+    async with pool.acquire() as conn:
+        exists = await conn.fetchval(NUMERIC_FUNCTION_QUERY)
+    if exists is None:
+        raise RuntimeError(
+            "Database function studyverse_to_numeric(text) is missing - "
+            "run Database/sql or: python -m data_ingestion.metadata_indexes"
+        )
+
+
+def _to_asyncpg_sql(sql: str) -> str:
+    """
+    Wandelt psycopg2-Platzhalter (%s) in asyncpg-Platzhalter ($1, $2, ...) um,
+    damit sync und async Pfad dieselben SQL-Builder nutzen können.
     """
+    parts = sql.split("%s")
+    converted = parts[0]
+    for index, part in enumerate(parts[1:], start=1):
+        converted += f"${index}{part}"
+    return converted
 
-    # Fallback: Bekannte Voraussetzungsketten (falls Metadaten fehlen/falsch sind)
-    KNOWN_PREREQUISITES = {
-        # SOFT-Kette
-        "Vertiefung Softwareentwicklung": ["Einführung in die Softwareentwicklung"],
-        "Software Engineering": ["Vertiefung Softwareentwicklung"],
-        "PR Software Engineering": ["Software Engineering"],
 
-        # DKE-Kette
-        "Data & Knowledge Engineering": ["Datenmodellierung"],
-        "PR Data & Knowledge Engineering": ["Data & Knowledge Engineering"],
+def _coerce_metadata(metadata: Any) -> Any:
+    """asyncpg liefert JSONB als String (psycopg2 als dict) -> vereinheitlichen."""
+    if isinstance(metadata, str):
+        try:
+            return json.loads(metadata)
+        except ValueError:
+            return metadata
+    return metadata
 
-        # COMM-Kette
-        "Communications Engineering": ["Prozess- und Kommunikationsmodellierung"],
 
-        # INFO-Kette
-        "Informationsmanagement": ["Einführung in die Wirtschaftsinformatik"],
-        "IT-Project Engineering & Management": ["Einführung in die Wirtschaftsinformatik"],
+class HybridRetriever:
+    """
+    Hybrid Retrieval to combine:
+    1. Metadata-Filtering (hard constraints: Semester, days, ECTS)
+    2. Vector Similarity Search (for free text field)
+    """
 
-        # Weitere bekannte Ketten können hier hinzugefügt werden
+    # Per-request search parameters for the vector index (see data_ingestion/vector_index.py)
+    # -> mapped to the pgvector settings and applied with SET LOCAL semantics
+    VECTOR_SEARCH_SETTINGS = {
+        "ef_search": "hnsw.ef_search",
+        "probes": "ivfflat.probes",
     }
 
     def __init__(self):
@@ -47,12 +89,117 @@ class HybridRetriever:
         if not gemini_api_key:
             raise ValueError("GEMINI_API_KEY not set in environment")
 
+        self.embedding_model_name = "models/text-embedding-004"
         self.embedding_model = GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004",
+            model=self.embedding_model_name,
             google_api_key=gemini_api_key
         )
+        self.embedding_cache = embedding_cache
+
+        # Retrieval engine: "postgres" (pgvector, default) or "numpy" (in-process snapshot)
+        self.engine = os.getenv("RETRIEVAL_ENGINE", "postgres").lower()
+        self.vector_snapshot = None
+        if self.engine == "numpy":
+            from .vector_snapshot import vector_snapshot_manager
+            self.vector_snapshot = vector_snapshot_manager
+
+        # Default search parameters (can be overridden per request via search_params)
+        self.default_search_params = {}
+        if os.getenv("VECTOR_EF_SEARCH"):
+            self.default_search_params["ef_search"] = int(os.getenv("VECTOR_EF_SEARCH"))
+        if os.getenv("VECTOR_IVFFLAT_PROBES"):
+            self.default_search_params["probes"] = int(os.getenv("VECTOR_IVFFLAT_PROBES"))
+
+        self.candidate_limit = VECTOR_CANDIDATE_LIMIT
+        if self.candidate_limit > HNSW_MAX_EF_SEARCH:
+            print(f"[RETRIEVAL WARNING] VECTOR_CANDIDATE_LIMIT={self.candidate_limit} > {HNSW_MAX_EF_SEARCH}: "
+                  f"a HNSW index returns at most {HNSW_MAX_EF_SEARCH} candidates")
+
+    def _search_settings(self, search_params: Optional[Dict[str, int]]) -> List[tuple]:
+        """
+        Kombiniert Default- und Request-Suchparameter zu (setting, value) Paaren,
+        z.B. {"ef_search": 80} -> [("hnsw.ef_search", "80")]
+        """
+        merged = {**self.default_search_params, **(search_params or {})}
+        for key in merged:
+            if key not in self.VECTOR_SEARCH_SETTINGS:
+                raise ValueError(f"Unknown vector search parameter '{key}', expected one of {list(self.VECTOR_SEARCH_SETTINGS)}")
+
+        if self.candidate_limit:
+            # HNSW liefert höchstens ef_search Zeilen -> sonst würde LIMIT n still gekürzt
+            merged["ef_search"] = max(
+                int(merged.get("ef_search", 0)), min(self.candidate_limit, HNSW_MAX_EF_SEARCH)
+            )
+
+        return [(self.VECTOR_SEARCH_SETTINGS[key], str(int(value))) for key, value in merged.items()]
+
+    def _embed_query(self, query: str) -> List[float]:
+        """Query-Embedding mit Cache (spart den Remote-Call bei wiederholten Queries)."""
+        embedding = self.embedding_cache.get(self.embedding_model_name, query)
+        if embedding is None:
+            embedding = self.embedding_model.embed_query(query)
+            self.embedding_cache.put(self.embedding_model_name, query, embedding)
+        return embedding
+
+    async def _aembed_query(self, query: str) -> List[float]:
+        """Async Variante von _embed_query()."""
+        embedding = self.embedding_cache.get(self.embedding_model_name, query)
+        if embedding is None:
+            embedding = await self.embedding_model.aembed_query(query)
+            self.embedding_cache.put(self.embedding_model_name, query, embedding)
+        return embedding
+
+    def embed_query(self, query: str) -> List[float]:
+        """Query-Embedding über den Embedding-Cache (z.B. für den semantischen Response-Cache)."""
+        return self._embed_query(query)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """Async Variante von embed_query()."""
+        return await self._aembed_query(query)
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embeddings für mehrere Queries: Cache-Treffer werden übernommen,
+        alle restlichen Queries gehen in EINEM embed_documents-Call raus.
+        """
+        embeddings = [self.embedding_cache.get(self.embedding_model_name, q) for q in queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            # task_type like embed_query, otherwise the vectors are document embeddings
+            fresh = self.embedding_model.embed_documents(
+                [queries[i] for i in missing], task_type="RETRIEVAL_QUERY"
+            )
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding
+                self.embedding_cache.put(self.embedding_model_name, queries[i], embedding)
+        return embeddings
+
+    async def _aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Async Variante von _embed_queries()."""
+        embeddings = [self.embedding_cache.get(self.embedding_model_name, q) for q in queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            fresh = await self.embedding_model.aembed_documents(
+                [queries[i] for i in missing], task_type="RETRIEVAL_QUERY"
+            )
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding
+                self.embedding_cache.put(self.embedding_model_name, queries[i], embedding)
+        return embeddings
+
+    @staticmethod
+    def _numeric_metadata_expr(field: str) -> str:
+        """
+        Numerischer Zugriff auf ein Metadaten-Feld.
+        studyverse_to_numeric() ist IMMUTABLE und liefert NULL statt eines Cast-Fehlers
+        bei nicht-numerischen Werten ("N/A", "3,00" wird zu 3.00). Angelegt wird sie von
+        Database/sql bzw. data_ingestion/metadata_indexes.py, der Startup prüft nur
+        (acheck_numeric_function).
+        """
+        return f"studyverse_to_numeric(metadata->>'{field}')"
 
-    def _build_metadata_sql_filter(self, filter_dict: Dict[str, Any]) -> tuple:
+    @classmethod
+    def _build_metadata_sql_filter(cls, filter_dict: Dict[str, Any]) -> tuple:
         """
         Build SQL-Where-Clause -> Filer-Dict = Key = String
                                                Value = Any
@@ -69,7 +216,7 @@ class HybridRetriever:
         if "$and" in filter_dict:
             and_conditions = []
             for condition in filter_dict["$and"]:
-                clause, param = self._parse_condition(condition) #builds sql-condition as tuple
+                clause, param = cls._parse_condition(condition) #builds sql-condition as tuple
                 if clause:
                     and_conditions.append(clause)
                     params.extend(param)
@@ -81,7 +228,7 @@ class HybridRetriever:
         elif "$or" in filter_dict:
             or_conditions = []
             for condition in filter_dict["$or"]:
-                clause, param = self._parse_condition(condition)
+                clause, param = cls._parse_condition(condition)
                 if clause:
                     or_conditions.append(clause)
                     params.extend(param)
@@ -90,7 +237,7 @@ class HybridRetriever:
 
         # single condition
         else:
-            clause, param = self._parse_condition(filter_dict)
+            clause, param = cls._parse_condition(filter_dict)
             if clause:
                 conditions.append(clause)
                 params.extend(param)
@@ -99,7 +246,8 @@ class HybridRetriever:
         return where_clause, params
 
 
-    def _parse_condition(self, condition: Dict[str, Any]) -> tuple:
+    @classmethod
+    def _parse_condition(cls, condition: Dict[str, Any]) -> tuple:
         """
             helper function for _build_metadata_sql_filter
             - called for every single condition in $and, $or or standalone condition
@@ -117,7 +265,7 @@ class HybridRetriever:
             if field == "$and":
                 and_conditions = []
                 for sub_condition in constraint:
-                    clause, param = self._parse_condition(sub_condition)
+                    clause, param = cls._parse_condition(sub_condition)
                     if clause:
                         and_conditions.append(clause)
                         params.extend(param)
@@ -128,7 +276,7 @@ class HybridRetriever:
             elif field == "$or":
                 or_conditions = []
                 for sub_condition in constraint:
-                    clause, param = self._parse_condition(sub_condition)
+                    clause, param = cls._parse_condition(sub_condition)
                     if clause:
                         or_conditions.append(clause)
                         params.extend(param)
@@ -147,12 +295,13 @@ class HybridRetriever:
                         conditions.append(f"metadata->>'{field}' IN ({placeholders})")
                         params.extend([str(v) for v in value])
                     elif operator == "$lte":
-                        # cast ECTS into float
-                        conditions.append(f"(metadata->>'{field}')::float <= %s")
-                        params.append(float(value))
+                        # typed numeric expression -> matches the expression index on ects
+                        # (see data_ingestion/metadata_indexes.py), params cast to numeric as well
+                        conditions.append(f"{cls._numeric_metadata_expr(field)} <= %s::numeric")
+                        params.append(Decimal(str(float(value))))
                     elif operator == "$gte":
-                        conditions.append(f"(metadata->>'{field}')::float >= %s")
-                        params.append(float(value))
+                        conditions.append(f"{cls._numeric_metadata_expr(field)} >= %s::numeric")
+                        params.append(Decimal(str(float(value))))
             else:
                 # Case B: constraint is not a dict -> equality given
                 conditions.append(f"metadata->>'{field}' = %s")
@@ -161,11 +310,216 @@ class HybridRetriever:
         where_clause = " AND ".join(conditions) if conditions else ""
         return where_clause, params
 
+    def _build_retrieval_query(
+        self,
+        query_embedding: List[float],
+        metadata_filter: Optional[Dict[str, Any]],
+        top_k: Optional[int],
+        include_content: bool = True,
+    ) -> tuple:
+        """
+        Baut die Hybrid-Query (Metadata-Filter + Vector Similarity) für retrieve()/aretrieve().
+        Returns a tuple (sql, params) with psycopg2 style placeholders (%s)
+        """
+        where_clause, params = self._build_metadata_sql_filter(metadata_filter or {})
+        content_column = "content" if include_content else "NULL::text AS content"
+
+        base_query = f"""
+            SELECT
+                id,
+                {content_column},
+                metadata,
+                url,
+                1 - (embedding <=> %s::vector) AS similarity
+            FROM studyverse_data
+        """
+                #similarty = 1 - distance
+        if where_clause:
+            base_query += f" WHERE {where_clause}"
+
+        # For semester planning: We want ALL LVAs matching the metadata filter, not just the most similar ones
+        # So we sort by similarity but don't limit (exact scan), unless a candidate limit is
+        # configured for the vector index (then ef_search >= limit, see _search_settings)
+        base_query += """
+            ORDER BY embedding <=> %s::vector
+        """
+
+        # Parameters: [query_embedding + metadata_params + query_embedding (+ candidate_limit)]
+        final_params = [query_embedding] + params + [query_embedding]
+        if self.candidate_limit:
+            base_query += " LIMIT %s"
+            final_params.append(self.candidate_limit)
+        return base_query, final_params
+
+    def _build_dedup_retrieval_query(
+        self,
+        query_embedding: List[float],
+        metadata_filter: Optional[Dict[str, Any]],
+        include_content: bool = True,
+    ) -> tuple:
+        """
+        Wie _build_retrieval_query(), aber die Deduplizierung passiert in SQL:
+        pro (lva_name, lva_type) wird nur der beste Chunk zurückgegeben (DISTINCT ON).
+        Übertragung und Python-Allokation skalieren dadurch mit der Anzahl der LVAs
+        statt mit der Anzahl der Chunks.
+        Returns a tuple (sql, params) with psycopg2 style placeholders (%s)
+        """
+        where_clause, params = self._build_metadata_sql_filter(metadata_filter or {})
+        base_query = self._dedup_subquery("%s::vector", where_clause, include_content, self.candidate_limit)
+        if self.candidate_limit:
+            # index-friendly inner query references the query vector a second time (ORDER BY)
+            return base_query, [query_embedding] + params + [query_embedding]
+        return base_query, [query_embedding] + params
+
+    @staticmethod
+    def _dedup_subquery(
+        vector_expr: str,
+        where_clause: str,
+        include_content: bool = True,
+        candidate_limit: int = 0,
+    ) -> str:
+        """
+        SQL für "bester Chunk pro LVA", sortiert nach Distanz zu vector_expr.
+        vector_expr ist entweder ein Platzhalter ("%s::vector") oder eine Spalte
+        aus einem äußeren LATERAL-Join (siehe _build_multi_retrieval_query).
+        include_content=False lässt den (großen) content weg -> Zwei-Phasen-Retrieval,
+        der content der übrigen LVAs wird danach mit load_content() nachgeladen.
+        candidate_limit > 0: die innere Query ist "ORDER BY embedding <=> q LIMIT n"
+        (Vektor-Index nutzbar), DISTINCT ON dedupliziert erst danach. Ein Platzhalter als
+        vector_expr kommt dann zweimal vor.
+        """
+        # same key as in _deduplicate_rows: (lva_name, lva_type), else lva_nr, else id
+        # invalid metadata (NULL or no JSON object) is skipped like in the python path
+        inner_where = "jsonb_typeof(metadata) = 'object'"
+        if where_clause:
+            inner_where += f" AND {where_clause}"
+        content_column = "content" if include_content else "NULL::text AS content"
+        candidate_order = ""
+        if candidate_limit:
+            candidate_order = f"ORDER BY embedding <=> {vector_expr} LIMIT {int(candidate_limit)}"
+
+        return f"""
+            SELECT id, content, metadata, url, 1 - distance AS similarity
+            FROM (
+                SELECT DISTINCT ON (lva_key) id, content, metadata, url, distance
+                FROM (
+                    SELECT
+                        id,
+                        {content_column},
+                        metadata,
+                        url,
+                        embedding <=> {vector_expr} AS distance,
+                        CASE
+                            WHEN NULLIF(metadata->>'lva_name', '') IS NOT NULL
+                             AND NULLIF(metadata->>'lva_type', '') IS NOT NULL
+                                THEN 'lva:' || (metadata->>'lva_name') || '|' || (metadata->>'lva_type')
+                            WHEN NULLIF(metadata->>'lva_nr', '') IS NOT NULL
+                                THEN 'nr:' || (metadata->>'lva_nr')
+                            ELSE 'id:' || id::text
+                        END AS lva_key
+                    FROM studyverse_data
+                    WHERE {inner_where}
+                    {candidate_order}
+                ) candidates
+                ORDER BY lva_key, distance
+            ) best_per_lva
+            ORDER BY distance
+        """
+
+    def _build_multi_retrieval_query(
+        self,
+        query_embeddings: List[List[float]],
+        metadata_filter: Optional[Dict[str, Any]],
+    ) -> tuple:
+        """
+        Eine SQL-Query für mehrere Query-Vektoren: die Vektoren werden als Array übergeben
+        und per LATERAL-Join jeweils mit der Dedup-Query aus _dedup_subquery() gescored.
+        Returns a tuple (sql, params), jede Zeile beginnt mit query_index (1-basiert).
+        """
+        where_clause, params = self._build_metadata_sql_filter(metadata_filter or {})
+        subquery = self._dedup_subquery("q.query_vector::vector", where_clause, candidate_limit=self.candidate_limit)
+
+        base_query = f"""
+            SELECT q.query_index, best.id, best.content, best.metadata, best.url, best.similarity
+            FROM unnest(%s::text[]) WITH ORDINALITY AS q(query_vector, query_index)
+            CROSS JOIN LATERAL ({subquery}) best
+            ORDER BY q.query_index, best.similarity DESC
+        """
+
+        # vectors as pgvector text literals ('[0.1,0.2,...]') -> no array-of-vector codec needed
+        vector_literals = ["[" + ",".join(str(float(x)) for x in embedding) + "]" for embedding in query_embeddings]
+        return base_query, [vector_literals] + params
+
+    def _group_rows_by_query(self, rows, n_queries: int) -> List[List[Dict[str, Any]]]:
+        """Teilt die Zeilen aus _build_multi_retrieval_query in eine Ergebnisliste pro Query."""
+        grouped = [[] for _ in range(n_queries)]
+        for row in rows:
+            grouped[int(row[0]) - 1].append(tuple(row)[1:])
+        return [self._deduplicate_rows(query_rows) for query_rows in grouped]
+
+    def _deduplicate_rows(self, rows) -> List[Dict[str, Any]]:
+        """
+        Entfernt Duplikate und behält nur den ersten (besten) Chunk pro (lva_name, lva_type).
+        Works for psycopg2 tuples and asyncpg records (index access).
+        """
+        print(f"[RETRIEVAL DEBUG] Fetched {len(rows)} documents from Vector DB (before deduplication)")
+        # (rows from _build_dedup_retrieval_query are already unique, this loop only validates them)
+
+        # remove duplicates and only keep the first (best) chunk from each (lva_name, lva_type)
+        # Different time slots (different lva_nr) of the same course should be deduplicated
+        seen_lvas = set()  # stores (lva_name, lva_type) tuples
+        unique_results = []
+
+        for row in rows:
+            metadata = _coerce_metadata(row[2])
+
+            # FIX: Prüfe ob metadata ein gültiges Dictionary ist
+            if not isinstance(metadata, dict):
+                # Skip Einträge mit fehlerhaftem metadata (None oder String)
+                print(f"[RETRIEVAL WARNING] Skipping entry with invalid metadata (ID: {row[0]}, type: {type(metadata).__name__})")
+                continue
+
+            lva_name = metadata.get("lva_name")
+            lva_type = metadata.get("lva_type")
+            lva_nr = metadata.get("lva_nr")
+
+            # Create unique key: (lva_name, lva_type)
+            # This ensures we only get ONE entry per course type (e.g. only one "VL Datenmodellierung")
+            # regardless of different time slots (lva_nr 258.100, 258.101, etc.)
+            if lva_name and lva_type:
+                lva_key = (lva_name, lva_type)
+            else:
+                # For entries without name/type (curriculum docs), use lva_nr or ID
+                lva_key = lva_nr if lva_nr else row[0]
+
+            # Only add if we haven't seen this (name, type) combination yet
+            if lva_key not in seen_lvas:
+                seen_lvas.add(lva_key)
+
+                unique_results.append({
+                    "id": row[0],
+                    "content": row[1],
+                    "metadata": metadata,
+                    "url": row[3],
+                    "similarity": float(row[4]) if row[4] else 0.0,
+                })
+
+                # Don't break early - we want ALL matching LVAs for comprehensive semester planning
+                # The top_k limit is only for the initial fetch, not for the final results
+
+        print(f"[RETRIEVAL DEBUG] After deduplication: {len(unique_results)} unique LVAs")
+        print(f"[RETRIEVAL DEBUG] Seen combinations: {len(seen_lvas)}")
+
+        return unique_results
+
     def retrieve(
         self,
         query: str,
         metadata_filter: Optional[Dict[str, Any]] = None,
         top_k: int = 100,
+        dedupe_in_sql: bool = True,
+        search_params: Optional[Dict[str, int]] = None,
+        defer_content: bool = False,
     ) -> List[Dict[str, Any]]:
 
         """
@@ -175,112 +529,267 @@ class HybridRetriever:
             query: User query für semantische Suche
             metadata_filter: Filter-Dict für Metadaten (Semester, Tage, etc.)
             top_k: Anzahl der Top-Ergebnisse (unique LVAs)
+            dedupe_in_sql: True = bester Chunk pro (lva_name, lva_type) direkt in SQL,
+                           False = alter Pfad (viele Chunks holen, in Python deduplizieren)
+            search_params: Index-Suchparameter für diesen Request, z.B. {"ef_search": 80}
+                           (HNSW) oder {"probes": 10} (IVFFlat)
+            defer_content: True = erste Phase liefert nur id, metadata, url, similarity
+                           (content = None), content danach mit load_content() für die
+                           tatsächlich verwendeten LVAs nachladen
 
         Returns:
             Liste von LVA-Dictionaries mit content, metadata, similarity
         """
-        # 1. generate emedding from user query
-        query_embedding = self.embedding_model.embed_query(query)
+        # invalid search_params are a caller error -> raise, don't return [] below
+        settings = self._search_settings(search_params)
+
+        # 1. generate emedding from user query (cached)
+        query_embedding = self._embed_query(query)
+
+        # numpy engine: filter + scoring in-process, no DB round trip (always deduplicated)
+        if self.vector_snapshot is not None:
+            try:
+                return self.vector_snapshot.current().search(query_embedding, metadata_filter)
+            except Exception as e:
+                print(f"Error during snapshot retrieval: {e}")
+                return []
 
         # 2. generate query from metadata filter and embedding (hybrid - metadata + similarity)
-        where_clause, params = self._build_metadata_sql_filter(metadata_filter or {})
+        if dedupe_in_sql:
+            base_query, final_params = self._build_dedup_retrieval_query(
+                query_embedding, metadata_filter, include_content=not defer_content
+            )
+        else:
+            base_query, final_params = self._build_retrieval_query(
+                query_embedding, metadata_filter, top_k, include_content=not defer_content
+            )
 
-        base_query = """
-            SELECT
-                id,
-                content,
-                metadata,
-                url,
-                1 - (embedding <=> %s::vector) AS similarity
-            FROM studyverse_data
+        # run query
+        try:
+            conn = psycopg2.connect(self.db_url)
+            cur = conn.cursor()
+
+            # set_config(..., true) only applies to the current transaction (like SET LOCAL)
+            for setting, value in settings:
+                cur.execute("SELECT set_config(%s, %s, true)", [setting, value])
+
+            cur.execute(base_query, final_params)
+            rows = cur.fetchall()
+
+            cur.close()
+            conn.close()
+
+            return self._deduplicate_rows(rows)
+
+        except Exception as e:
+            print(f"Error during retrieval: {e}")
+            return []
+
+    async def aretrieve(
+        self,
+        query: str,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        top_k: int = 100,
+        dedupe_in_sql: bool = True,
+        search_params: Optional[Dict[str, int]] = None,
+        defer_content: bool = False,
+    ) -> List[Dict[str, Any]]:
         """
-                #similarty = 1 - distance
-        if where_clause:
-            base_query += f" WHERE {where_clause}"
+        Async Variante von retrieve() für die FastAPI-Routes.
+        Nutzt den geteilten asyncpg-Pool aus db.py statt einer neuen Verbindung pro Aufruf,
+        damit der Event-Loop nicht blockiert wird.
+        """
+        settings = self._search_settings(search_params)
+        query_embedding = await self._aembed_query(query)
+
+        if self.vector_snapshot is not None:
+            try:
+                snapshot = await self.vector_snapshot.acurrent()
+                return snapshot.search(query_embedding, metadata_filter)
+            except Exception as e:
+                print(f"Error during snapshot retrieval: {e}")
+                return []
+
+        if dedupe_in_sql:
+            base_query, final_params = self._build_dedup_retrieval_query(
+                query_embedding, metadata_filter, include_content=not defer_content
+            )
+        else:
+            base_query, final_params = self._build_retrieval_query(
+                query_embedding, metadata_filter, top_k, include_content=not defer_content
+            )
 
-        # For semester planning: We want ALL LVAs matching the metadata filter, not just the most similar ones
-        # So we sort by similarity but don't limit too aggressively
-        base_query += """
-            ORDER BY embedding <=> %s::vector
+        try:
+            pool = await init_db_pool()
+            async with pool.acquire() as conn:
+                # transaction scope so the search settings don't leak into other pool users
+                async with conn.transaction():
+                    for setting, value in settings:
+                        await conn.execute("SELECT set_config($1, $2, true)", setting, value)
+                    rows = await conn.fetch(_to_asyncpg_sql(base_query), *final_params)
+
+            return self._deduplicate_rows(rows)
+
+        except Exception as e:
+            print(f"Error during retrieval: {e}")
+            return []
+
+    def retrieve_many(
+        self,
+        queries: List[str],
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        search_params: Optional[Dict[str, int]] = None,
+    ) -> List[List[Dict[str, Any]]]:
         """
+        Batched Retrieval für mehrere Queries (z.B. "What-if"-Varianten einer Planung).
+        Ein Embedding-Call und eine SQL-Query für alle Queries statt je einer pro Query.
 
-        # Determine fetch limit
-        # For semester planning we need ALL matching LVAs, so use a very high limit or no limit
-        if top_k is not None:
-            # Fetch many more to ensure we get all matching LVAs
-            # After deduplication (by lva_name+type), we'll have fewer anyway
-            fetch_limit = max(top_k * 50, 5000)  # At least 5000 to get comprehensive results
-        else:
-            fetch_limit = 10000  # Very high default to get all matches
+        Args:
+            queries: Liste von User Queries
+            metadata_filter: gemeinsamer Filter für alle Queries
+            search_params: Index-Suchparameter wie bei retrieve()
 
-        base_query += " LIMIT %s"
+        Returns:
+            Pro Query eine Ergebnisliste (gleiches Format wie retrieve()), in Query-Reihenfolge
+        """
+        settings = self._search_settings(search_params)
+        if not queries:
+            return []
 
-        # Parameters: [query_embedding + metadata_params + query_embedding + fetch_limit]
-        final_params = [query_embedding] + params + [query_embedding, fetch_limit]
+        query_embeddings = self._embed_queries(queries)
+
+        if self.vector_snapshot is not None:
+            try:
+                return self.vector_snapshot.current().search_many(query_embeddings, metadata_filter)
+            except Exception as e:
+                print(f"Error during snapshot retrieval: {e}")
+                return [[] for _ in queries]
+
+        base_query, final_params = self._build_multi_retrieval_query(query_embeddings, metadata_filter)
 
-        # run query
         try:
             conn = psycopg2.connect(self.db_url)
             cur = conn.cursor()
-
+            for setting, value in settings:
+                cur.execute("SELECT set_config(%s, %s, true)", [setting, value])
             cur.execute(base_query, final_params)
             rows = cur.fetchall()
+            cur.close()
+            conn.close()
 
-            print(f"[RETRIEVAL DEBUG] Fetched {len(rows)} documents from Vector DB (before deduplication)")
+            return self._group_rows_by_query(rows, len(queries))
 
-            # remove duplicates and only keep the first (best) chunk from each (lva_name, lva_type)
-            # Different time slots (different lva_nr) of the same course should be deduplicated
-            seen_lvas = set()  # stores (lva_name, lva_type) tuples
-            unique_results = []
+        except Exception as e:
+            print(f"Error during batched retrieval: {e}")
+            return [[] for _ in queries]
 
-            for row in rows:
-                metadata = row[2]
-
-                # FIX: Prüfe ob metadata ein gültiges Dictionary ist
-                if not isinstance(metadata, dict):
-                    # Skip Einträge mit fehlerhaftem metadata (None oder String)
-                    print(f"[RETRIEVAL WARNING] Skipping entry with invalid metadata (ID: {row[0]}, type: {type(metadata).__name__})")
-                    continue
-
-                lva_name = metadata.get("lva_name")
-                lva_type = metadata.get("lva_type")
-                lva_nr = metadata.get("lva_nr")
-
-                # Create unique key: (lva_name, lva_type)
-                # This ensures we only get ONE entry per course type (e.g. only one "VL Datenmodellierung")
-                # regardless of different time slots (lva_nr 258.100, 258.101, etc.)
-                if lva_name and lva_type:
-                    lva_key = (lva_name, lva_type)
-                else:
-                    # For entries without name/type (curriculum docs), use lva_nr or ID
-                    lva_key = lva_nr if lva_nr else row[0]
-
-                # Only add if we haven't seen this (name, type) combination yet
-                if lva_key not in seen_lvas:
-                    seen_lvas.add(lva_key)
-
-                    unique_results.append({
-                        "id": row[0],
-                        "content": row[1],
-                        "metadata": metadata,
-                        "url": row[3],
-                        "similarity": float(row[4]) if row[4] else 0.0,
-                    })
-
-                    # Don't break early - we want ALL matching LVAs for comprehensive semester planning
-                    # The top_k limit is only for the initial fetch, not for the final results
+    async def aretrieve_many(
+        self,
+        queries: List[str],
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        search_params: Optional[Dict[str, int]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Async Variante von retrieve_many() (asyncpg-Pool)."""
+        settings = self._search_settings(search_params)
+        if not queries:
+            return []
+
+        query_embeddings = await self._aembed_queries(queries)
+
+        if self.vector_snapshot is not None:
+            try:
+                snapshot = await self.vector_snapshot.acurrent()
+                return snapshot.search_many(query_embeddings, metadata_filter)
+            except Exception as e:
+                print(f"Error during snapshot retrieval: {e}")
+                return [[] for _ in queries]
+
+        base_query, final_params = self._build_multi_retrieval_query(query_embeddings, metadata_filter)
+
+        try:
+            pool = await init_db_pool()
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    for setting, value in settings:
+                        await conn.execute("SELECT set_config($1, $2, true)", setting, value)
+                    rows = await conn.fetch(_to_asyncpg_sql(base_query), *final_params)
+
+            return self._group_rows_by_query(rows, len(queries))
 
+        except Exception as e:
+            print(f"Error during batched retrieval: {e}")
+            return [[] for _ in queries]
+
+    CONTENT_QUERY = """
+        SELECT id, content
+        FROM studyverse_data
+        WHERE id = ANY(%s)
+    """
+
+    @staticmethod
+    def _missing_content_ids(lvas: List[Dict[str, Any]]) -> List[int]:
+        return list({lva["id"] for lva in lvas if lva.get("content") is None and lva.get("id") is not None})
+
+    def load_content(self, lvas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Zweite Phase zu retrieve(defer_content=True): lädt den content aller übergebenen
+        LVAs mit EINER Query nach (in-place) und gibt die Liste zurück.
+        Typischerweise nur für die eligible LVAs nach filter_by_prerequisites().
+        """
+        missing_ids = self._missing_content_ids(lvas)
+        if not missing_ids:
+            return lvas
+
+        try:
+            conn = psycopg2.connect(self.db_url)
+            cur = conn.cursor()
+            cur.execute(self.CONTENT_QUERY, [missing_ids])
+            content_by_id = dict(cur.fetchall())
             cur.close()
             conn.close()
+        except Exception as e:
+            print(f"Error loading LVA content: {e}")
+            return lvas
 
-            print(f"[RETRIEVAL DEBUG] After deduplication: {len(unique_results)} unique LVAs")
-            print(f"[RETRIEVAL DEBUG] Seen combinations: {len(seen_lvas)}")
+        for lva in lvas:
+            if lva.get("content") is None and lva.get("id") in content_by_id:
+                lva["content"] = content_by_id[lva["id"]]
+        return lvas
 
-            return unique_results
+    async def aload_content(self, lvas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Async Variante von load_content() (asyncpg-Pool)."""
+        missing_ids = self._missing_content_ids(lvas)
+        if not missing_ids:
+            return lvas
 
+        try:
+            pool = await init_db_pool()
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(_to_asyncpg_sql(self.CONTENT_QUERY), missing_ids)
+            content_by_id = {row["id"]: row["content"] for row in rows}
         except Exception as e:
-            print(f"Error during retrieval: {e}")
-            return []
+            print(f"Error loading LVA content: {e}")
+            return lvas
+
+        for lva in lvas:
+            if lva.get("content") is None and lva.get("id") in content_by_id:
+                lva["content"] = content_by_id[lva["id"]]
+        return lvas
+
+    # check content or metadata for lva name
+    LVA_NAME_QUERY = """
+        SELECT
+            id,
+            content,
+            metadata,
+            url
+        FROM studyverse_data
+        WHERE
+            content ILIKE %s
+            OR metadata->>'lva_name' ILIKE %s
+            OR metadata->>'lva_code' ILIKE %s
+        LIMIT %s
+    """
 
     def retrieve_by_lva_name(self, lva_name: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """
@@ -291,23 +800,8 @@ class HybridRetriever:
             conn = psycopg2.connect(self.db_url)
             cur = conn.cursor()
 
-            # check content or metadata for lva name
-            query = """
-                SELECT
-                    id,
-                    content,
-                    metadata,
-                    url
-                FROM studyverse_data
-                WHERE
-                    content ILIKE %s
-                    OR metadata->>'lva_name' ILIKE %s
-                    OR metadata->>'lva_code' ILIKE %s
-                LIMIT %s
-            """
-
             search_pattern = f"%{lva_name}%"
-            cur.execute(query, [search_pattern, search_pattern, search_pattern, top_k])
+            cur.execute(self.LVA_NAME_QUERY, [search_pattern, search_pattern, search_pattern, top_k])
             rows = cur.fetchall()
 
             results = []
@@ -328,95 +822,39 @@ class HybridRetriever:
             print(f"Error during LVA name search: {e}")
             return []
 
-    def _extract_prerequisite_names(self, anmeldevoraussetzungen: str) -> List[str]:
-        """
-        Extrahiert LVA-Namen aus dem Freitext-Feld 'anmeldevoraussetzungen'.
-
-        Beispiele:
-        - "positive Absolvierung von SOFT1 VL" → ["SOFT1"]
-        - "VL Einführung in die Softwareentwicklung" → ["VL Einführung in die Softwareentwicklung"]
+    async def aretrieve_by_lva_name(self, lva_name: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Async Variante von retrieve_by_lva_name() (asyncpg-Pool)."""
+        try:
+            pool = await init_db_pool()
+            search_pattern = f"%{lva_name}%"
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(
+                    _to_asyncpg_sql(self.LVA_NAME_QUERY),
+                    search_pattern, search_pattern, search_pattern, top_k
+                )
+
+            return [
+                {
+                    "id": row["id"],
+                    "content": row["content"],
+                    "metadata": _coerce_metadata(row["metadata"]),
+                    "url": row["url"],
+                }
+                for row in rows
+            ]
 
-        Returns:
-            Liste von extrahierten LVA-Namen/Codes
-        """
-        if not anmeldevoraussetzungen or anmeldevoraussetzungen.strip().lower() == "keine":
+        except Exception as e:
+            print(f"Error during LVA name search: {e}")
             return []
 
-        prerequisites = []
-
-        # Stopwörter die KEINE LVA-Codes sind
-        STOPWORDS = {"ODER", "UND", "IT", "VO", "VL", "UE", "PR", "SE", "KS", "KV", "PS", "PE", "PJ", "KT", "IN", "AN", "IM"}
-
-        # Pattern für LVA-Codes MIT Nummer (z.B. SOFT1, ALGO2, DKE3)
-        lva_code_with_number = r'\b([A-Z]{2,6}\d+)\b'
-        codes_with_number = re.findall(lva_code_with_number, anmeldevoraussetzungen)
-        prerequisites.extend(codes_with_number)
-
-        # Pattern für bekannte LVA-Codes OHNE Nummer (z.B. SOFT, ALGO, DKE, BWL)
-        # Nur wenn sie 3-6 Buchstaben haben und NICHT in Stopwords sind
-        lva_code_pattern = r'\b([A-Z]{3,6})\b'
-        codes = re.findall(lva_code_pattern, anmeldevoraussetzungen)
-        for code in codes:
-            if code not in STOPWORDS:
-                prerequisites.append(code)
-
-        # Pattern für vollständige LVA-Namen (z.B. "VL Softwareentwicklung")
-        # Suche nach "VL/UE/PR/..." gefolgt von Text
-        lva_name_pattern = r'((?:VL|UE|PR|SE|KS|KV|PS|PE|PJ|KT)\s+[A-ZÄÖÜ][a-zäöüß\s]+)'
-        names = re.findall(lva_name_pattern, anmeldevoraussetzungen)
-        prerequisites.extend(names)
-
-        print(f"[EXTRACT DEBUG] Raw: '{anmeldevoraussetzungen}' -> Extracted: {prerequisites}")
-
-        return prerequisites
-
-    def _check_prerequisites_met(
-        self,
-        prerequisite_names: List[str],
-        completed_lvas: List[str]
-    ) -> Dict[str, bool]:
-        """
-        Prüft ob Voraussetzungen erfüllt sind via Fuzzy Matching.
-
-        Args:
-            prerequisite_names: Liste von benötigten LVA-Namen/Codes
-            completed_lvas: Liste von absolvierten LVA-Namen
-
-        Returns:
-            Dict mit {prerequisite_name: is_met}
-        """
-        results = {}
-
-        print(f"[PREREQ DEBUG] Checking prerequisites: {prerequisite_names}")
-
-        for prereq in prerequisite_names:
-            is_met = False
-            prereq_lower = prereq.lower().strip()
-
-            # Prüfe gegen jede completed LVA
-            for completed in completed_lvas:
-                completed_lower = completed.lower().strip()
-
-                # LIKE-ähnliches Substring-Matching
-                if prereq_lower in completed_lower or completed_lower in prereq_lower:
-                    is_met = True
-                    print(f"[PREREQ DEBUG]   [+] '{prereq}' MATCHED '{completed}' (substring match)")
-                    break
-
-            if not is_met:
-                print(f"[PREREQ DEBUG]   [-] '{prereq}' NOT MATCHED")
-
-            results[prereq] = is_met
-
-        return results
-
     def filter_by_prerequisites(
         self,
         retrieved_lvas: List[Dict[str, Any]],
         completed_lvas: List[str],
         target_semester: Optional[str] = None,
         user_query: Optional[str] = None,
-        excluded_wahlfaecher: Optional[List[str]] = None
+        excluded_wahlfaecher: Optional[List[str]] = None,
+        catalog: Optional[CourseCatalog] = None,
     ) -> Dict[str, List[Dict[str, Any]]]:
         """
         Filtert LVAs basierend auf Voraussetzungen, bereits absolvierten LVAs, Wahlfächern UND Semester.
@@ -427,6 +865,8 @@ class HybridRetriever:
            AUSNAHME: Wahlfächer in excluded_wahlfaecher oder im user_query erwähnt werden NICHT gefiltert
         2. Bereits absolviert → wird gefiltert
         3. Voraussetzungen nicht erfüllt → wird gefiltert
+           (lva_prerequisites, beim ETL kompiliert: alle benötigten lvas.id müssen absolviert sein)
+        Check 2 und 3 laufen vektorisiert über die EligibilityEngine (Bitmasken).
 
         Args:
             retrieved_lvas: Retrieved documents von retrieve()
@@ -434,6 +874,7 @@ class HybridRetriever:
             target_semester: Gewünschtes Semester (z.B. "SS", "WS") - optional
             user_query: User-Query um explizit gewünschte Wahlfächer zu erkennen - optional
             excluded_wahlfaecher: Liste von Wahlfach-Namen, die NICHT gefiltert werden sollen - optional
+            catalog: Bereits geladener CourseCatalog (z.B. aus afilter_by_prerequisites) - optional
 
         Returns:
             {
@@ -441,8 +882,8 @@ class HybridRetriever:
                 "filtered": [       # LVAs die gefiltert wurden
                     {
                         "lva": {...},
-                        "missing_prerequisites": ["SOFT1", "ALGO"],
-                        "reason": "Fehlende Voraussetzungen: SOFT1, ALGO"
+                        "missing_prerequisites": ["VL Einführung in die Softwareentwicklung"],
+                        "reason": "Fehlende Voraussetzungen: VL Einführung in die Softwareentwicklung"
                     },
                     ...
                 ]
@@ -458,28 +899,39 @@ class HybridRetriever:
         if target_semester:
             print(f"[FILTER DEBUG] Target semester: {target_semester}")
 
-        # Lade alle Wahlfächer aus der Datenbank (einmalig für alle LVAs)
-        print(f"[FILTER DEBUG] Loading Wahlfächer from database...")
-        wahlfaecher_names = self._get_wahlfaecher_names()
+        # Referenzdaten (Wahlfächer, Voraussetzungs-Graph, LVA-Index) aus dem In-Memory-Katalog
+        if catalog is None:
+            catalog = catalog_manager.current()
+        wahlfach_catalog = catalog.wahlfach
+        prerequisite_graph = catalog.prerequisite_graph
 
         # Baue Liste von Wahlfächern, die NICHT gefiltert werden sollen
         final_excluded_wahlfaecher = []
         if excluded_wahlfaecher:
             final_excluded_wahlfaecher.extend(excluded_wahlfaecher)
 
-        # Extrahiere Wahlfach-Namen aus user_query (falls vorhanden)
+        # Extrahiere Wahlfach-Namen aus user_query (falls vorhanden) - ein Durchlauf über den Text
         if user_query:
-            user_query_lower = user_query.lower()
-            for wahlfach_name in wahlfaecher_names:
-                # Checke ob der Wahlfach-Name im User-Query vorkommt
-                if wahlfach_name.lower() in user_query_lower:
-                    final_excluded_wahlfaecher.append(wahlfach_name)
-                    print(f"[FILTER DEBUG] User erwähnt Wahlfach '{wahlfach_name}' -> wird NICHT gefiltert")
+            for wahlfach_name in wahlfach_catalog.mentioned_in(user_query):
+                final_excluded_wahlfaecher.append(wahlfach_name)
+                print(f"[FILTER DEBUG] User erwähnt Wahlfach '{wahlfach_name}' -> wird NICHT gefiltert")
 
         if final_excluded_wahlfaecher:
             print(f"[FILTER DEBUG] Wahlfächer die NICHT gefiltert werden: {final_excluded_wahlfaecher}")
 
-        for lva_doc in retrieved_lvas:
+        # Absolvierte LVAs als ID-Set, Bereits-absolviert- und Voraussetzungs-Check
+        # vektorisiert für alle Kandidaten (Bitmasken)
+        completed_ids = prerequisite_graph.resolve_completed(completed_lvas)
+        eligibility = prerequisite_graph.eligibility
+        candidate_keys = [
+            eligibility.candidate_key(doc.get("metadata") if isinstance(doc.get("metadata"), dict) else {})
+            for doc in retrieved_lvas
+        ]
+        already_completed, prerequisites_met = eligibility.evaluate(
+            candidate_keys, eligibility.completed_mask(completed_ids)
+        )
+
+        for index, lva_doc in enumerate(retrieved_lvas):
             metadata = lva_doc.get("metadata", {})
 
             # FIX: Prüfe ob metadata ein gültiges Dictionary ist
@@ -490,7 +942,6 @@ class HybridRetriever:
             lva_name = metadata.get("lva_name", "Unknown")
             lva_nr = metadata.get("lva_nr", "")
             lva_semester = metadata.get("semester", None)
-            anmeldevoraussetzungen = metadata.get("anmeldevoraussetzungen", "")
 
             # CHECK -1: SEMESTER-Filter (falls target_semester angegeben)
             if target_semester:
@@ -517,7 +968,7 @@ class HybridRetriever:
                         continue
 
             # CHECK 0: Ist die LVA ein WAHLFACH?
-            if self._is_wahlfach(lva_name, wahlfaecher_names, final_excluded_wahlfaecher):
+            if self._is_wahlfach(lva_name, wahlfach_catalog, final_excluded_wahlfaecher):
                 print(f"[FILTER DEBUG] [X] FILTERED (Wahlfach): {lva_name} ({lva_nr})")
                 filtered_lvas.append({
                     "lva": lva_doc,
@@ -526,21 +977,8 @@ class HybridRetriever:
                 })
                 continue
 
-            # 1. CHECK: Ist die LVA bereits absolviert?
-            is_already_completed = False
-            lva_name_lower = lva_name.lower().strip()
-            for completed in completed_lvas:
-                completed_lower = completed.lower().strip()
-                # LIKE-ähnliches Substring-Matching
-                if lva_name_lower in completed_lower or completed_lower in lva_name_lower:
-                    is_already_completed = True
-                    break
-                # Exakte Substring-Prüfung für LVA-Nr
-                if lva_nr and str(lva_nr) in completed:
-                    is_already_completed = True
-                    break
-
-            if is_already_completed:
+            # 1. CHECK: Ist die LVA bereits absolviert? (kanonische lvas.id, vorab als Bitmaske geprüft)
+            if already_completed[index]:
                 print(f"[FILTER DEBUG] [X] FILTERED (bereits absolviert): {lva_name} ({lva_nr})")
                 filtered_lvas.append({
                     "lva": lva_doc,
@@ -549,31 +987,10 @@ class HybridRetriever:
                 })
                 continue
 
-            # 2. CHECK: Voraussetzungen prüfen
-            prerequisite_names = []
-
-            # Zuerst: Versuche aus Metadaten zu extrahieren
-            if anmeldevoraussetzungen and anmeldevoraussetzungen.strip().lower() != "keine":
-                prerequisite_names = self._extract_prerequisite_names(anmeldevoraussetzungen)
-
-            # Fallback: Falls nichts extrahiert wurde, checke gegen bekannte Voraussetzungsketten
-            if not prerequisite_names and lva_name in self.KNOWN_PREREQUISITES:
-                prerequisite_names = self.KNOWN_PREREQUISITES[lva_name]
-                print(f"[FILTER DEBUG] [~] Using KNOWN prerequisites for '{lva_name}': {prerequisite_names}")
-
-            # Falls immer noch keine Voraussetzungen → eligible
-            if not prerequisite_names:
-                print(f"[FILTER DEBUG] [OK] ELIGIBLE (keine Voraussetzungen): {lva_name} ({lva_nr})")
-                eligible_lvas.append(lva_doc)
-                continue
-
-            # Prüfe welche Voraussetzungen erfüllt sind
-            prereq_check = self._check_prerequisites_met(prerequisite_names, completed_lvas)
-
-            missing = [name for name, met in prereq_check.items() if not met]
-
-            if missing:
-                # Nicht alle Voraussetzungen erfüllt
+            # 2. CHECK: Voraussetzungen prüfen (vorkompilierter Graph, vorab als Bitmaske geprüft)
+            if not prerequisites_met[index]:
+                # Nicht alle Voraussetzungen erfüllt (Namen nur für die Begründung auflösen)
+                missing = eligibility.missing(candidate_keys[index], completed_ids)
                 print(f"[FILTER DEBUG] [X] FILTERED (fehlende Voraussetzungen): {lva_name} ({lva_nr})")
                 print(f"              Fehlend: {', '.join(missing)}")
                 filtered_lvas.append({
@@ -582,7 +999,7 @@ class HybridRetriever:
                     "reason": f"Fehlende Voraussetzungen: {', '.join(missing)}"
                 })
             else:
-                # Alle Voraussetzungen erfüllt
+                # Alle Voraussetzungen erfüllt (oder keine vorhanden)
                 print(f"[FILTER DEBUG] [OK] ELIGIBLE (Voraussetzungen erfuellt): {lva_name} ({lva_nr})")
                 eligible_lvas.append(lva_doc)
 
@@ -591,32 +1008,36 @@ class HybridRetriever:
             "filtered": filtered_lvas
         }
 
+    async def afilter_by_prerequisites(
+        self,
+        retrieved_lvas: List[Dict[str, Any]],
+        completed_lvas: List[str],
+        target_semester: Optional[str] = None,
+        user_query: Optional[str] = None,
+        excluded_wahlfaecher: Optional[List[str]] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Async Variante von filter_by_prerequisites().
+        Prüft/lädt den Katalog über den asyncpg-Pool, das Filtern selbst ist reine CPU-Arbeit.
+        """
+        catalog = await catalog_manager.acurrent()
+        return self.filter_by_prerequisites(
+            retrieved_lvas=retrieved_lvas,
+            completed_lvas=completed_lvas,
+            target_semester=target_semester,
+            user_query=user_query,
+            excluded_wahlfaecher=excluded_wahlfaecher,
+            catalog=catalog,
+        )
+
     def get_completed_lvas_for_user(self, user_id: int) -> List[str]:
         """
         Gets all completed LVA names for a user from the database.
         Returns a l ist of completed LVA names (e.g., ["Einführung in die Softwareentwicklung", "BWL"])
+        Served from the per-user cache (invalidated by PUT /profile/lvas/completed).
         """
         try:
-            conn = psycopg2.connect(self.db_url)
-            cur = conn.cursor()
-
-            query = """
-                    SELECT l.name, l.ects, l.hierarchielevel2
-                    FROM completed_lvas cl
-                             JOIN lvas l ON cl.lva_id = l.id
-                    WHERE cl.user_id = %s \
-                    """
-
-            cur.execute(query, [user_id])
-            rows = cur.fetchall()
-
-            # Return list of LVA names
-            completed_lva_names = [row[0] for row in rows]
-
-            cur.close()
-            conn.close()
-
-            return completed_lva_names
+            return list(completed_lva_cache.get(user_id, self.db_url).names)
 
         except Exception as e:
             print(f"Error fetching completed LVAs: {e}")
@@ -624,42 +1045,41 @@ class HybridRetriever:
 
     def _get_wahlfaecher_names(self) -> List[str]:
         """
-        Holt alle Wahlfach-Namen aus der wahlfach Tabelle.
+        Holt alle Wahlfach-Namen (aus dem In-Memory-Katalog).
 
         Returns:
             Liste von Wahlfach-Namen (z.B., ["Data Mining", "Service Engineering"])
         """
-        try:
-            conn = psycopg2.connect(self.db_url)
-            cur = conn.cursor()
-
-            query = """
-                SELECT lva_name
-                FROM wahlfach
-            """
-            cur.execute(query)
-            rows = cur.fetchall()
-
-            # Return list of Wahlfach names
-            wahlfaecher = [row[0] for row in rows]
+        return self._get_wahlfach_catalog().names
 
-            cur.close()
-            conn.close()
+    def _get_wahlfach_catalog(self) -> WahlfachCatalog:
+        """Wahlfach-Katalog inkl. Matcher; DB-Zugriff nur beim ersten Laden/Fingerprint-Check."""
+        return catalog_manager.current().wahlfach
 
-            print(f"[WAHLFACH DEBUG] Loaded {len(wahlfaecher)} Wahlfächer from wahlfach table")
-            return wahlfaecher
+    async def aget_completed_lvas_for_user(self, user_id: int) -> List[str]:
+        """Async Variante von get_completed_lvas_for_user() (asyncpg-Pool)."""
+        try:
+            return list((await completed_lva_cache.aget(user_id)).names)
 
         except Exception as e:
-            print(f"Error fetching Wahlfächer from wahlfach table: {e}")
+            print(f"Error fetching completed LVAs: {e}")
             return []
 
-    def _is_wahlfach(self, lva_name: str, wahlfaecher_names: List[str], excluded_wahlfaecher: Optional[List[str]] = None) -> bool:
+    async def _aget_wahlfaecher_names(self) -> List[str]:
+        """Async Variante von _get_wahlfaecher_names() (asyncpg-Pool)."""
+        return (await self._aget_wahlfach_catalog()).names
+
+    async def _aget_wahlfach_catalog(self) -> WahlfachCatalog:
+        """Async Variante von _get_wahlfach_catalog() (asyncpg-Pool)."""
+        return (await catalog_manager.acurrent()).wahlfach
+
+    def _is_wahlfach(self, lva_name: str, wahlfach_catalog: WahlfachCatalog, excluded_wahlfaecher: Optional[List[str]] = None) -> bool:
         """
-        Checkt ob eine LVA ein Wahlfach ist via LIKE-ähnlichem Substring-Matching.
+        Checkt ob eine LVA ein Wahlfach ist (LIKE-ähnliches Substring-Matching, vorberechnet im Katalog).
 
         Args:
             lva_name: Name der zu prüfenden LVA
-            wahlfaecher_names: Liste aller Wahlfach-Namen aus der DB
+            wahlfach_catalog: Wahlfach-Katalog (Namen + Matcher + memoisierte Lookups)
             excluded_wahlfaecher: Liste von Wahlfächern, die NICHT gefiltert werden sollen
                                   (vom User explizit gewünscht)
 
@@ -677,24 +1097,9 @@ class HybridRetriever:
                     print(f"[WAHLFACH DEBUG]   [!] '{lva_name}' ist vom User gewuenscht -> NICHT filtern")
                     return False
 
-        # Check 1: Direkt "Wahlfach" oder "Freie Studienleistungen" im Namen
-        if "wahlfach" in lva_name_lower or "freie studienleistungen" in lva_name_lower:
-            print(f"[WAHLFACH DEBUG]   [+] '{lva_name}' MATCHED (contains 'wahlfach' or 'freie studienleistungen')")
+        # Check 1+2: Marker im Namen oder Substring-Match gegen die Wahlfach-Namen (memoisiert)
+        if wahlfach_catalog.is_wahlfach(lva_name):
+            print(f"[WAHLFACH DEBUG]   [+] '{lva_name}' MATCHED as Wahlfach")
             return True
 
-        # Check 2: LIKE-ähnliches Substring-Matching gegen Wahlfach-Namen aus DB
-        for wahlfach_name in wahlfaecher_names:
-            wahlfach_lower = wahlfach_name.lower().strip()
-
-            # Exakte Übereinstimmung
-            if lva_name_lower == wahlfach_lower:
-                print(f"[WAHLFACH DEBUG]   [+] '{lva_name}' MATCHED as Wahlfach: '{wahlfach_name}' (exact match)")
-                return True
-
-            # Substring-Match (ähnlich zu SQL LIKE '%name%')
-            # LVA-Name enthält Wahlfach-Name ODER umgekehrt
-            if wahlfach_lower in lva_name_lower or lva_name_lower in wahlfach_lower:
-                print(f"[WAHLFACH DEBUG]   [+] '{lva_name}' MATCHED as Wahlfach: '{wahlfach_name}' (substring/LIKE)")
-                return True
-
         return False
@@ -0,0 +1,148 @@
+"""
+LVA-Index: Normalisierung von LVA-Bezeichnern auf kanonische lvas.id.
+
+Aufgelöst werden
+- LVA-Namen inkl. Typ ("VL Einführung in die Softwareentwicklung") → genau diese LVA
+- Kursnamen ohne Typ ("Einführung in die Softwareentwicklung") → alle LVAs des Kurses
+- Codes/Aliase aus LVA_ALIASES (SOFT1, ALGO, DKE, ...) → alle LVAs des Kurses
+- lva_nr aus den studyverse_data-Metadaten → die LVA des Dokuments
+
+Damit werden "bereits absolviert" und Voraussetzungen zu Set-Operationen auf IDs
+statt Substring-Vergleichen in verschachtelten Schleifen.
+"""
+
+import re
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from .query_parser import LVA_ALIASES
+
+LVA_TYPES = ("VL", "UE", "PR", "SE", "KS", "KV", "PS", "PE", "PJ", "KT")
+
+LVAS_QUERY = """
+    SELECT id, name, hierarchielevel2, type
+    FROM lvas
+"""
+
+# lva_nr → (lva_name, lva_type) aus den Dokumenten, um lva_nr auf lvas.id abzubilden
+LVA_NR_QUERY = """
+    SELECT DISTINCT
+        metadata->>'lva_nr',
+        metadata->>'lva_name',
+        COALESCE(metadata->>'lva_type', '')
+    FROM studyverse_data
+    WHERE jsonb_typeof(metadata) = 'object'
+      AND metadata->>'lva_nr' IS NOT NULL
+      AND metadata->>'lva_name' IS NOT NULL
+"""
+
+
+def normalize_lva_name(name: str) -> str:
+    """Vergleichsform für LVA-Namen ("Data and Knowledge Engineering" == "Data & Knowledge Engineering")."""
+    normalized = name.casefold().replace("&", " and ")
+    return re.sub(r"\s+", " ", normalized).strip()
+
+
+def normalize_lva_nr(lva_nr: Any) -> str:
+    return str(lva_nr).strip()
+
+
+class LvaIndex:
+    """Vorberechnete Lookup-Tabellen von Namen/Codes/lva_nr auf lvas.id."""
+
+    def __init__(
+        self,
+        lva_rows: Iterable[Tuple[int, str, str, str]],
+        lva_nr_rows: Optional[Iterable[Tuple[str, str, str]]] = None,
+    ):
+        self.names_by_id: Dict[int, str] = {}
+        self.ids_by_name: Dict[str, FrozenSet[int]] = {}
+        self.ids_by_course: Dict[str, FrozenSet[int]] = {}
+        self.ids_by_lva_nr: Dict[str, FrozenSet[int]] = {}
+
+        ids_by_name: Dict[str, Set[int]] = {}
+        ids_by_course: Dict[str, Set[int]] = {}
+        for lva_id, name, course, _lva_type in lva_rows:
+            self.names_by_id[lva_id] = name
+            if name:
+                ids_by_name.setdefault(normalize_lva_name(name), set()).add(lva_id)
+            if course:
+                ids_by_course.setdefault(normalize_lva_name(course), set()).add(lva_id)
+        self.ids_by_name = {key: frozenset(ids) for key, ids in ids_by_name.items()}
+        self.ids_by_course = {key: frozenset(ids) for key, ids in ids_by_course.items()}
+
+        # Codes/Aliase einmal vorab auflösen
+        self.ids_by_alias: Dict[str, FrozenSet[int]] = {}
+        for alias, alias_names in LVA_ALIASES.items():
+            ids = set()
+            for alias_name in alias_names:
+                ids |= self.ids_by_course.get(normalize_lva_name(alias_name), frozenset())
+            if ids:
+                self.ids_by_alias[alias] = frozenset(ids)
+
+        ids_by_lva_nr: Dict[str, Set[int]] = {}
+        for lva_nr, lva_name, lva_type in lva_nr_rows or []:
+            ids = self.resolve_document(lva_name, lva_type)
+            if ids:
+                ids_by_lva_nr.setdefault(normalize_lva_nr(lva_nr), set()).update(ids)
+        self.ids_by_lva_nr = {key: frozenset(ids) for key, ids in ids_by_lva_nr.items()}
+
+    def resolve(self, term: str) -> FrozenSet[int]:
+        """Name, Kursname, Code/Alias oder lva_nr → lvas.id (leer = unbekannt)."""
+        normalized = normalize_lva_name(term)
+        if not normalized:
+            return frozenset()
+
+        # 1. exakter LVA-Name inkl. Typ ("VL ...")
+        ids = self.ids_by_name.get(normalized)
+        if ids:
+            return ids
+
+        # 2. Kursname ohne Typ
+        ids = self.ids_by_course.get(normalized)
+        if ids:
+            return ids
+
+        # 3. Alias/Code (SOFT1, ALGO, DKE, ...)
+        ids = self.ids_by_alias.get(term.strip().lower())
+        if ids:
+            return ids
+
+        # 4. lva_nr
+        ids = self.ids_by_lva_nr.get(normalize_lva_nr(term))
+        if ids:
+            return ids
+
+        # 5. "VL Kursname" wo nur ein Teil des Namens angegeben ist
+        parts = term.strip().split(maxsplit=1)
+        if len(parts) == 2 and parts[0] in LVA_TYPES:
+            return frozenset(
+                lva_id for name, ids in self.ids_by_name.items() if name.startswith(normalized) for lva_id in ids
+            )
+
+        return frozenset()
+
+    def resolve_document(self, lva_name: Optional[str], lva_type: Optional[str], lva_nr: Any = None) -> FrozenSet[int]:
+        """
+        LVA eines studyverse_data-Dokuments (metadata lva_name/lva_type/lva_nr) → lvas.id.
+        Ohne Typ (z.B. Curriculum-Eintrag) → alle LVAs des Kurses.
+        """
+        if lva_name and lva_type:
+            ids = self.ids_by_name.get(normalize_lva_name(f"{lva_type} {lva_name}"))
+            if ids:
+                return ids
+        if lva_nr:
+            ids = self.ids_by_lva_nr.get(normalize_lva_nr(lva_nr))
+            if ids:
+                return ids
+        if lva_name:
+            return self.resolve(lva_name)
+        return frozenset()
+
+    def resolve_many(self, terms: Iterable[str]) -> Set[int]:
+        """Mehrere Bezeichner (z.B. absolvierte LVAs) → ein Set von lvas.id."""
+        resolved: Set[int] = set()
+        for term in terms:
+            resolved |= self.resolve(term)
+        return resolved
+
+    def names(self, lva_ids: Iterable[int]) -> List[str]:
+        return sorted(self.names_by_id.get(lva_id, str(lva_id)) for lva_id in lva_ids)
@@ -0,0 +1,156 @@
+"""
+Prerequisite Graph: vorkompilierte Voraussetzungen pro LVA.
+
+Die ETL-Pipeline (data_ingestion/build_prerequisite_graph.py) parst das Freitext-Feld
+'anmeldevoraussetzungen' EINMAL, löst die gefundenen Namen/Codes auf lvas.id auf und
+speichert das Ergebnis in der Tabelle lva_prerequisites.
+Der Graph ist Teil des CourseCatalog (retrieval/catalog.py), der Retriever prüft
+Voraussetzungen per Set-Lookup, ohne Regex-Arbeit pro Request.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from .eligibility import EligibilityEngine
+from .lva_index import LvaIndex
+
+# Stopwörter die KEINE LVA-Codes sind
+PREREQUISITE_STOPWORDS = {"ODER", "UND", "IT", "VO", "VL", "UE", "PR", "SE", "KS", "KV", "PS", "PE", "PJ", "KT", "IN", "AN", "IM"}
+
+# Fallback: Bekannte Voraussetzungsketten (falls Metadaten fehlen/falsch sind)
+KNOWN_PREREQUISITES = {
+    # SOFT-Kette
+    "Vertiefung Softwareentwicklung": ["Einführung in die Softwareentwicklung"],
+    "Software Engineering": ["Vertiefung Softwareentwicklung"],
+    "PR Software Engineering": ["Software Engineering"],
+
+    # DKE-Kette
+    "Data & Knowledge Engineering": ["Datenmodellierung"],
+    "PR Data & Knowledge Engineering": ["Data & Knowledge Engineering"],
+
+    # COMM-Kette
+    "Communications Engineering": ["Prozess- und Kommunikationsmodellierung"],
+
+    # INFO-Kette
+    "Informationsmanagement": ["Einführung in die Wirtschaftsinformatik"],
+    "IT-Project Engineering & Management": ["Einführung in die Wirtschaftsinformatik"],
+
+    # Weitere bekannte Ketten können hier hinzugefügt werden
+}
+
+GRAPH_QUERY = """
+    SELECT lva_name, lva_type, required_lva_id
+    FROM lva_prerequisites
+"""
+
+
+def extract_prerequisite_names(anmeldevoraussetzungen: str) -> List[str]:
+    """
+    Extrahiert LVA-Namen aus dem Freitext-Feld 'anmeldevoraussetzungen'.
+
+    Beispiele:
+    - "positive Absolvierung von SOFT1 VL" → ["SOFT1"]
+    - "VL Einführung in die Softwareentwicklung" → ["VL Einführung in die Softwareentwicklung"]
+
+    Returns:
+        Liste von extrahierten LVA-Namen/Codes
+    """
+    if not anmeldevoraussetzungen or anmeldevoraussetzungen.strip().lower() == "keine":
+        return []
+
+    prerequisites = []
+
+    # Pattern für LVA-Codes MIT Nummer (z.B. SOFT1, ALGO2, DKE3)
+    lva_code_with_number = r'\b([A-Z]{2,6}\d+)\b'
+    codes_with_number = re.findall(lva_code_with_number, anmeldevoraussetzungen)
+    prerequisites.extend(codes_with_number)
+
+    # Pattern für bekannte LVA-Codes OHNE Nummer (z.B. SOFT, ALGO, DKE, BWL)
+    # Nur wenn sie 3-6 Buchstaben haben und NICHT in Stopwords sind
+    lva_code_pattern = r'\b([A-Z]{3,6})\b'
+    codes = re.findall(lva_code_pattern, anmeldevoraussetzungen)
+    for code in codes:
+        if code not in PREREQUISITE_STOPWORDS:
+            prerequisites.append(code)
+
+    # Pattern für vollständige LVA-Namen (z.B. "VL Softwareentwicklung")
+    # Suche nach "VL/UE/PR/..." gefolgt von Text
+    lva_name_pattern = r'((?:VL|UE|PR|SE|KS|KV|PS|PE|PJ|KT)\s+[A-ZÄÖÜ][a-zäöüß\s]+)'
+    names = re.findall(lva_name_pattern, anmeldevoraussetzungen)
+    prerequisites.extend(names)
+
+    return prerequisites
+
+
+def compile_prerequisite_edges(
+    lva_rows: List[Tuple[int, str, str, str]],
+    documents: List[Tuple[str, str, Optional[str]]],
+) -> Tuple[List[Tuple[str, str, int, str]], Dict[Tuple[str, str], List[str]]]:
+    """
+    Kompiliert die Voraussetzungen aller LVA-Dokumente zu Kanten.
+
+    Args:
+        lva_rows: (id, name, hierarchielevel2, type) aus der lvas-Tabelle
+        documents: (lva_name, lva_type, anmeldevoraussetzungen) aus studyverse_data
+
+    Returns:
+        Tuple: (edges, unresolved)
+        - edges: (lva_name, lva_type, required_lva_id, source)
+        - unresolved: {(lva_name, lva_type): [nicht auflösbare Namen/Codes]} zum Nachpflegen
+    """
+    lva_index = LvaIndex(lva_rows)
+    edges: Dict[Tuple[str, str, int], str] = {}
+    unresolved: Dict[Tuple[str, str], List[str]] = {}
+
+    for lva_name, lva_type, anmeldevoraussetzungen in documents:
+        if not lva_name:
+            continue
+        lva_type = lva_type or ""
+        key = (lva_name, lva_type)
+
+        required: Dict[int, str] = {}
+        for term in extract_prerequisite_names(anmeldevoraussetzungen or ""):
+            ids = lva_index.resolve(term)
+            if ids:
+                required.update({lva_id: "anmeldevoraussetzungen" for lva_id in ids})
+            else:
+                unresolved.setdefault(key, []).append(term)
+
+        # Fallback: Falls nichts aufgelöst wurde, bekannte Voraussetzungsketten
+        if not required and lva_name in KNOWN_PREREQUISITES:
+            for term in KNOWN_PREREQUISITES[lva_name]:
+                required.update({lva_id: "known" for lva_id in lva_index.resolve(term)})
+
+        for lva_id, source in required.items():
+            edges.setdefault((lva_name, lva_type, lva_id), source)
+
+    return [(name, lva_type, lva_id, source) for (name, lva_type, lva_id), source in edges.items()], unresolved
+
+
+class PrerequisiteGraph:
+    """
+    Geladener Graph: (lva_name, lva_type) → frozenset benötigter lvas.id.
+    Der LvaIndex bildet absolvierte LVAs und Kandidaten auf dieselben IDs ab,
+    die EligibilityEngine prüft beides vektorisiert als Bitmasken.
+    """
+
+    def __init__(self, edges: Iterable[Tuple[str, str, int]], lva_index: LvaIndex):
+        requirements: Dict[Tuple[str, str], Set[int]] = {}
+        for lva_name, lva_type, required_lva_id in edges:
+            requirements.setdefault((lva_name, lva_type or ""), set()).add(required_lva_id)
+        self.requirements: Dict[Tuple[str, str], FrozenSet[int]] = {
+            key: frozenset(ids) for key, ids in requirements.items()
+        }
+        self.lva_index = lva_index
+        self.eligibility = EligibilityEngine(self.requirements, lva_index)
+
+    def required_for(self, lva_name: str, lva_type: Optional[str]) -> FrozenSet[int]:
+        """Benötigte lvas.id für eine LVA (leer = keine Voraussetzungen)."""
+        return self.requirements.get((lva_name, lva_type or ""), frozenset())
+
+    def resolve_completed(self, completed_lvas: List[str]) -> Set[int]:
+        """Absolvierte LVAs (Namen, Codes oder lva_nr) → Set von lvas.id."""
+        return self.lva_index.resolve_many(completed_lvas)
+
+    def missing(self, lva_name: str, lva_type: Optional[str], completed_ids: Set[int]) -> List[str]:
+        """Namen der noch fehlenden Voraussetzungen (leer = alle erfüllt)."""
+        return self.lva_index.names(self.required_for(lva_name, lva_type) - completed_ids)
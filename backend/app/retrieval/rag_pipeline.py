@@ -3,7 +3,7 @@ Integriertes RAG-System: Kombiniert Query Parsing, Hybrid Retrieval und LLM-Plan
 End-to-End Pipeline für Studienplanung.
 """
 
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional
 from .query_parser import parse_user_query, build_metadata_filter
 from .hybrid_retriever import HybridRetriever
 from ..llm_connection.semester_planner import SemesterPlanner
@@ -20,6 +20,8 @@ class StudyPlanningRAG:
     def __init__(self):
         self.retriever = HybridRetriever()
         self.planner = SemesterPlanner()
+        # question embeddings for the semantic response cache (shares the embedding cache)
+        self.planner.question_embedder = self.retriever
 
     def create_semester_plan(
             self,
@@ -62,6 +64,7 @@ class StudyPlanningRAG:
             query=parsed_query["free_text"],
             metadata_filter=metadata_filter,
             top_k=top_k,
+            defer_content=True,
         )
         print(f"   Retrieved {len(retrieved_lvas)} LVAs")
 
@@ -77,6 +80,9 @@ class StudyPlanningRAG:
         eligible_lvas = filter_result["eligible"]
         filtered_lvas = filter_result["filtered"]
 
+        # content only for the LVAs that are sent to the LLM (two-phase retrieval)
+        self.retriever.load_content(eligible_lvas)
+
         print(f"   Eligible: {len(eligible_lvas)} LVAs")
         print(f"   Filtered: {len(filtered_lvas)} LVAs (missing prerequisites)")
 
@@ -111,9 +117,19 @@ class StudyPlanningRAG:
             filtered_lvas=filtered_lvas,  # NEU: für Erklärungen
         )
 
+        # Regelbasierter Plan (PlanSolver, ohne LLM): ECTS-Limit, Zeitkonflikte, VL/UE-Paare
+        solved_plan = self.planner.solve_semester_plan(
+            user_query=user_query,
+            retrieved_lvas=eligible_lvas,
+            ects_target=parsed_query["ects_target"] or 15,
+            preferred_days=parsed_query["preferred_days"],
+            desired_lvas=parsed_query["desired_lvas"],
+        )
+
         # 6. Return Results
         return {
             "plan": semester_plan,
+            "solved_plan": solved_plan,
             "retrieved_lvas": eligible_lvas,  # Nur eligible
             "filtered_lvas": filtered_lvas,   # NEU: für Debugging
             "parsed_query": parsed_query,
@@ -154,6 +170,87 @@ class StudyPlanningRAG:
 
         return answer
 
+    async def acreate_semester_plan(
+            self,
+            user_query: str,
+            user_id: int,
+            top_k: int = 20,
+    ) -> Dict[str, Any]:
+        """
+        Async Variante von create_semester_plan(): Retrieval über den asyncpg-Pool,
+        LLM-Call im begrenzten Executor (blockiert den Event-Loop nicht).
+        """
+        parsed_query = parse_user_query(user_query)
+        completed_lvas = await self.retriever.aget_completed_lvas_for_user(user_id)
+        metadata_filter = build_metadata_filter(parsed_query)
+
+        retrieved_lvas = await self.retriever.aretrieve(
+            query=parsed_query["free_text"],
+            metadata_filter=metadata_filter,
+            top_k=top_k,
+            defer_content=True,
+        )
+        print(f"   Retrieved {len(retrieved_lvas)} LVAs")
+
+        filter_result = await self.retriever.afilter_by_prerequisites(
+            retrieved_lvas=retrieved_lvas,
+            completed_lvas=completed_lvas,
+            target_semester=parsed_query["semester"],
+            user_query=user_query
+        )
+        eligible_lvas = await self.retriever.aload_content(filter_result["eligible"])
+        filtered_lvas = filter_result["filtered"]
+        print(f"   Eligible: {len(eligible_lvas)} LVAs")
+        print(f"   Filtered: {len(filtered_lvas)} LVAs (missing prerequisites)")
+
+        semester_plan = await self.planner.acreate_chat_answer(
+            user_query=user_query,
+            retrieved_lvas=eligible_lvas,
+            ects_target=parsed_query["ects_target"] or 15,
+            preferred_days=parsed_query["preferred_days"],
+            completed_lvas=completed_lvas,
+            desired_lvas=parsed_query["desired_lvas"],
+            filtered_lvas=filtered_lvas,
+        )
+
+        solved_plan = self.planner.solve_semester_plan(
+            user_query=user_query,
+            retrieved_lvas=eligible_lvas,
+            ects_target=parsed_query["ects_target"] or 15,
+            preferred_days=parsed_query["preferred_days"],
+            desired_lvas=parsed_query["desired_lvas"],
+        )
+
+        return {
+            "plan": semester_plan,
+            "solved_plan": solved_plan,
+            "retrieved_lvas": eligible_lvas,
+            "filtered_lvas": filtered_lvas,
+            "parsed_query": parsed_query,
+            "metadata_filter": metadata_filter,
+        }
+
+    async def aanswer_question(
+        self,
+        question: str,
+        top_k: int = 10,
+    ) -> str:
+        """Async Variante von answer_question() (asyncpg-Pool + LLM-Executor)."""
+        print(f"Answering question: {question}")
+
+        retrieved_lvas = await self.retriever.aretrieve(
+            query=question,
+            metadata_filter=None,
+            top_k=top_k,
+        )
+
+        print(f"Retrieved {len(retrieved_lvas)} LVAs for context")
+
+        return await self.planner.aanswer_study_question(
+            question=question,
+            context_lvas=retrieved_lvas,
+        )
+
     def answer_question_with_plan(
         self,
         question: str,
@@ -234,6 +331,89 @@ class StudyPlanningRAG:
 
         return answer
 
+    async def aanswer_question_with_plan(
+        self,
+        question: str,
+        existing_plan_json: Dict[str, Any],
+        user_id: int,
+        planning_context: Optional[str] = None,
+        top_k: int = 10,
+        check_prerequisites: bool = False,
+    ) -> str:
+        """
+        Async Variante von answer_question_with_plan() für die Chat-Route.
+        Retrieval und DB-Zugriffe laufen über den asyncpg-Pool, der LLM-Call im begrenzten
+        Executor des SemesterPlanners - beides blockiert den Event-Loop nicht.
+        """
+        chat_kwargs = await self._achat_answer_kwargs(question, user_id, planning_context, top_k, check_prerequisites)
+        return await self.planner.acreate_chat_answer(user_query=question, **chat_kwargs)
+
+    async def astream_answer_question_with_plan(
+        self,
+        question: str,
+        existing_plan_json: Dict[str, Any],
+        user_id: int,
+        planning_context: Optional[str] = None,
+        top_k: int = 10,
+        check_prerequisites: bool = False,
+    ) -> AsyncIterator[str]:
+        """Wie aanswer_question_with_plan(), liefert die Antwort aber in Text-Chunks (SSE-Route)."""
+        chat_kwargs = await self._achat_answer_kwargs(question, user_id, planning_context, top_k, check_prerequisites)
+        async for text in self.planner.astream_chat_answer(user_query=question, **chat_kwargs):
+            yield text
+
+    async def _achat_answer_kwargs(
+        self,
+        question: str,
+        user_id: int,
+        planning_context: Optional[str],
+        top_k: int,
+        check_prerequisites: bool,
+    ) -> Dict[str, Any]:
+        """Parameter für SemesterPlanner.(a)create_chat_answer / astream_chat_answer."""
+        print(f"Answering question with existing plan: {question}")
+
+        if planning_context:
+            print("[RAG] Using stored planning_context from DB")
+            return {"planning_context": planning_context}
+
+        print("[RAG] No planning_context provided, building from scratch...")
+
+        parsed_query = parse_user_query(question)
+        completed_lvas = await self.retriever.aget_completed_lvas_for_user(user_id)
+
+        retrieved_lvas = await self.retriever.aretrieve(
+            query=question,
+            metadata_filter=None,
+            top_k=top_k,
+            defer_content=check_prerequisites,
+        )
+
+        print(f"Retrieved {len(retrieved_lvas)} LVAs for context")
+
+        filtered_lvas = []
+        if check_prerequisites:
+            print("Filtering by prerequisites (new plan requested)...")
+            filter_result = await self.retriever.afilter_by_prerequisites(
+                retrieved_lvas=retrieved_lvas,
+                completed_lvas=completed_lvas,
+                target_semester=parsed_query.get("semester"),
+                user_query=question
+            )
+            retrieved_lvas = await self.retriever.aload_content(filter_result["eligible"])
+            filtered_lvas = filter_result["filtered"]
+            print(f"   Eligible: {len(retrieved_lvas)} LVAs")
+            print(f"   Filtered: {len(filtered_lvas)} LVAs")
+
+        return {
+            "retrieved_lvas": retrieved_lvas,
+            "ects_target": parsed_query.get("ects_target", 15),
+            "preferred_days": parsed_query.get("preferred_days", []),
+            "completed_lvas": completed_lvas,
+            "desired_lvas": parsed_query.get("desired_lvas", []),
+            "filtered_lvas": filtered_lvas if check_prerequisites else [],
+        }
+
     def search_lva_by_name(self, lva_name: str) -> List[Dict[str, Any]]:
         """
         Sucht eine spezifische LVA nach Name oder Alias.
@@ -245,3 +425,8 @@ class StudyPlanningRAG:
             Liste von gefundenen LVAs
         """
         return self.retriever.retrieve_by_lva_name(lva_name)
+
+
+    async def asearch_lva_by_name(self, lva_name: str) -> List[Dict[str, Any]]:
+        """Async Variante von search_lva_by_name() (asyncpg-Pool)."""
+        return await self.retriever.aretrieve_by_lva_name(lva_name)
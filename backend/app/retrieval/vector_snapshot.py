@@ -0,0 +1,346 @@
+"""
+Vector Snapshot: In-Process Retrieval-Engine auf Basis von NumPy.
+Der komplette studyverse_data-Korpus (einige tausend 768-dim Vektoren) passt als
+float32-Matrix in wenige MB. Statt pro Request eine SQL-Query abzusetzen, wird der
+Metadata-Filter als boolesche Maske ausgewertet und mit einem einzigen
+Matrix-Vektor-Produkt gescored.
+
+Aktivierung über RETRIEVAL_ENGINE=numpy (.env), der Snapshot wird neu geladen,
+sobald sich die Ingestion-Version (Anzahl/max. ID/letzter Insert) ändert.
+"""
+
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+import psycopg2
+from pgvector.psycopg2 import register_vector
+from ..db import init_db_pool
+
+# Wie oft (Sekunden) höchstens geprüft wird, ob sich die Ingestion-Version geändert hat
+SNAPSHOT_CHECK_INTERVAL = int(os.getenv("VECTOR_SNAPSHOT_CHECK_INTERVAL", "60"))
+
+SNAPSHOT_QUERY = """
+    SELECT id, content, metadata, url, embedding
+    FROM studyverse_data
+    WHERE embedding IS NOT NULL AND jsonb_typeof(metadata) = 'object'
+    ORDER BY id
+"""
+
+# Ingestion-Version: ändert sich bei jedem Insert/Delete der ETL-Pipeline
+VERSION_QUERY = """
+    SELECT COUNT(*), COALESCE(MAX(id), 0), MAX(created_at)
+    FROM studyverse_data
+"""
+
+# gleiche Regex wie studyverse_to_numeric() (Database/sql), nach trim und "," -> "."
+_NUMERIC_PATTERN = re.compile(r"-?[0-9]+(\.[0-9]+)?")
+
+
+def _format_version(row) -> str:
+    return f"{row[0]}:{row[1]}:{row[2]}"
+
+
+def _metadata_text(value: Any) -> Optional[str]:
+    """Text-Repräsentation wie metadata->>'field' in Postgres."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+def _metadata_number(value: Any) -> float:
+    """
+    Numerischer Wert wie studyverse_to_numeric() (NaN statt NULL): gleiche Regex, damit
+    "inf", "nan", "1e3" oder "1_000" (für float() gültig) auch hier keine Zahl sind.
+    """
+    text = _metadata_text(value)
+    if text is None:
+        return np.nan
+    # Postgres trim() entfernt nur Leerzeichen
+    text = text.strip(" ").replace(",", ".")
+    if not _NUMERIC_PATTERN.fullmatch(text):
+        return np.nan
+    return float(text)
+
+
+def _dedup_key(row_id: int, metadata: Dict[str, Any]) -> tuple:
+    """Gleicher Key wie im Retriever: (lva_name, lva_type), sonst lva_nr, sonst id."""
+    lva_name = metadata.get("lva_name")
+    lva_type = metadata.get("lva_type")
+    if lva_name and lva_type:
+        return "lva", lva_name, lva_type
+    if metadata.get("lva_nr"):
+        return "nr", str(metadata.get("lva_nr"))
+    return "id", row_id
+
+
+class VectorSnapshot:
+    """
+    Unveränderlicher Snapshot des Korpus:
+    - matrix: (n, dim) float32, zeilenweise L2-normalisiert -> Dot-Product = Cosine Similarity
+    - Metadaten-Spalten werden pro Feld lazy als Arrays aufgebaut und gecacht
+    """
+
+    def __init__(self, version: str, rows: List[tuple]):
+        self.version = version
+        self.loaded_at = time.time()
+
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.contents = [row[1] for row in rows]
+        self.metadatas = [row[2] for row in rows]
+        self.urls = [row[3] for row in rows]
+
+        if rows:
+            matrix = np.vstack([np.asarray(row[4], dtype=np.float32) for row in rows])
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.matrix = matrix / norms
+        else:
+            self.matrix = np.zeros((0, 0), dtype=np.float32)
+
+        group_codes = {}
+        self.group_ids = np.array(
+            [group_codes.setdefault(_dedup_key(int(row[0]), row[2]), len(group_codes)) for row in rows],
+            dtype=np.int64,
+        )
+
+        self._text_columns: Dict[str, np.ndarray] = {}
+        self._number_columns: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _text_column(self, field: str) -> np.ndarray:
+        column = self._text_columns.get(field)
+        if column is None:
+            column = np.array([_metadata_text(m.get(field)) for m in self.metadatas], dtype=object)
+            with self._lock:
+                self._text_columns[field] = column
+        return column
+
+    def _number_column(self, field: str) -> np.ndarray:
+        column = self._number_columns.get(field)
+        if column is None:
+            column = np.array([_metadata_number(m.get(field)) for m in self.metadatas], dtype=np.float64)
+            with self._lock:
+                self._number_columns[field] = column
+        return column
+
+    def filter_mask(self, filter_dict: Optional[Dict[str, Any]]) -> np.ndarray:
+        """
+        Wertet einen Filter im Format von build_metadata_filter() als boolesche Maske aus.
+        Gleiche Semantik wie HybridRetriever._build_metadata_sql_filter ($and, $or, $eq, $in, $lte, $gte).
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if not filter_dict:
+            return mask
+
+        for field, constraint in filter_dict.items():
+            if field == "$and":
+                for sub_condition in constraint:
+                    mask &= self.filter_mask(sub_condition)
+            elif field == "$or":
+                or_mask = np.zeros(len(self), dtype=bool)
+                for sub_condition in constraint:
+                    or_mask |= self.filter_mask(sub_condition)
+                if constraint:
+                    mask &= or_mask
+            elif isinstance(constraint, dict):
+                for operator, value in constraint.items():
+                    if operator == "$eq":
+                        mask &= self._text_column(field) == str(value)
+                    elif operator == "$in":
+                        allowed = {str(v) for v in value}
+                        column = self._text_column(field)
+                        mask &= np.fromiter((v in allowed for v in column), dtype=bool, count=len(column))
+                    elif operator == "$lte":
+                        with np.errstate(invalid="ignore"):
+                            mask &= self._number_column(field) <= float(value)
+                    elif operator == "$gte":
+                        with np.errstate(invalid="ignore"):
+                            mask &= self._number_column(field) >= float(value)
+            else:
+                mask &= self._text_column(field) == str(constraint)
+
+        return mask
+
+    def _to_results(self, indices: np.ndarray, scores: np.ndarray) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": int(self.ids[i]),
+                "content": self.contents[i],
+                "metadata": self.metadatas[i],
+                "url": self.urls[i],
+                "similarity": float(score),
+            }
+            for i, score in zip(indices, scores)
+        ]
+
+    def search(
+        self,
+        query_embedding: List[float],
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        dedupe: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Exakte Cosine-Suche über alle Zeilen, die den Filter erfüllen.
+        Mit dedupe=True nur der beste Chunk pro (lva_name, lva_type), sortiert nach Similarity.
+        """
+        if len(self) == 0:
+            return []
+
+        candidates = np.flatnonzero(self.filter_mask(metadata_filter))
+        if candidates.size == 0:
+            return []
+
+        scores = self.matrix[candidates] @ self._normalize(query_embedding)
+        return self._rank(candidates, scores, dedupe)
+
+    def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        dedupe: bool = True,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Wie search(), aber für mehrere Queries: Filter-Maske einmal, Scoring als
+        ein Matrix-Matrix-Produkt (candidates x queries).
+        """
+        if len(self) == 0 or not query_embeddings:
+            return [[] for _ in query_embeddings]
+
+        candidates = np.flatnonzero(self.filter_mask(metadata_filter))
+        if candidates.size == 0:
+            return [[] for _ in query_embeddings]
+
+        queries = np.vstack([self._normalize(q) for q in query_embeddings])
+        scores = self.matrix[candidates] @ queries.T
+        return [self._rank(candidates, scores[:, j], dedupe) for j in range(queries.shape[0])]
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _rank(self, candidates: np.ndarray, scores: np.ndarray, dedupe: bool) -> List[Dict[str, Any]]:
+        """Sortiert nach Similarity und dedupliziert optional pro (lva_name, lva_type)."""
+        order = np.argsort(-scores, kind="stable")
+        ranked = candidates[order]
+        ranked_scores = scores[order]
+
+        if dedupe:
+            # np.unique returns the first occurrence per group -> best chunk (ranked by score)
+            _, first = np.unique(self.group_ids[ranked], return_index=True)
+            first.sort()
+            ranked = ranked[first]
+            ranked_scores = ranked_scores[first]
+
+        return self._to_results(ranked, ranked_scores)
+
+
+class VectorSnapshotManager:
+    """
+    Hält den aktuellen Snapshot und tauscht ihn atomar aus, sobald sich die
+    Ingestion-Version ändert (Prüfung höchstens alle SNAPSHOT_CHECK_INTERVAL Sekunden).
+    """
+
+    def __init__(self, check_interval: int = SNAPSHOT_CHECK_INTERVAL):
+        self.db_url = os.getenv("DATABASE_URL")
+        self.check_interval = check_interval
+        self.snapshot: Optional[VectorSnapshot] = None
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+
+    def _check_due(self) -> bool:
+        return self.snapshot is None or time.time() - self._last_check >= self.check_interval
+
+    def load(self) -> VectorSnapshot:
+        """Lädt den kompletten Korpus (sync, psycopg2) und tauscht den Snapshot aus."""
+        with self._reload_lock:
+            conn = psycopg2.connect(self.db_url)
+            try:
+                register_vector(conn)
+                cur = conn.cursor()
+                cur.execute(VERSION_QUERY)
+                version = _format_version(cur.fetchone())
+                cur.execute(SNAPSHOT_QUERY)
+                rows = cur.fetchall()
+                cur.close()
+            finally:
+                conn.close()
+
+            snapshot = VectorSnapshot(version, rows)
+            self.snapshot = snapshot
+            self._last_check = time.time()
+            print(f"[SNAPSHOT] Loaded {len(snapshot)} vectors (version {version})")
+            return snapshot
+
+    def current(self) -> VectorSnapshot:
+        """Sync Zugriff: lädt neu, falls noch kein Snapshot existiert oder die Version veraltet ist."""
+        if not self._check_due():
+            return self.snapshot
+
+        if self.snapshot is None:
+            return self.load()
+
+        try:
+            conn = psycopg2.connect(self.db_url)
+            try:
+                cur = conn.cursor()
+                cur.execute(VERSION_QUERY)
+                version = _format_version(cur.fetchone())
+                cur.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"[SNAPSHOT WARNING] Version check failed, keeping snapshot: {e}")
+            self._last_check = time.time()
+            return self.snapshot
+
+        self._last_check = time.time()
+        if version != self.snapshot.version:
+            print(f"[SNAPSHOT] Ingestion version changed ({self.snapshot.version} -> {version}), reloading")
+            return self.load()
+        return self.snapshot
+
+    async def acurrent(self) -> VectorSnapshot:
+        """
+        Async Zugriff: Versions-Check über den asyncpg-Pool, das (seltene) Neuladen
+        läuft in einem Worker-Thread, damit der Event-Loop nicht blockiert.
+        """
+        if not self._check_due():
+            return self.snapshot
+
+        if self.snapshot is None:
+            return await asyncio.to_thread(self.load)
+
+        try:
+            pool = await init_db_pool()
+            async with pool.acquire() as conn:
+                version = _format_version(await conn.fetchrow(VERSION_QUERY))
+        except Exception as e:
+            print(f"[SNAPSHOT WARNING] Version check failed, keeping snapshot: {e}")
+            self._last_check = time.time()
+            return self.snapshot
+
+        self._last_check = time.time()
+        if version != self.snapshot.version:
+            print(f"[SNAPSHOT] Ingestion version changed ({self.snapshot.version} -> {version}), reloading")
+            return await asyncio.to_thread(self.load)
+        return self.snapshot
+
+
+# Ein Snapshot pro Prozess, geteilt von allen HybridRetriever-Instanzen
+vector_snapshot_manager = VectorSnapshotManager()
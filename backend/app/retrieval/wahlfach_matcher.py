@@ -0,0 +1,109 @@
+"""
+Wahlfach-Katalog: gecachte Wahlfach-Namen + Multi-Pattern-Matcher.
+
+- Die Namen aus der wahlfach-Tabelle sind Teil des CourseCatalog (retrieval/catalog.py)
+  und werden nur neu gelesen, wenn sich die Referenzdaten ändern.
+- Aho-Corasick-Automat über alle Wahlfach-Namen: erwähnte Wahlfächer im user_query
+  werden in EINEM Durchlauf über den Text gefunden.
+- is_wahlfach() wird pro LVA-Name memoisiert (der Katalog ist endlich).
+"""
+
+from collections import deque
+from typing import Dict, List, Set
+
+WAHLFAECHER_QUERY = """
+    SELECT lva_name
+    FROM wahlfach
+"""
+
+# Namensbestandteile, die eine LVA immer als Wahlfach kennzeichnen
+WAHLFACH_MARKERS = ("wahlfach", "freie studienleistungen")
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick-Automat für Substring-Suche nach vielen Patterns gleichzeitig.
+    Laufzeit pro Suche: O(len(text) + Anzahl Treffer), unabhängig von der Anzahl Patterns.
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = patterns
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[int]] = [set()]
+
+        for index, pattern in enumerate(patterns):
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(set())
+                state = next_state
+            self._output[state].add(index)
+
+        # Fail-Links per Breitensuche, Outputs entlang der Fail-Kette vererben
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+    def search(self, text: str) -> Set[int]:
+        """Indizes aller Patterns, die in text vorkommen."""
+        found: Set[int] = set()
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._output[state]:
+                found |= self._output[state]
+        return found
+
+
+class WahlfachCatalog:
+    """Unveränderlicher Stand der Wahlfach-Namen mit vorberechneten Lookup-Strukturen."""
+
+    def __init__(self, version: str, names: List[str]):
+        self.version = version
+        self.names = names
+        self._lowered = [name.lower().strip() for name in names]
+        self._exact = set(self._lowered)
+        self._matcher = AhoCorasick(self._lowered)
+        # "\0"-getrennt: 'lva_name in wahlfach_name' für alle Namen mit einem einzigen Substring-Scan
+        self._joined = "\0" + "\0".join(self._lowered) + "\0"
+        self._is_wahlfach_cache: Dict[str, bool] = {}
+
+    def mentioned_in(self, text: str) -> List[str]:
+        """Alle Wahlfach-Namen, die im Text vorkommen (ein Durchlauf über den Text)."""
+        if not text:
+            return []
+        return [self.names[index] for index in sorted(self._matcher.search(text.lower()))]
+
+    def is_wahlfach(self, lva_name: str) -> bool:
+        """
+        LVA ist Wahlfach, wenn der Name einen Marker enthält, exakt/als Teil
+        eines Wahlfach-Namens vorkommt oder einen Wahlfach-Namen enthält.
+        """
+        lva_name_lower = lva_name.lower().strip()
+        result = self._is_wahlfach_cache.get(lva_name_lower)
+        if result is None:
+            result = (
+                any(marker in lva_name_lower for marker in WAHLFACH_MARKERS)
+                or lva_name_lower in self._exact
+                or (bool(self._lowered) and lva_name_lower in self._joined)
+                or bool(self._matcher.search(lva_name_lower))
+            )
+            self._is_wahlfach_cache[lva_name_lower] = result
+        return result
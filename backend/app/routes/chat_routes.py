@@ -1,8 +1,10 @@
 # Chat routes for LLM interaction
 # Endpoints for: Send message, Get chat history
 
+import json
 from fastapi import APIRouter, HTTPException, Depends, Header
-from typing import Optional
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Optional
 import jwt
 from datetime import datetime
 from ..models import ChatSendRequest, ChatMessage, ChatHistoryResponse
@@ -10,6 +12,7 @@ from ..db import init_db_pool
 from ..auth import JWT_SECRET, JWT_ALGORITHM
 from fastapi.security import OAuth2PasswordBearer
 from ..retrieval.rag_pipeline import StudyPlanningRAG
+from ..llm_connection.llm_scheduler import LLMRateLimitError
 
 # OAuth2 for session management
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -48,6 +51,121 @@ async def get_current_user_email(authorization: str = Header(None)) -> str:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
+async def _start_chat_turn(pool, message: str, planning_id: Optional[int], user_email: str) -> Dict[str, Any]:
+    """
+    Shared first part of /send and /send/stream: checks user and planning, saves the
+    user message and loads the stored semester plan + planning_context.
+    """
+    if planning_id is None:
+        raise HTTPException(status_code=400, detail="planning_id is required")
+
+    async with pool.acquire() as conn:
+        # 1. Get user_id from email
+        user_id = await conn.fetchval(
+            "SELECT id FROM users WHERE email = $1",
+            user_email
+        )
+
+        if not user_id:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        # 2. Verify planning exists and belongs to user
+        planning = await conn.fetchrow(
+            """
+            SELECT semester, target_ects, preferred_days, mandatory_courses, semester_plan_json, planning_context
+            FROM plannings
+            WHERE id = $1 AND user_email = $2
+            """,
+            planning_id,
+            user_email
+        )
+
+        if not planning:
+            raise HTTPException(
+                status_code=404,
+                detail="Planning not found or access denied"
+            )
+
+        # 3. Check if this is the first user message (only greeting exists or no messages)
+        message_count = await conn.fetchval(
+            "SELECT COUNT(*) FROM chat_messages WHERE planning_id = $1 AND role = 'user'",
+            planning_id
+        )
+
+    # Save user message to database
+    timestamp = datetime.utcnow()
+    user_message_id = None
+
+    async with pool.acquire() as conn:
+        user_message_id = await conn.fetchval(
+            """
+            INSERT INTO chat_messages (planning_id, role, content, timestamp)
+            VALUES ($1, $2, $3, $4)
+                RETURNING id
+            """,
+            planning_id,
+            'user',
+            message,
+            timestamp
+        )
+        print(f"[CHAT] Saved user message with ID: {user_message_id}")
+
+    # 4. Get existing semester plan JSON from database
+    semester_plan_json_raw = planning.get('semester_plan_json')
+
+    if not semester_plan_json_raw:
+        raise HTTPException(
+            status_code=400,
+            detail="No semester plan found. Please click 'Planung starten' first."
+        )
+
+    # Parse JSON string to dict if needed
+    if isinstance(semester_plan_json_raw, str):
+        semester_plan_json = json.loads(semester_plan_json_raw)
+    else:
+        semester_plan_json = semester_plan_json_raw
+
+    print(f"[CHAT] Using existing semester plan with {len(semester_plan_json.get('lvas', []))} LVAs")
+
+    # Get planning_context from planning (for optimal chat answers)
+    planning_context = planning.get('planning_context')
+    if planning_context:
+        print(f"[CHAT] Using stored planning_context ({len(planning_context)} chars)")
+    else:
+        print("[CHAT] No planning_context found, will build from scratch")
+
+    return {
+        "user_id": user_id,
+        "user_message_id": user_message_id,
+        "timestamp": timestamp,
+        "semester_plan_json": semester_plan_json,
+        "planning_context": planning_context,
+    }
+
+
+async def _save_assistant_message(pool, planning_id: int, content: str) -> int:
+    """Save assistant response to database"""
+    async with pool.acquire() as conn:
+        assistant_message_id = await conn.fetchval(
+            """
+            INSERT INTO chat_messages (planning_id, role, content, timestamp)
+            VALUES ($1, $2, $3, $4)
+                RETURNING id
+            """,
+            planning_id,
+            'assistant',
+            content,
+            datetime.utcnow()
+        )
+        print(f"[CHAT] Saved assistant message with ID: {assistant_message_id}")
+    return assistant_message_id
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """One Server-Sent Event; data is JSON so newlines in chunks stay intact."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 # ========== API Endpoints ==========
 
 @router.post("/send")
@@ -71,125 +189,37 @@ async def send_chat_message(
     pool = await init_db_pool()
 
     try:
-        if planning_id is None:
-            raise HTTPException(status_code=400, detail="planning_id is required")
-
-        async with pool.acquire() as conn:
-            # 1. Get user_id from email
-            user_id = await conn.fetchval(
-                "SELECT id FROM users WHERE email = $1",
-                user_email
-            )
-
-            if not user_id:
-                raise HTTPException(status_code=404, detail="User not found")
-
-            # 2. Verify planning exists and belongs to user
-            planning = await conn.fetchrow(
-                """
-                SELECT semester, target_ects, preferred_days, mandatory_courses, semester_plan_json, planning_context
-                FROM plannings
-                WHERE id = $1 AND user_email = $2
-                """,
-                planning_id,
-                user_email
-            )
-
-            if not planning:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Planning not found or access denied"
-                )
-
-            # 3. Check if this is the first user message (only greeting exists or no messages)
-            message_count = await conn.fetchval(
-                "SELECT COUNT(*) FROM chat_messages WHERE planning_id = $1 AND role = 'user'",
-                planning_id
-            )
-
-        # Save user message to database
-        timestamp = datetime.utcnow()
-        user_message_id = None
-
-        async with pool.acquire() as conn:
-            user_message_id = await conn.fetchval(
-                """
-                INSERT INTO chat_messages (planning_id, role, content, timestamp)
-                VALUES ($1, $2, $3, $4)
-                    RETURNING id
-                """,
-                planning_id,
-                'user',
-                request.message,
-                timestamp
-            )
-            print(f"[CHAT] Saved user message with ID: {user_message_id}")
-
-        # 4. Get existing semester plan JSON from database
-        semester_plan_json_raw = planning.get('semester_plan_json')
-
-        if not semester_plan_json_raw:
-            raise HTTPException(
-                status_code=400,
-                detail="No semester plan found. Please click 'Planung starten' first."
-            )
-
-        # Parse JSON string to dict if needed
-        import json
-        if isinstance(semester_plan_json_raw, str):
-            semester_plan_json = json.loads(semester_plan_json_raw)
-        else:
-            semester_plan_json = semester_plan_json_raw
-
-        print(f"[CHAT] Using existing semester plan with {len(semester_plan_json.get('lvas', []))} LVAs")
-
-        # Get planning_context from planning (for optimal chat answers)
-        planning_context = planning.get('planning_context')
-        if planning_context:
-            print(f"[CHAT] Using stored planning_context ({len(planning_context)} chars)")
-        else:
-            print("[CHAT] No planning_context found, will build from scratch")
+        turn = await _start_chat_turn(pool, request.message, planning_id, user_email)
 
         # 5. Answer question based on existing plan
         try:
-            llm_response = rag_system.answer_question_with_plan(
+            llm_response = await rag_system.aanswer_question_with_plan(
                 question=request.message,
-                existing_plan_json=semester_plan_json,
-                user_id=user_id,
-                planning_context=planning_context,  # Pass stored context for exact parameters
+                existing_plan_json=turn["semester_plan_json"],
+                user_id=turn["user_id"],
+                planning_context=turn["planning_context"],  # Pass stored context for exact parameters
                 top_k=10
             )
             print(f"[CHAT] Generated answer (length: {len(llm_response)})")
+        except LLMRateLimitError:
+            raise  # -> 429 + Retry-After (exception handler in main.py)
         except Exception as e:
             print(f"[CHAT ERROR] {e}")
             import traceback
             traceback.print_exc()
             raise HTTPException(status_code=500, detail=str(e))
 
-        # Save assistant response to database
-        async with pool.acquire() as conn:
-            assistant_message_id = await conn.fetchval(
-                """
-                INSERT INTO chat_messages (planning_id, role, content, timestamp)
-                VALUES ($1, $2, $3, $4)
-                    RETURNING id
-                """,
-                planning_id,
-                'assistant',
-                llm_response,
-                datetime.utcnow()
-            )
-            print(f"[CHAT] Saved assistant message with ID: {assistant_message_id}")
+        assistant_message_id = await _save_assistant_message(pool, planning_id, llm_response)
 
         return {
             "success": True,
             "message": llm_response,
-            "timestamp": timestamp.isoformat(),
-            "user_message_id": user_message_id,
+            "timestamp": turn["timestamp"].isoformat(),
+            "user_message_id": turn["user_message_id"],
             "assistant_message_id": assistant_message_id
         }
 
-    except HTTPException:
+    except (HTTPException, LLMRateLimitError):
         raise
     except Exception as e:
         print(f"[CHAT ERROR] {e}")
@@ -201,6 +231,90 @@ async def send_chat_message(
         )
 
 
+@router.post("/send/stream")
+async def send_chat_message_stream(
+        request: ChatSendRequest,
+        planning_id: Optional[int] = None,
+        user_email: str = Depends(get_current_user_email)
+):
+    """
+    Streaming variant of /send: the answer is forwarded as Server-Sent Events
+    while Gemini generates it.
+
+    Events:
+    - "chunk": {"text": "..."} for every generated piece of text
+    - "done":  {"message", "timestamp", "user_message_id", "assistant_message_id"}
+               after the complete answer has been saved to chat_messages
+    - "error": {"detail": "..."} if generation fails mid-stream
+
+    Validation errors (planning not found, no plan yet, ...) and a full LLM queue
+    (429 + Retry-After) are returned as normal HTTP errors before the stream starts.
+    """
+    print(f"[CHAT] Received streaming message from {user_email}: {request.message}")
+    print(f"[CHAT] Planning ID: {planning_id}")
+
+    pool = await init_db_pool()
+    turn = await _start_chat_turn(pool, request.message, planning_id, user_email)
+
+    answer_stream = rag_system.astream_answer_question_with_plan(
+        question=request.message,
+        existing_plan_json=turn["semester_plan_json"],
+        user_id=turn["user_id"],
+        planning_context=turn["planning_context"],
+        top_k=10
+    )
+
+    # Wait for the first chunk before the response starts, so that LLMRateLimitError
+    # (LLM scheduler queue full) still becomes a 429 instead of an SSE error event
+    first_chunk: Optional[str] = None
+    first_error: Optional[Exception] = None
+    try:
+        first_chunk = await answer_stream.__anext__()
+    except StopAsyncIteration:
+        pass
+    except LLMRateLimitError:
+        raise
+    except Exception as e:
+        first_error = e
+
+    async def event_stream() -> AsyncIterator[str]:
+        chunks: List[str] = []
+        try:
+            if first_error is not None:
+                raise first_error
+            if first_chunk is not None:
+                chunks.append(first_chunk)
+                yield _sse_event("chunk", {"text": first_chunk})
+            async for text in answer_stream:
+                chunks.append(text)
+                yield _sse_event("chunk", {"text": text})
+        except Exception as e:
+            print(f"[CHAT ERROR] {e}")
+            import traceback
+            traceback.print_exc()
+            yield _sse_event("error", {"detail": str(e)})
+            return
+
+        # persist the complete answer once the stream has finished
+        llm_response = "".join(chunks)
+        print(f"[CHAT] Streamed answer (length: {len(llm_response)})")
+        assistant_message_id = await _save_assistant_message(pool, planning_id, llm_response)
+
+        yield _sse_event("done", {
+            "message": llm_response,
+            "timestamp": turn["timestamp"].isoformat(),
+            "user_message_id": turn["user_message_id"],
+            "assistant_message_id": assistant_message_id,
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # no caching / proxy buffering, otherwise chunks arrive all at once
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/history/{planning_id}", response_model=ChatHistoryResponse)
 async def get_chat_history(
         planning_id: int,
@@ -14,7 +14,11 @@ from ..db import init_db_pool
 from ..auth import JWT_SECRET, JWT_ALGORITHM
 from fastapi.security import OAuth2PasswordBearer
 from ..retrieval.rag_pipeline import StudyPlanningRAG
+from ..llm_connection.llm_scheduler import LLMRateLimitError
 from ..retrieval.query_parser import parse_user_query, build_metadata_filter
+from ..retrieval.catalog import catalog_manager
+from ..completed_cache import completed_lva_cache
+from ..plan_cache import canonical_desired_lvas, mandatory_course_terms, plan_cache
 import json
 
 
@@ -54,6 +58,56 @@ async def get_current_user_email(authorization: str = Header(None)) -> str:
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+
+async def _generate_semester_plan(query: str, parsed_query: dict, user_id: int, ects_target: float) -> tuple:
+    """Retrieval + Voraussetzungs-Filter + PlanSolver/LLM → (semester_plan_json, planning_context)."""
+    # Get completed LVAs
+    completed_lvas = await rag_system.retriever.aget_completed_lvas_for_user(user_id)
+
+    # Build metadata filter
+    metadata_filter = build_metadata_filter(parsed_query)
+
+    # Retrieve relevant LVAs (phase 1: without content, loaded below only for eligible LVAs)
+    retrieved_lvas = await rag_system.retriever.aretrieve(
+        query=parsed_query["free_text"],
+        metadata_filter=metadata_filter,
+        top_k=20,
+        defer_content=True,
+    )
+
+    print(f"[PLANNING] Retrieved {len(retrieved_lvas)} LVAs")
+
+    # Todo! Test-code from claude, to check if lvas without all prerequists can be eliminated before consulting the llm.
+    # Filter basierend auf Voraussetzungen
+    filter_result = await rag_system.retriever.afilter_by_prerequisites(
+        retrieved_lvas=retrieved_lvas,
+        completed_lvas=completed_lvas,
+        target_semester=parsed_query.get("semester"),
+        user_query=query  # NEU: User-Query für Wahlfach-Erkennung
+    )
+
+    eligible_lvas = filter_result["eligible"]
+    filtered_lvas = filter_result["filtered"]
+
+    # phase 2: content only for the LVAs that are actually sent to the LLM
+    await rag_system.retriever.aload_content(eligible_lvas)
+
+    print(f"[PLANNING] Eligible: {len(eligible_lvas)} LVAs")
+    print(f"[PLANNING] Filtered: {len(filtered_lvas)} LVAs (missing prerequisites)")
+
+    # Generate JSON semester plan (returns tuple: plan_json, planning_context)
+    semester_plan_json, planning_context = await rag_system.planner.acreate_semester_plan_json(
+        user_query=query,
+        retrieved_lvas=eligible_lvas,  # Nur eligible LVAs
+        ects_target=ects_target,
+        preferred_days=parsed_query["preferred_days"],
+        completed_lvas=completed_lvas,
+        desired_lvas=parsed_query["desired_lvas"],
+        filtered_lvas=filtered_lvas,  # NEU: für Erklärungen
+    )
+    return semester_plan_json, planning_context
+
+
 # ========== API Endpoints ==========
 
 @router.get("/recent", response_model=RecentPlanningsResponse)
@@ -149,54 +203,42 @@ async def create_new_planning(
     print(f"[PLANNING] RAG Query: {query}")
 
     # Generate semester plan with RAG
+    from_cache = False
     try:
         # Parse query
         parsed_query = parse_user_query(query)
-
-        # Get completed LVAs
-        completed_lvas = rag_system.retriever.get_completed_lvas_for_user(user_id)
-
-        # Build metadata filter
-        metadata_filter = build_metadata_filter(parsed_query)
-
-        # Retrieve relevant LVAs
-        retrieved_lvas = rag_system.retriever.retrieve(
-            query=parsed_query["free_text"],
-            metadata_filter=metadata_filter,
-            top_k=20,
+        ects_target = parsed_query["ects_target"] or planning_data.target_ects
+
+        # Plan cache: identical parameters + catalog version -> no retrieval, no LLM call
+        catalog = await catalog_manager.acurrent()
+        completed = await completed_lva_cache.aget(user_id)
+        # Key aus den Request-Feldern, nicht aus parsed_query: dort ist semester nur "SS"/"WS"
+        # und desired_lvas enthält nur Alias-Treffer (SS26 vs. SS27, "Statistik" vs. nichts)
+        plan_key = plan_cache.make_key(
+            semester=planning_data.semester,
+            ects_target=planning_data.target_ects,
+            preferred_days=[day.value for day in planning_data.preferred_days],
+            completed_ids=completed.ids,
+            desired_lvas=canonical_desired_lvas(
+                mandatory_course_terms(planning_data.mandatory_courses), catalog.lva_index
+            ),
+            catalog_version=catalog.version,
         )
 
-        print(f"[PLANNING] Retrieved {len(retrieved_lvas)} LVAs")
-
-        # Todo! Test-code from claude, to check if lvas without all prerequists can be eliminated before consulting the llm.
-        # Filter basierend auf Voraussetzungen
-        filter_result = rag_system.retriever.filter_by_prerequisites(
-            retrieved_lvas=retrieved_lvas,
-            completed_lvas=completed_lvas,
-            target_semester=parsed_query.get("semester"),
-            user_query=query  # NEU: User-Query für Wahlfach-Erkennung
-        )
-
-        eligible_lvas = filter_result["eligible"]
-        filtered_lvas = filter_result["filtered"]
-
-        print(f"[PLANNING] Eligible: {len(eligible_lvas)} LVAs")
-        print(f"[PLANNING] Filtered: {len(filtered_lvas)} LVAs (missing prerequisites)")
-
-        # Generate JSON semester plan (returns tuple: plan_json, planning_context)
-        semester_plan_json, planning_context = rag_system.planner.create_semester_plan_json(
-            user_query=query,
-            retrieved_lvas=eligible_lvas,  # Nur eligible LVAs
-            ects_target=parsed_query["ects_target"] or planning_data.target_ects,
-            preferred_days=parsed_query["preferred_days"],
-            completed_lvas=completed_lvas,
-            desired_lvas=parsed_query["desired_lvas"],
-            filtered_lvas=filtered_lvas,  # NEU: für Erklärungen
-        )
+        cached_plan = plan_cache.get(plan_key)
+        if cached_plan is not None:
+            semester_plan_json, planning_context = cached_plan
+            from_cache = True
+            print("[PLANNING] Semester plan served from plan cache")
+        else:
+            semester_plan_json, planning_context = await _generate_semester_plan(query, parsed_query, user_id, ects_target)
+            plan_cache.put(plan_key, semester_plan_json, planning_context)
 
         print(f"[PLANNING] Generated semester plan JSON: {semester_plan_json.keys()}")
         print(f"[PLANNING] Planning context length: {len(planning_context)} chars")
 
+    except LLMRateLimitError:
+        raise  # -> 429 + Retry-After (exception handler in main.py), no planning is stored
     except Exception as e:
         print(f"[PLANNING ERROR] Failed to generate semester plan: {e}")
         import traceback
@@ -239,7 +281,8 @@ async def create_new_planning(
         mandatory_courses=row["mandatory_courses"],
         semester_plan_json=semester_plan_dict,
         created_at=row["created_at"],
-        last_modified=row["last_modified"]
+        last_modified=row["last_modified"],
+        from_cache=from_cache
     )
 
 
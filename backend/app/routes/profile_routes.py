@@ -1,14 +1,16 @@
 #profile routes provied endpoints to manage user-profile and lvas
 
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict
-from collections import defaultdict
+import hashlib
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
+from typing import FrozenSet, List, Optional, Sequence
 from ..models import (
     UserProfile, UserProfileUpdate,
     LVA, LVAModule, CompletedLVAsUpdate,
     PflichtfaecherResponse, WahlfaecherResponse
 )
 from ..db import init_db_pool
+from ..completed_cache import completed_lva_cache
+from ..retrieval.catalog import CatalogModule, catalog_manager
 from ..routes.planning_routes import get_current_user_email
 from fastapi.security import OAuth2PasswordBearer
 
@@ -34,6 +36,64 @@ async def get_user_id_by_email(email: str) -> int:
             raise HTTPException(status_code=404, detail="User not found")
         return user_id
 
+
+def _hierarchy_etag(resource: str, catalog_version: str, completed_version: str) -> str:
+    """
+    Starker ETag für eine Hierarchie-Antwort: ändert sich genau dann, wenn sich der
+    Katalog (Referenzdaten) oder das Set der absolvierten LVAs des Users ändert.
+    """
+    digest = hashlib.sha1(f"{resource}:{catalog_version}:{completed_version}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match auswerten (Liste von ETags, W/-Präfix, "*")."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _set_cache_headers(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    # private: Antwort ist user-spezifisch; no-cache: Browser muss immer revalidieren
+    response.headers["Cache-Control"] = "private, no-cache"
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+
+def _build_modules(modules: Sequence[CatalogModule], completed_ids: FrozenSet[int]) -> List[LVAModule]:
+    """Vorberechnete Katalog-Module → Response-Modelle, nur is_completed ist pro User."""
+    return [
+        LVAModule(
+            module_name=module.module_name,
+            lvas=[
+                LVA(
+                    id=row.id,
+                    hierarchielevel0=row.hierarchielevel0,
+                    hierarchielevel1=row.hierarchielevel1,
+                    hierarchielevel2=row.hierarchielevel2,
+                    type=row.type,
+                    name=row.name,
+                    ects=row.ects,
+                    is_completed=(row.id in completed_ids)
+                )
+                for row in module.lvas
+            ],
+            total_ects=module.total_ects
+        )
+        for module in modules
+    ]
+
 # ========== API Endpoints ==========
 
 @router.get("/me", response_model=UserProfile)
@@ -130,7 +190,11 @@ async def update_my_profile(
 
 
 @router.get("/pflichfaecher", response_model=PflichtfaecherResponse)
-async def get_pflichtfaecher(user_email: str = Depends(get_current_user_email)):
+async def get_pflichtfaecher(
+    response: Response,
+    user_email: str = Depends(get_current_user_email),
+    if_none_match: Optional[str] = Header(None),
+):
     """
     Returns only Pflichtfächer hierarchy.
     Completed lvas will be marked with boolean = true
@@ -138,64 +202,33 @@ async def get_pflichtfaecher(user_email: str = Depends(get_current_user_email)):
     Hierarchy:
     - Level 1: Modules (e.g. "Grundlagen der Wirtschaftsinformatik")
     - Level 2: Single LVAs (e.g. "VL Einführung in die Wirtschaftsinformatik")
+
+    Antwortet mit ETag; bei passendem If-None-Match → 304 ohne Body.
     """
 
-    pool = await init_db_pool()
     user_id = await get_user_id_by_email(user_email)
 
-    async with pool.acquire() as conn:
-        # get only Pflichtfächer
-        lva_rows = await conn.fetch(
-            """
-            SELECT id, hierarchielevel0, hierarchielevel1, hierarchielevel2,
-                   type, name, ects
-            FROM lvas
-            WHERE hierarchielevel0 = 'Pflichtfach'
-            ORDER BY id, hierarchielevel1, hierarchielevel2, type
-            """
-        )
+    # precomputed hierarchy from the in-memory course catalog, no DB roundtrip
+    catalog = await catalog_manager.acurrent()
 
-        # fetch completed_lvas for user to provide boolean to frontend
-        completed_lva_ids = await conn.fetch(
-            "SELECT lva_id FROM completed_lvas WHERE user_id = $1",
-            user_id
-        )
-        completed_set = {row["lva_id"] for row in completed_lva_ids}
-
-    # organize lvas into hierarchy
-    pflichtfaecher_dict: Dict[str, List[LVA]] = defaultdict(list)
-
-    for row in lva_rows:
-        lva = LVA(
-            id=row["id"],
-            hierarchielevel0=row["hierarchielevel0"],
-            hierarchielevel1=row["hierarchielevel1"],
-            hierarchielevel2=row["hierarchielevel2"],
-            type=row["type"],
-            name=row["name"],
-            ects=row["ects"],
-            is_completed=(row["id"] in completed_set)
-        )
-        pflichtfaecher_dict[row["hierarchielevel1"]].append(lva)
-
-    # create modules
-    pflichtfach_modules = []
-    for module_name, lvas in pflichtfaecher_dict.items():
-        total_ects = sum(lva.ects for lva in lvas)
-        pflichtfach_modules.append(
-            LVAModule(
-                module_name=module_name,
-                lvas=lvas,
-                total_ects=total_ects
-            )
-        )
+    # completed_lvas for user to provide boolean to frontend (per-user cache)
+    completed = await completed_lva_cache.aget(user_id)
+
+    etag = _hierarchy_etag("pflichtfaecher", catalog.version, completed.version)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    _set_cache_headers(response, etag)
 
     return PflichtfaecherResponse(
-        pflichtfaecher=pflichtfach_modules,
+        pflichtfaecher=_build_modules(catalog.pflichtfach_modules, completed.ids),
     )
 
 @router.get("/wahlfaecher", response_model=WahlfaecherResponse)
-async def get_wahlfaecher(user_email: str = Depends(get_current_user_email)):
+async def get_wahlfaecher(
+    response: Response,
+    user_email: str = Depends(get_current_user_email),
+    if_none_match: Optional[str] = Header(None),
+):
     """
     Returns only Wahlfächer hierarchy.
     Completed lvas will be marked with boolean = true
@@ -203,60 +236,25 @@ async def get_wahlfaecher(user_email: str = Depends(get_current_user_email)):
     Hierarchy:
     - Level 1: Modules (e.g. "Grundlagen der Volkswirtschaftslehre")
     - Level 2: Single LVAs (e.g. "VL Einführung in die VWL")
+
+    Antwortet mit ETag; bei passendem If-None-Match → 304 ohne Body.
     """
 
-    pool = await init_db_pool()
     user_id = await get_user_id_by_email(user_email)
 
-    async with pool.acquire() as conn:
-        # get only Wahlfächer
-        lva_rows = await conn.fetch(
-            """
-            SELECT id, hierarchielevel0, hierarchielevel1, hierarchielevel2,
-                   type, name, ects
-            FROM lvas
-            WHERE hierarchielevel0 = 'Wahlfach'
-            ORDER BY hierarchielevel1, hierarchielevel2, type
-            """
-        )
+    # precomputed hierarchy from the in-memory course catalog, no DB roundtrip
+    catalog = await catalog_manager.acurrent()
 
-        # fetch completed_lvas for user to provide boolean to frontend
-        completed_lva_ids = await conn.fetch(
-            "SELECT lva_id FROM completed_lvas WHERE user_id = $1",
-            user_id
-        )
-        completed_set = {row["lva_id"] for row in completed_lva_ids}
-
-    # organize lvas into hierarchy
-    wahlfaecher_dict: Dict[str, List[LVA]] = defaultdict(list)
-
-    for row in lva_rows:
-        lva = LVA(
-            id=row["id"],
-            hierarchielevel0=row["hierarchielevel0"],
-            hierarchielevel1=row["hierarchielevel1"],
-            hierarchielevel2=row["hierarchielevel2"],
-            type=row["type"],
-            name=row["name"],
-            ects=row["ects"],
-            is_completed=(row["id"] in completed_set)
-        )
-        wahlfaecher_dict[row["hierarchielevel1"]].append(lva)
-
-    # create modules
-    wahlfach_modules = []
-    for module_name, lvas in wahlfaecher_dict.items():
-        total_ects = sum(lva.ects for lva in lvas)
-        wahlfach_modules.append(
-            LVAModule(
-                module_name=module_name,
-                lvas=lvas,
-                total_ects=total_ects
-            )
-        )
+    # completed_lvas for user to provide boolean to frontend (per-user cache)
+    completed = await completed_lva_cache.aget(user_id)
+
+    etag = _hierarchy_etag("wahlfaecher", catalog.version, completed.version)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    _set_cache_headers(response, etag)
 
     return WahlfaecherResponse(
-        wahlfaecher=wahlfach_modules
+        wahlfaecher=_build_modules(catalog.wahlfach_modules, completed.ids)
     )
 
 
@@ -266,16 +264,38 @@ async def get_completed_lvas(user_email: str = Depends(get_current_user_email)):
     Gibt nur die IDs der abgeschlossenen LVAs zurück.
     Nützlich für schnelle Checks im Frontend.
     """
-    pool = await init_db_pool()
     user_id = await get_user_id_by_email(user_email)
-
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            "SELECT lva_id FROM completed_lvas WHERE user_id = $1",
-            user_id
-        )
-
-    return [row["lva_id"] for row in rows]
+    completed = await completed_lva_cache.aget(user_id)
+
+    return sorted(completed.ids)
+
+
+# Serialisiert parallele Saves desselben Users (Zeilen-Lock bis Transaktionsende)
+LOCK_USER_QUERY = "SELECT id FROM users WHERE id = $1 FOR NO KEY UPDATE"
+
+# Diff-Upsert in einem Statement: gewünschtes Set als Array, fehlende Zeilen einfügen,
+# nicht mehr gewünschte löschen. Beide CTEs sehen denselben Snapshot; ON CONFLICT nutzt
+# den Unique-Index (PRIMARY KEY) auf (user_id, lva_id).
+COMPLETED_DIFF_UPSERT_QUERY = """
+    WITH desired AS (
+        SELECT DISTINCT unnest($2::int[]) AS lva_id
+    ),
+    removed AS (
+        DELETE FROM completed_lvas cl
+        WHERE cl.user_id = $1
+          AND NOT EXISTS (SELECT 1 FROM desired d WHERE d.lva_id = cl.lva_id)
+        RETURNING cl.lva_id
+    ),
+    added AS (
+        INSERT INTO completed_lvas (user_id, lva_id)
+        SELECT $1, d.lva_id FROM desired d
+        ON CONFLICT (user_id, lva_id) DO NOTHING
+        RETURNING lva_id
+    )
+    SELECT (SELECT COUNT(*) FROM added)   AS added,
+           (SELECT COUNT(*) FROM removed) AS removed,
+           (SELECT COUNT(*) FROM desired) AS total
+"""
 
 
 @router.put("/lvas/completed")
@@ -287,44 +307,28 @@ async def update_completed_lvas(
     Update completed lvas - only entries who have been edited
     will be updated (either if checkbox was checked or check
     was removed.
+
+    Der Diff läuft als ein Statement (COMPLETED_DIFF_UPSERT_QUERY) in einer Transaktion.
     """
     pool = await init_db_pool()
     user_id = await get_user_id_by_email(user_email)
 
     async with pool.acquire() as conn:
         async with conn.transaction():
-            # 1. get everything completed from user
-            current_completed = await conn.fetch(
-                "SELECT lva_id FROM completed_lvas WHERE user_id = $1",
-                user_id
-            )
-            current_set = {row["lva_id"] for row in current_completed}
-            new_set = set(data.lva_ids)
-
-            # 2. calculate differences
-            to_add = new_set - current_set
-            to_remove = current_set - new_set
-
-            # 3. delete entries if no longer valid
-            if to_remove:
-                await conn.execute(
-                    "DELETE FROM completed_lvas WHERE user_id = $1 AND lva_id = ANY($2)",
-                    user_id, list(to_remove)
-                )
+            # concurrent saves of the same user run one after another (last save wins)
+            await conn.execute(LOCK_USER_QUERY, user_id)
 
-            # 4. add new entries
-            if to_add:
-                values = [(user_id, lva_id) for lva_id in to_add]
-                await conn.executemany(
-                    "INSERT INTO completed_lvas (user_id, lva_id) VALUES ($1, $2)",
-                    values
-                )
+            # one set-based statement: insert missing rows, delete removed rows
+            result = await conn.fetchrow(COMPLETED_DIFF_UPSERT_QUERY, user_id, data.lva_ids)
+
+    # cached completed LVAs (profile routes + retriever) are stale now
+    completed_lva_cache.invalidate(user_id)
 
     return {
         "status": "success",
-        "message": f"{len(to_add)} LVAs hinzugefügt, {len(to_remove)} entfernt",
-        "added": len(to_add),
-        "removed": len(to_remove),
-        "total_completed": len(data.lva_ids)
+        "message": f"{result['added']} LVAs hinzugefügt, {result['removed']} entfernt",
+        "added": result["added"],
+        "removed": result["removed"],
+        "total_completed": result["total"]
     }
 
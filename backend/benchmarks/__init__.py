@@ -0,0 +1,2 @@
+# only purpose of init_py is to declare a package in python
+# benchmarks are run from the repo root, e.g. python -m backend.benchmarks.vector_index_benchmark
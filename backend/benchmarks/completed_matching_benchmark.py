@@ -0,0 +1,89 @@
+"""
+Benchmark: "bereits absolviert"-Check mit Substring-Schleifen vs. kanonischen lvas.id.
+
+Vergleicht für wachsende Listen absolvierter LVAs
+- legacy: Substring-Vergleich jeder Kandidaten-LVA gegen jede absolvierte LVA (O(n·m))
+- index:  LvaIndex → Set von lvas.id, Check per Teilmengen-Test (O(1) pro Kandidat)
+
+und zählt zusätzlich die False Positives des Substring-Matchings
+(z.B. UE gilt als absolviert, weil nur die VL absolviert wurde).
+
+Synthetischer Katalog, keine Datenbank nötig. Aufruf (vom Repo-Root):
+    python -m backend.benchmarks.completed_matching_benchmark --courses 5000 --candidates 500
+"""
+
+import argparse
+import random
+import time
+from typing import Any, Dict, List, Tuple
+from backend.app.retrieval.lva_index import LvaIndex
+
+LVA_TYPES = ("VL", "UE")
+
+
+def build_catalog(n_courses: int) -> Tuple[List[Tuple[int, str, str, str]], List[Dict[str, Any]]]:
+    """lvas-Zeilen (id, name, hierarchielevel2, type) + passende Kandidaten-Metadaten."""
+    lva_rows = []
+    documents = []
+    for course_index in range(n_courses):
+        course = f"Kurs {course_index:05d} Informatik"
+        for lva_type in LVA_TYPES:
+            lva_id = len(lva_rows) + 1
+            lva_rows.append((lva_id, f"{lva_type} {course}", course, lva_type))
+            documents.append({"lva_name": course, "lva_type": lva_type, "lva_nr": f"{256000 + lva_id}"})
+    return lva_rows, documents
+
+
+def legacy_is_completed(metadata: Dict[str, Any], completed_lvas: List[str]) -> bool:
+    """Bisheriger Check aus filter_by_prerequisites (Substring in beide Richtungen + lva_nr)."""
+    lva_name_lower = metadata["lva_name"].lower().strip()
+    lva_nr = metadata.get("lva_nr")
+    for completed in completed_lvas:
+        completed_lower = completed.lower().strip()
+        if lva_name_lower in completed_lower or completed_lower in lva_name_lower:
+            return True
+        if lva_nr and str(lva_nr) in completed:
+            return True
+    return False
+
+
+def run_benchmark(n_courses: int, n_candidates: int, sizes: List[int], seed: int = 42) -> None:
+    rng = random.Random(seed)
+    lva_rows, documents = build_catalog(n_courses)
+    names_by_id = {row[0]: row[1] for row in lva_rows}
+
+    start = time.perf_counter()
+    lva_index = LvaIndex(lva_rows)
+    print(f"{len(lva_rows)} LVAs, index build: {(time.perf_counter() - start) * 1000:.1f} ms\n")
+    print(f"{'completed':>10} {'legacy ms':>12} {'index ms':>12} {'speedup':>9} {'false pos.':>11}")
+
+    for size in sizes:
+        completed_ids = rng.sample(sorted(names_by_id), min(size, len(names_by_id)))
+        completed_lvas = [names_by_id[lva_id] for lva_id in completed_ids]
+        candidates = rng.sample(documents, min(n_candidates, len(documents)))
+
+        start = time.perf_counter()
+        legacy = [legacy_is_completed(doc, completed_lvas) for doc in candidates]
+        legacy_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        completed_set = lva_index.resolve_many(completed_lvas)
+        indexed = []
+        for doc in candidates:
+            lva_ids = lva_index.resolve_document(doc["lva_name"], doc["lva_type"], doc["lva_nr"])
+            indexed.append(bool(lva_ids) and lva_ids <= completed_set)
+        index_ms = (time.perf_counter() - start) * 1000
+
+        false_positives = sum(1 for old, new in zip(legacy, indexed) if old and not new)
+        speedup = legacy_ms / index_ms if index_ms else float("inf")
+        print(f"{len(completed_lvas):>10} {legacy_ms:>12.2f} {index_ms:>12.2f} {speedup:>8.1f}x {false_positives:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Substring- vs. ID-basierter Completed-Check")
+    parser.add_argument("--courses", type=int, default=5000)
+    parser.add_argument("--candidates", type=int, default=500)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000, 10000])
+    args = parser.parse_args()
+
+    run_benchmark(n_courses=args.courses, n_candidates=args.candidates, sizes=args.sizes)
@@ -0,0 +1,165 @@
+"""
+Benchmark: PUT /profile/lvas/completed — bisheriger Ablauf vs. Diff-Upsert in einem Statement.
+
+- legacy: SELECT aktuelles Set, DELETE ... ANY(), executemany INSERT (ein Roundtrip pro neuer LVA)
+- upsert: LOCK_USER_QUERY + COMPLETED_DIFF_UPSERT_QUERY (unnest-Array, INSERT + DELETE in einer CTE)
+
+Gemessen wird die Latenz abhängig davon, wie viele LVAs umgeschaltet werden, plus ein
+Concurrency-Check: viele parallele Saves desselben Users, am Ende muss der Stand genau
+einem der gesendeten Sets entsprechen.
+
+Läuft gegen DATABASE_URL, aber nur auf TEMP-Tabellen (users, completed_lvas), die die
+echten Tabellen in der Session überdecken — es werden keine echten Daten verändert.
+Aufruf (vom Repo-Root):
+    python -m backend.benchmarks.completed_update_benchmark --toggles 1 10 50 100 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from typing import List, Set
+import asyncpg
+from dotenv import load_dotenv
+from backend.app.routes.profile_routes import COMPLETED_DIFF_UPSERT_QUERY, LOCK_USER_QUERY
+
+load_dotenv()
+
+BENCH_USER_ID = 1
+N_LVAS = 400
+
+SETUP_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY);
+    CREATE TEMP TABLE IF NOT EXISTS completed_lvas (
+        user_id INTEGER,
+        lva_id INTEGER,
+        PRIMARY KEY (user_id, lva_id)
+    );
+"""
+
+
+async def setup(conn: asyncpg.Connection) -> None:
+    # TEMP-Tabellen liegen in pg_temp und haben im search_path Vorrang
+    await conn.execute(SETUP_SQL)
+    await conn.execute("INSERT INTO users (id) VALUES ($1) ON CONFLICT DO NOTHING", BENCH_USER_ID)
+
+
+async def reset(conn: asyncpg.Connection, lva_ids: Set[int]) -> None:
+    await conn.execute("DELETE FROM completed_lvas WHERE user_id = $1", BENCH_USER_ID)
+    await conn.executemany(
+        "INSERT INTO completed_lvas (user_id, lva_id) VALUES ($1, $2)",
+        [(BENCH_USER_ID, lva_id) for lva_id in lva_ids],
+    )
+
+
+async def legacy_update(conn: asyncpg.Connection, lva_ids: List[int]) -> None:
+    async with conn.transaction():
+        current = await conn.fetch("SELECT lva_id FROM completed_lvas WHERE user_id = $1", BENCH_USER_ID)
+        current_set = {row["lva_id"] for row in current}
+        new_set = set(lva_ids)
+        to_add = new_set - current_set
+        to_remove = current_set - new_set
+        if to_remove:
+            await conn.execute(
+                "DELETE FROM completed_lvas WHERE user_id = $1 AND lva_id = ANY($2)",
+                BENCH_USER_ID, list(to_remove),
+            )
+        if to_add:
+            await conn.executemany(
+                "INSERT INTO completed_lvas (user_id, lva_id) VALUES ($1, $2)",
+                [(BENCH_USER_ID, lva_id) for lva_id in to_add],
+            )
+
+
+async def upsert_update(conn: asyncpg.Connection, lva_ids: List[int]) -> None:
+    async with conn.transaction():
+        await conn.execute(LOCK_USER_QUERY, BENCH_USER_ID)
+        await conn.fetchrow(COMPLETED_DIFF_UPSERT_QUERY, BENCH_USER_ID, lva_ids)
+
+
+def toggled(base: Set[int], n_toggles: int, rng: random.Random) -> List[int]:
+    """Neues Set: n_toggles LVAs umgeschaltet (hälftig entfernt / hinzugefügt)."""
+    new_set = set(base)
+    remove = rng.sample(sorted(base), min(len(base), n_toggles // 2))
+    add = rng.sample(sorted(set(range(1, N_LVAS + 1)) - base), n_toggles - len(remove))
+    new_set.difference_update(remove)
+    new_set.update(add)
+    return sorted(new_set)
+
+
+async def measure(conn: asyncpg.Connection, update, n_toggles: int, repeats: int, seed: int) -> float:
+    rng = random.Random(seed)
+    timings = []
+    for _ in range(repeats):
+        base = set(rng.sample(range(1, N_LVAS + 1), N_LVAS // 4))
+        await reset(conn, base)
+        new_ids = toggled(base, n_toggles, rng)
+        start = time.perf_counter()
+        await update(conn, new_ids)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+async def concurrency_check(db_url: str, n_clients: int, seed: int) -> None:
+    """Parallele Saves auf einer gemeinsamen Tabelle: Endstand muss genau einem gesendeten Set entsprechen."""
+    rng = random.Random(seed)
+    # TEMP-Tabellen sind pro Session, für den Check braucht es echte (Unlogged-)Tabellen in einem eigenen Schema
+    admin = await asyncpg.connect(db_url)
+    try:
+        await admin.execute("CREATE SCHEMA IF NOT EXISTS completed_bench")
+        await admin.execute("""
+            CREATE UNLOGGED TABLE IF NOT EXISTS completed_bench.users (id INTEGER PRIMARY KEY);
+            CREATE UNLOGGED TABLE IF NOT EXISTS completed_bench.completed_lvas (
+                user_id INTEGER, lva_id INTEGER, PRIMARY KEY (user_id, lva_id)
+            );
+            TRUNCATE completed_bench.completed_lvas;
+        """)
+        await admin.execute("INSERT INTO completed_bench.users (id) VALUES ($1) ON CONFLICT DO NOTHING", BENCH_USER_ID)
+
+        submitted = [sorted(rng.sample(range(1, N_LVAS + 1), rng.randint(0, N_LVAS // 2))) for _ in range(n_clients)]
+        clients = [
+            await asyncpg.connect(db_url, server_settings={"search_path": "completed_bench"})
+            for _ in range(n_clients)
+        ]
+        try:
+            await asyncio.gather(*(upsert_update(conn, ids) for conn, ids in zip(clients, submitted)))
+        finally:
+            for conn in clients:
+                await conn.close()
+
+        final = sorted(
+            row["lva_id"] for row in
+            await admin.fetch("SELECT lva_id FROM completed_bench.completed_lvas WHERE user_id = $1", BENCH_USER_ID)
+        )
+        print(f"\n{n_clients} parallele Saves: Endstand entspricht einem gesendeten Set: {final in submitted}")
+    finally:
+        await admin.execute("DROP SCHEMA IF EXISTS completed_bench CASCADE")
+        await admin.close()
+
+
+async def run_benchmark(toggles: List[int], repeats: int, clients: int, seed: int = 42) -> None:
+    db_url = os.getenv("DATABASE_URL")
+    conn = await asyncpg.connect(db_url)
+    try:
+        await setup(conn)
+        print(f"{'toggled':>8} {'legacy ms':>12} {'upsert ms':>12}")
+        for n_toggles in toggles:
+            legacy_ms = await measure(conn, legacy_update, n_toggles, repeats, seed)
+            upsert_ms = await measure(conn, upsert_update, n_toggles, repeats, seed)
+            print(f"{n_toggles:>8} {legacy_ms:>12.2f} {upsert_ms:>12.2f}")
+    finally:
+        await conn.close()
+
+    await concurrency_check(db_url, clients, seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Completed-LVAs Update: legacy vs. Diff-Upsert")
+    parser.add_argument("--toggles", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=10)
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(toggles=args.toggles, repeats=args.repeats, clients=args.clients))
@@ -0,0 +1,88 @@
+"""
+Benchmark: Bitmasken-Eligibility (EligibilityEngine.evaluate_batch) für viele Studierende.
+
+Synthetischer Katalog in Curriculum-Größe (< 128 LVAs, Voraussetzungsketten wie
+SOFT1 → SOFT2 → SE) und zufällige Listen absolvierter LVAs. Verglichen wird
+gegen die Set-basierte Prüfung pro Student und LVA.
+
+Keine Datenbank nötig. Aufruf (vom Repo-Root):
+    python -m backend.benchmarks.eligibility_benchmark --students 5000
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, FrozenSet, List, Set, Tuple
+import numpy as np
+from backend.app.retrieval.eligibility import EligibilityEngine
+from backend.app.retrieval.lva_index import LvaIndex
+
+
+def build_catalog(n_courses: int, seed: int) -> Tuple[List[Tuple[int, str, str, str]], Dict[Tuple[str, str], FrozenSet[int]]]:
+    """lvas-Zeilen (VL + UE pro Kurs) und Voraussetzungen: jeder Kurs braucht 0-2 frühere Kurse."""
+    rng = random.Random(seed)
+    lva_rows = []
+    course_ids: List[List[int]] = []
+    requirements: Dict[Tuple[str, str], FrozenSet[int]] = {}
+
+    for course_index in range(n_courses):
+        course = f"Kurs {course_index:03d}"
+        ids = []
+        for lva_type in ("VL", "UE"):
+            lva_id = len(lva_rows) + 1
+            lva_rows.append((lva_id, f"{lva_type} {course}", course, lva_type))
+            ids.append(lva_id)
+        course_ids.append(ids)
+
+        if course_index:
+            required = set()
+            for earlier in rng.sample(range(course_index), min(course_index, rng.randint(0, 2))):
+                required.update(course_ids[earlier])
+            if required:
+                for lva_type in ("VL", "UE"):
+                    requirements[(course, lva_type)] = frozenset(required)
+
+    return lva_rows, requirements
+
+
+def run_benchmark(n_students: int, n_courses: int = 60, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    lva_rows, requirements = build_catalog(n_courses, seed)
+    engine = EligibilityEngine(requirements, LvaIndex(lva_rows))
+    keys = [(course, lva_type, "") for _, _, course, lva_type in lva_rows]
+    all_ids = [row[0] for row in lva_rows]
+    ids_by_key = {(course, lva_type): {lva_id} for lva_id, _, course, lva_type in lva_rows}
+
+    completed_sets: List[Set[int]] = [
+        set(rng.sample(all_ids, rng.randint(0, len(all_ids) // 2))) for _ in range(n_students)
+    ]
+    print(f"{len(lva_rows)} LVAs ({engine.words} x 64 bit), {n_students} Studierende\n")
+
+    engine.evaluate_batch(keys, completed_sets[:1])  # Masken vorberechnen
+
+    start = time.perf_counter()
+    result = engine.evaluate_batch(keys, completed_sets)
+    bitset_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    expected = np.array([
+        [
+            not ids_by_key[(name, lva_type)] <= completed and requirements.get((name, lva_type), frozenset()) <= completed
+            for name, lva_type, _ in keys
+        ]
+        for completed in completed_sets
+    ])
+    sets_ms = (time.perf_counter() - start) * 1000
+
+    print(f"bitset batch: {bitset_ms:9.2f} ms")
+    print(f"python sets:  {sets_ms:9.2f} ms")
+    print(f"identisch:    {bool((result == expected).all())}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bitmasken-Eligibility für viele Studierende")
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--courses", type=int, default=60)
+    args = parser.parse_args()
+
+    run_benchmark(n_students=args.students, n_courses=args.courses)
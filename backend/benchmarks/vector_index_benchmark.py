@@ -0,0 +1,174 @@
+"""
+Benchmark: Vektor-Index (HNSW / IVFFlat) vs. exakter Scan auf studyverse_data.
+
+Gemessen wird die Query, die HybridRetriever tatsächlich schickt (bester Chunk pro LVA,
+_dedup_subquery): exakt ohne Kandidaten-Limit als Ground Truth, mit Index über
+"ORDER BY embedding <=> q LIMIT n" (VECTOR_CANDIDATE_LIMIT). Pro Einstellung
+(HNSW: n mit ef_search = n wie im Retriever, IVFFlat: probes bei festem n):
+- recall@k der k ähnlichsten LVAs gegenüber dem exakten Scan
+- p50/p99 Latenz pro Query
+
+Als Query-Vektoren werden zufällige Embeddings aus der Tabelle selbst verwendet,
+es wird also kein Embedding-API-Call benötigt.
+
+Aufruf (vom Repo-Root):
+    python -m backend.benchmarks.vector_index_benchmark hnsw --build
+    python -m backend.benchmarks.vector_index_benchmark ivfflat --build --lists 20 --candidates 400
+"""
+
+import argparse
+import math
+import os
+import time
+from typing import List, Dict, Any, Optional
+import psycopg2
+from dotenv import load_dotenv
+from backend.app.retrieval.hybrid_retriever import HNSW_MAX_EF_SEARCH, HybridRetriever
+from data_ingestion.vector_index import create_vector_index
+
+load_dotenv()
+
+# HNSW: Kandidaten-Limit n (ef_search = n), IVFFlat: probes bei festem n
+SWEEPS = {
+    "hnsw": ("candidate_limit", [50, 100, 200, 400, 800, 1000]),
+    "ivfflat": ("ivfflat.probes", [1, 2, 5, 10, 20, 50]),
+}
+DEFAULT_CANDIDATE_LIMIT = 400
+
+
+def retrieval_query(candidate_limit: int) -> str:
+    """Produktions-Query ohne Metadaten-Filter (nur id, content wird nicht geladen)."""
+    return HybridRetriever._dedup_subquery("%s::vector", "", include_content=False, candidate_limit=candidate_limit)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank Perzentil (values in ms)."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def sample_query_vectors(conn, n: int) -> List[str]:
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT embedding::text FROM studyverse_data WHERE embedding IS NOT NULL ORDER BY random() LIMIT %s",
+        [n]
+    )
+    vectors = [row[0] for row in cur.fetchall()]
+    cur.close()
+    conn.commit()
+    return vectors
+
+
+def run_queries(conn, vectors: List[str], candidate_limit: int, settings: Dict[str, str]) -> Dict[str, Any]:
+    """Führt alle Queries mit den gegebenen Settings aus (jede in eigener Transaktion)."""
+    results = []
+    latencies_ms = []
+    query = retrieval_query(candidate_limit)
+    cur = conn.cursor()
+
+    for vector in vectors:
+        for setting, value in settings.items():
+            cur.execute("SELECT set_config(%s, %s, true)", [setting, value])
+
+        start = time.perf_counter()
+        cur.execute(query, [vector, vector] if candidate_limit else [vector])
+        ids = [row[0] for row in cur.fetchall()]
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+
+        conn.commit()  # ends the transaction -> settings reset
+        results.append(ids)
+
+    cur.close()
+    return {"ids": results, "latencies_ms": latencies_ms}
+
+
+def exact_settings() -> Dict[str, str]:
+    """Erzwingt einen Sequential Scan (exakte Distanzen) als Ground Truth."""
+    return {
+        "enable_indexscan": "off",
+        "enable_bitmapscan": "off",
+        "enable_indexonlyscan": "off",
+    }
+
+
+def recall_at_k(ground_truth: List[List[int]], approx: List[List[int]], k: int) -> float:
+    hits = 0
+    total = 0
+    for truth, found in zip(ground_truth, approx):
+        truth_set = set(truth[:k])
+        hits += len(truth_set & set(found[:k]))
+        total += len(truth_set)
+    return hits / total if total else 0.0
+
+
+def print_row(label: str, recall: float, latencies_ms: List[float]) -> None:
+    print(f"{label:<28} recall@k={recall:6.3f}   p50={percentile(latencies_ms, 50):8.2f} ms   "
+          f"p99={percentile(latencies_ms, 99):8.2f} ms")
+
+
+def run_benchmark(
+    method: str,
+    n_queries: int = 100,
+    k: int = 10,
+    build: bool = False,
+    lists: Optional[int] = None,
+    m: int = 16,
+    ef_construction: int = 64,
+    candidate_limit: int = DEFAULT_CANDIDATE_LIMIT,
+) -> None:
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        print("ERROR: DATABASE_URL nicht gesetzt!")
+        return
+
+    conn = psycopg2.connect(db_url)
+    try:
+        if build:
+            print(f"Building {method} index...")
+            start = time.perf_counter()
+            create_vector_index(conn, method=method, m=m, ef_construction=ef_construction, lists=lists)
+            print(f"   build time: {time.perf_counter() - start:.1f} s")
+
+        vectors = sample_query_vectors(conn, n_queries)
+        print(f"\n{len(vectors)} queries, k = {k}, method = {method}\n")
+
+        exact = run_queries(conn, vectors, 0, exact_settings())
+        print_row("exact scan", 1.0, exact["latencies_ms"])
+
+        setting, values = SWEEPS[method]
+        for value in values:
+            if method == "hnsw":
+                # wie HybridRetriever._search_settings: ef_search >= n, sonst wird LIMIT n gekürzt
+                approx = run_queries(conn, vectors, value, {"hnsw.ef_search": str(min(value, HNSW_MAX_EF_SEARCH))})
+            else:
+                approx = run_queries(conn, vectors, candidate_limit, {setting: str(value)})
+            recall = recall_at_k(exact["ids"], approx["ids"], k)
+            print_row(f"{setting} = {value}", recall, approx["latencies_ms"])
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall/Latenz Benchmark für den Vektor-Index")
+    parser.add_argument("method", choices=sorted(SWEEPS))
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--build", action="store_true", help="Index vorher (neu) anlegen")
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--candidates", type=int, default=DEFAULT_CANDIDATE_LIMIT,
+                        help="Kandidaten-Limit n für den IVFFlat-Sweep")
+    args = parser.parse_args()
+
+    run_benchmark(
+        method=args.method,
+        n_queries=args.queries,
+        k=args.k,
+        build=args.build,
+        lists=args.lists,
+        m=args.m,
+        ef_construction=args.ef_construction,
+        candidate_limit=args.candidates,
+    )
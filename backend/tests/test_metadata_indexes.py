@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not os.getenv("DATABASE_URL"), reason="DATABASE_URL not set")
+
+
+@pytest.fixture(scope="module")
+def conn():
+    psycopg2 = pytest.importorskip("psycopg2")
+    connection = psycopg2.connect(os.getenv("DATABASE_URL"))
+    yield connection
+    connection.close()
+
+
+@pytest.mark.parametrize("index_name", ["studyverse_data_semester_idx", "studyverse_data_tag_idx", "studyverse_data_ects_idx"])
+def test_metadata_predicate_uses_expression_index(conn, index_name):
+    from data_ingestion.metadata_indexes import SAMPLE_FILTERS, explain_metadata_filter
+
+    plan = "\n".join(explain_metadata_filter(conn, SAMPLE_FILTERS[index_name]))
+
+    assert "Seq Scan" not in plan
+    assert "Index Scan" in plan or "Bitmap Index Scan" in plan
+    assert index_name in plan
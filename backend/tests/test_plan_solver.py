@@ -0,0 +1,161 @@
+import pytest
+
+from backend.app.llm_connection.plan_solver import PlanSolver
+
+
+def lva(name, lva_type, ects, day, time, similarity=0.5):
+    return {
+        "metadata": {
+            "lva_name": name,
+            "lva_type": lva_type,
+            "ects": ects,
+            "tag": day,
+            "uhrzeit": time,
+            "lva_leiter": "Dozent",
+        },
+        "similarity": similarity,
+    }
+
+
+class FakeLvaIndex:
+    """Name → id, genug für STEOP/Wunsch-LVAs/idealtypischen Plan."""
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def resolve_many(self, terms):
+        return {self.ids[term] for term in terms if term in self.ids}
+
+    def resolve_document(self, name, lva_type, lva_nr):
+        return {self.ids[name]} if name in self.ids else set()
+
+
+class FakeCatalog:
+    def __init__(self, ids, semesters=None):
+        self.lva_index = FakeLvaIndex(ids)
+        self._semesters = semesters or {}
+
+    def ideal_semesters(self):
+        return self._semesters
+
+
+@pytest.fixture
+def solver(monkeypatch):
+    def unavailable():
+        raise RuntimeError("no catalog in tests")
+
+    monkeypatch.setattr(PlanSolver, "_catalog", staticmethod(unavailable))
+    return PlanSolver()
+
+
+def planned(result):
+    return sorted((item.name, item.type) for unit in result.units for item in unit.items)
+
+
+def test_vl_and_ue_are_planned_together(solver):
+    result = solver.solve(
+        [lva("Statistik", "VL", "3,00", "Mo.", "10:15-11:45"), lva("Statistik", "UE", "1,5", "Di.", "12:00-13:30")],
+        ects_target=10,
+    )
+    assert planned(result) == [("Statistik", "UE"), ("Statistik", "VL")]
+    assert result.total_ects == 4.5
+
+
+def test_course_is_dropped_when_partner_is_on_another_day(solver):
+    result = solver.solve(
+        [lva("Statistik", "VL", "3", "Mo.", "10:15-11:45"), lva("Statistik", "UE", "1.5", "Fr.", "10:15-11:45")],
+        ects_target=10,
+        preferred_days=["Mo.", "Di."],
+    )
+    assert planned(result) == []
+    assert any("Statistik" in warning for warning in result.warnings)
+
+
+def test_course_is_dropped_when_partner_has_unknown_ects(solver):
+    result = solver.solve(
+        [lva("Statistik", "VL", "3", "Mo.", "10:15-11:45"), lva("Statistik", "UE", None, "Di.", "10:15-11:45")],
+        ects_target=10,
+    )
+    assert planned(result) == []
+
+
+def test_filtered_group_does_not_block_a_later_matching_group(solver):
+    result = solver.solve(
+        [
+            lva("Statistik", "VL", "3", "Mo.", "10:15-11:45"),
+            lva("Statistik", "UE", "1.5", "Fr.", "10:15-11:45"),
+            lva("Statistik", "UE", "1.5", "Di.", "10:15-11:45"),
+        ],
+        ects_target=10,
+        preferred_days=["Mo.", "Di."],
+    )
+    assert planned(result) == [("Statistik", "UE"), ("Statistik", "VL")]
+    assert [item.day for unit in result.units for item in unit.items] == ["Mo.", "Di."]
+
+
+def test_preferred_days_filter_single_lvas(solver):
+    result = solver.solve(
+        [lva("BWL", "KS", "3", "Mo.", "08:30-10:00"), lva("Recht", "KS", "3", "Fr.", "08:30-10:00")],
+        ects_target=10,
+        preferred_days=["Mo."],
+    )
+    assert planned(result) == [("BWL", "KS")]
+
+
+def test_time_conflicts_are_never_planned(solver):
+    result = solver.solve(
+        [
+            lva("BWL", "KS", "6", "Mo.", "10:30-12:00"),
+            lva("Algorithmen", "VL", "3", "Mo.", "10:15-11:45"),
+            lva("Algorithmen", "UE", "3", "Di.", "10:15-11:45"),
+        ],
+        ects_target=20,
+    )
+    slots = [item.slot for unit in result.units for item in unit.items]
+    assert all(not a.overlaps(b) for i, a in enumerate(slots) for b in slots[i + 1:])
+    assert result.total_ects == 6
+
+
+def test_ects_target_is_a_hard_cap(solver):
+    lvas = [lva(f"Kurs {i}", "KS", "4.5", day, "08:30-10:00") for i, day in enumerate(["Mo.", "Di.", "Mi.", "Do."])]
+    lvas.append(lva("Projekt", "PR", "20", "Fr.", "08:30-10:00"))
+    result = solver.solve(lvas, ects_target=10)
+    assert result.total_ects == 9
+    assert result.total_ects <= 10
+    assert result.optimal
+    assert any("Projekt" in warning for warning in result.warnings)
+
+
+def test_duplicates_are_planned_once(solver):
+    result = solver.solve(
+        [lva("BWL", "KS", "3", "Mo.", "08:30-10:00"), lva("BWL", "KS", "3", "Mo.", "08:30-10:00")],
+        ects_target=10,
+    )
+    assert planned(result) == [("BWL", "KS")]
+    assert result.total_ects == 3
+
+
+def test_steop_and_desired_lvas_win_over_more_ects(monkeypatch):
+    catalog = FakeCatalog({"Grundlagen der BWL": 1, "Statistik": 2, "Wahlfach": 3}, semesters={2: 3})
+    monkeypatch.setattr(PlanSolver, "_catalog", staticmethod(lambda: catalog))
+    result = PlanSolver().solve(
+        [
+            lva("Wahlfach", "KS", "6", "Mo.", "08:30-10:00"),
+            lva("Grundlagen der BWL", "KS", "3", "Di.", "08:30-10:00"),
+            lva("Statistik", "KS", "3", "Mi.", "08:30-10:00"),
+        ],
+        ects_target=6,
+        desired_lvas=["Statistik"],
+    )
+    assert planned(result) == [("Grundlagen der BWL", "KS"), ("Statistik", "KS")]
+    reasons = {unit.name: unit.reasons for unit in result.units}
+    assert any("STEOP" in reason for reason in reasons["Grundlagen der BWL"])
+    assert "explizit gewünscht" in reasons["Statistik"]
+
+
+def test_to_plan_json_matches_llm_plan_schema(solver):
+    plan = solver.solve([lva("BWL", "KS", "3", "Mo.", "08:30-10:00")], ects_target=10).to_plan_json("WS25")
+    assert set(plan) == {"semester", "total_ects", "uni_days", "lvas", "summary", "warnings"}
+    assert plan["semester"] == "WS25"
+    assert plan["uni_days"] == ["Mo."]
+    assert set(plan["lvas"][0]) == {"name", "type", "ects", "day", "time", "instructor", "reason"}
@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from backend.app.llm_connection.prefix_cache import LocalPrefixBackend, PrefixCache, make_backend
+from backend.app.llm_connection.semester_planner import SemesterPlanner
+
+PREFIX = "Planning-Kontext: LVA-Liste, idealtypischer Plan, Regeln\n"
+
+
+class FakeModel:
+    """Wie GenerativeModel: merkt sich die gesendeten Prompts."""
+
+    model_name = "models/fake"
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, contents, **kwargs):
+        self.prompts.append(contents)
+        return SimpleNamespace(text=f"Antwort ({len(self.prompts)})")
+
+
+class ExpiredModel:
+    """Prefix-Modell, dessen CachedContent serverseitig schon gelöscht ist."""
+
+    def generate_content(self, contents, **kwargs):
+        raise google_exceptions.NotFound("CachedContent not found")
+
+
+class ExpiredBackend(LocalPrefixBackend):
+    def model_for(self, handle, base_model):
+        return ExpiredModel()
+
+
+class NoopScheduler:
+    def acquire(self, priority):
+        pass
+
+
+@pytest.fixture
+def local_cache():
+    return PrefixCache(LocalPrefixBackend(), min_tokens=1)
+
+
+def test_local_backend_sends_prefix_once_registered(local_cache):
+    base = FakeModel()
+    model = local_cache.model_for(PREFIX, base)
+    model.generate_content("Frage 1")
+    local_cache.model_for(PREFIX, base).generate_content("Frage 2")
+
+    assert base.prompts == [PREFIX + "Frage 1", PREFIX + "Frage 2"]
+    stats = local_cache.stats()
+    assert stats["backend"] == "local"
+    assert stats["registrations"] == 1
+    assert stats["hits"] == 1
+    assert stats["tokens_saved"] > 0
+
+
+def test_short_prefix_is_not_registered():
+    cache = PrefixCache(LocalPrefixBackend(), min_tokens=10_000)
+    assert cache.model_for(PREFIX, FakeModel()) is None
+    assert cache.stats()["skipped"] == 1
+    assert cache.stats()["registrations"] == 0
+
+
+def test_invalidate_registers_again(local_cache):
+    base = FakeModel()
+    local_cache.model_for(PREFIX, base)
+    local_cache.invalidate(PREFIX)
+    assert local_cache.stats()["size"] == 0
+
+    local_cache.model_for(PREFIX, base)
+    assert local_cache.stats()["registrations"] == 2
+
+
+def test_off_backend_sends_full_prompt():
+    cache = PrefixCache(make_backend("off"), min_tokens=1)
+    assert cache.model_for(PREFIX, FakeModel()) is None
+    assert cache.stats()["backend"] == "off"
+
+
+def test_not_found_invalidates_prefix_and_retries_with_full_prompt():
+    planner = SemesterPlanner.__new__(SemesterPlanner)
+    planner.model = FakeModel()
+    planner.scheduler = NoopScheduler()
+    planner.prefix_cache = PrefixCache(ExpiredBackend(), min_tokens=1)
+
+    context = "LVA-Liste"
+    prompt = planner._build_planning_prompt("Welche LVAs am Montag?", context)
+    answer = planner._chat_generate("Welche LVAs am Montag?", context, prompt)
+
+    assert answer == "Antwort (1)"
+    assert planner.model.prompts == [prompt]
+    assert planner.prefix_cache.stats()["size"] == 0
+
+
+def test_not_found_during_stream_retries_with_full_prompt():
+    planner = SemesterPlanner.__new__(SemesterPlanner)
+    planner.model = FakeModel()
+    planner.scheduler = NoopScheduler()
+    planner.prefix_cache = PrefixCache(ExpiredBackend(), min_tokens=1)
+    planner.model.generate_content = lambda contents, **kwargs: iter([SimpleNamespace(text=contents[-6:])])
+
+    context = "LVA-Liste"
+    prompt = planner._build_planning_prompt("Frage?", context)
+    chunks = list(planner._chat_stream("Frage?", context, prompt))
+
+    assert chunks == [prompt[-6:]]
+    assert planner.prefix_cache.stats()["size"] == 0
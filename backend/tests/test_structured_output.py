@@ -0,0 +1,71 @@
+import json
+
+from backend.app.llm_connection.structured_output import (
+    PLAN_REJECTED_REPAIRS,
+    PLAN_RESPONSE_SCHEMA,
+    parse_json_response,
+)
+
+
+def plan_lva(**overrides):
+    lva = {
+        "name": "Datenmodellierung",
+        "type": "VL",
+        "ects": 3,
+        "day": "Mo.",
+        "time": "08:30 - 10:00",
+        "instructor": "Dozent",
+        "reason": "Pflichtfach",
+    }
+    lva.update(overrides)
+    return lva
+
+
+def plan(lvas):
+    return {
+        "semester": "WS25",
+        "total_ects": sum(lva["ects"] for lva in lvas),
+        "uni_days": ["Mo."],
+        "lvas": lvas,
+        "summary": "",
+        "warnings": "",
+    }
+
+
+def test_code_fence_is_repaired():
+    text = "```json\n" + json.dumps(plan([plan_lva()])) + "\n```"
+    result = parse_json_response(text, PLAN_RESPONSE_SCHEMA, reject=PLAN_REJECTED_REPAIRS)
+    assert result.ok
+    assert result.repairs == ["code_fence"]
+
+
+def test_truncated_plan_is_rejected():
+    text = json.dumps(plan([plan_lva(), plan_lva(name="Statistik")]))
+    result = parse_json_response(text[:-40], PLAN_RESPONSE_SCHEMA, reject=PLAN_REJECTED_REPAIRS)
+    assert not result.ok
+    assert "truncated" in result.repairs
+    assert "truncated" in result.error
+
+
+def test_truncated_response_is_repaired_without_reject():
+    text = json.dumps(plan([plan_lva()]))
+    result = parse_json_response(text[:-1], PLAN_RESPONSE_SCHEMA)
+    assert result.ok
+    assert "truncated" in result.repairs
+
+
+def test_lva_without_day_is_rejected():
+    lva = plan_lva()
+    del lva["day"]
+    result = parse_json_response(json.dumps(plan([lva])), PLAN_RESPONSE_SCHEMA, reject=PLAN_REJECTED_REPAIRS)
+    assert not result.ok
+    assert "missing_item_field" in result.repairs
+
+
+def test_missing_top_level_field_is_filled():
+    data = plan([plan_lva()])
+    del data["warnings"]
+    result = parse_json_response(json.dumps(data), PLAN_RESPONSE_SCHEMA, reject=PLAN_REJECTED_REPAIRS)
+    assert result.ok
+    assert result.data["warnings"] == ""
+    assert result.repairs == ["missing_field"]
@@ -0,0 +1,94 @@
+"""
+ETL-Schritt: Voraussetzungen aller LVAs in die Tabelle lva_prerequisites kompilieren.
+
+Das Freitext-Feld 'anmeldevoraussetzungen' (studyverse_data.metadata) wird hier EINMAL
+geparst (Codes wie SOFT1, "VL ..."-Namen, KNOWN_PREREQUISITES als Fallback) und auf
+lvas.id aufgelöst. Zur Laufzeit prüft der Retriever nur noch Set-Mitgliedschaft.
+
+Läuft am Ende von run_etl_pipeline(), kann aber auch einzeln gestartet werden
+(vom Repo-Root):
+    python -m data_ingestion.build_prerequisite_graph
+"""
+
+import os
+import psycopg2
+import psycopg2.extras
+from dotenv import load_dotenv
+from backend.app.retrieval.lva_index import LVAS_QUERY
+from backend.app.retrieval.prerequisite_graph import compile_prerequisite_edges
+
+load_dotenv()
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS lva_prerequisites (
+        lva_name TEXT NOT NULL,
+        lva_type TEXT NOT NULL DEFAULT '',
+        required_lva_id INTEGER NOT NULL REFERENCES lvas(id) ON DELETE CASCADE,
+        source TEXT NOT NULL,
+        PRIMARY KEY (lva_name, lva_type, required_lva_id)
+    );
+"""
+
+DOCUMENTS_QUERY = """
+    SELECT DISTINCT
+        metadata->>'lva_name',
+        COALESCE(metadata->>'lva_type', ''),
+        metadata->>'anmeldevoraussetzungen'
+    FROM studyverse_data
+    WHERE jsonb_typeof(metadata) = 'object'
+      AND metadata->>'lva_name' IS NOT NULL
+"""
+
+
+def build_prerequisite_graph(conn) -> int:
+    """
+    Kompiliert den Graph neu und ersetzt den Tabelleninhalt in einer Transaktion.
+
+    Returns:
+        Anzahl gespeicherter Kanten
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(CREATE_TABLE_SQL)
+        cur.execute(LVAS_QUERY)
+        lva_rows = cur.fetchall()
+        cur.execute(DOCUMENTS_QUERY)
+        documents = cur.fetchall()
+
+        edges, unresolved = compile_prerequisite_edges(lva_rows, documents)
+
+        cur.execute("DELETE FROM lva_prerequisites;")
+        psycopg2.extras.execute_values(
+            cur,
+            "INSERT INTO lva_prerequisites (lva_name, lva_type, required_lva_id, source) VALUES %s",
+            edges,
+        )
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"PostgreSQL Fehler beim Kompilieren der Voraussetzungen: {e}")
+        raise
+    finally:
+        cur.close()
+
+    lva_count = len({(name, lva_type) for name, lva_type, _, _ in edges})
+    print(f"--> Voraussetzungs-Graph: {len(edges)} Kanten für {lva_count} LVAs gespeichert.")
+
+    # Nicht auflösbare Namen/Codes ausgeben, damit LVA_ALIASES / KNOWN_PREREQUISITES gepflegt werden können
+    for (lva_name, lva_type), terms in sorted(unresolved.items()):
+        print(f"    [WARNUNG] {lva_type} {lva_name}: nicht aufgelöst {sorted(set(terms))}")
+
+    return len(edges)
+
+
+if __name__ == "__main__":
+    neon_db_url = os.getenv("DATABASE_URL")
+    if not neon_db_url:
+        print("ERROR: DATABASE_URL nicht gesetzt!")
+        exit(1)
+
+    connection = psycopg2.connect(neon_db_url)
+    try:
+        build_prerequisite_graph(connection)
+    finally:
+        connection.close()
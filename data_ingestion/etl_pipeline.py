@@ -10,6 +10,7 @@ import psycopg2.extras
 import json
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 import data_ingestion.extractor as extractor
+from data_ingestion.build_prerequisite_graph import build_prerequisite_graph
 
 
 load_dotenv()
@@ -165,6 +166,13 @@ def run_etl_pipeline():
         subject_chunks = processor.process_sm_html(subject_html, model)
         store_html_chunks(conn=conn, chunks=subject_chunks, url=url)
 
+    ### PREREQUISITE GRAPH (eigene Verbindung: DELETE + INSERT in einer Transaktion)
+    graph_conn = psycopg2.connect(neon_db_url)
+    try:
+        build_prerequisite_graph(graph_conn)
+    finally:
+        graph_conn.close()
+
     print("\n--> ETL-PIPELINE beendet! <--")
 
 
@@ -64,15 +64,10 @@ try:
     """)
     print("   [OK] Neue Tabelle erstellt mit VECTOR(768)")
 
-    # Create index for vector similarity search
-    print("4. Index fuer Vektor-Suche erstellen...")
-    cur.execute("""
-        CREATE INDEX IF NOT EXISTS studyverse_data_embedding_idx
-        ON studyverse_data
-        USING ivfflat (embedding vector_cosine_ops)
-        WITH (lists = 100);
-    """)
-    print("   [OK] Index erstellt")
+    # Kein Vektor-Index per Default: der Retriever scannt exakt (bester Chunk pro LVA),
+    # ein Index wird erst mit VECTOR_CANDIDATE_LIMIT > 0 genutzt. Dann nach der ETL:
+    #   python -m data_ingestion.vector_index hnsw
+    print("4. Kein Vektor-Index angelegt (exakter Scan, siehe data_ingestion/vector_index.py)")
 
     conn.commit()
     print("\n[ERFOLG] Datenbank wurde auf 768 Dimensionen angepasst.")
@@ -0,0 +1,128 @@
+"""
+Migration: Expression-Indizes für die JSONB-Metadaten, die der Metadata-Filter nutzt.
+
+HybridRetriever._build_metadata_sql_filter erzeugt Prädikate auf
+- metadata->>'semester'  (= / IN / OR)
+- metadata->>'tag'       (IN)
+- metadata->>'ects'      (<= / >=, numerisch)
+
+Für semester/tag reicht ein B-Tree auf dem Text-Ausdruck. Für ects wird ein
+typisierter Ausdruck über studyverse_to_numeric() indiziert (IMMUTABLE, NULL bei
+ungültigen Werten), damit der Planner einen Range-Scan statt eines Text-Casts pro Zeile nutzt.
+
+Aufruf (vom Repo-Root):
+    python -m data_ingestion.metadata_indexes            -> Migration + EXPLAIN-Check
+    python -m data_ingestion.metadata_indexes --explain  -> nur EXPLAIN-Check
+    DATABASE_URL=... python -m pytest backend/tests/test_metadata_indexes.py  -> EXPLAIN-Check als Test
+"""
+
+import argparse
+import os
+from typing import Any, Dict, List
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+METADATA_INDEX_DDL = [
+    r"""
+    CREATE OR REPLACE FUNCTION studyverse_to_numeric(value TEXT)
+    RETURNS NUMERIC
+    LANGUAGE sql
+    IMMUTABLE
+    PARALLEL SAFE
+    AS $$
+        SELECT CASE
+            WHEN replace(trim(value), ',', '.') ~ '^-?[0-9]+(\.[0-9]+)?$'
+                THEN replace(trim(value), ',', '.')::numeric
+        END
+    $$;
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS studyverse_data_semester_idx
+    ON studyverse_data ((metadata->>'semester'));
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS studyverse_data_tag_idx
+    ON studyverse_data ((metadata->>'tag'));
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS studyverse_data_ects_idx
+    ON studyverse_data (studyverse_to_numeric(metadata->>'ects'));
+    """,
+    "ANALYZE studyverse_data;",
+]
+
+# Teil-Filter aus build_metadata_filter() ("30 ECTS im SS26, an Mo., Di.") pro Index
+# (einzeln geprüft: bei kombinierten Filtern darf der Planner auch nur einen Index wählen)
+SAMPLE_FILTERS = {
+    "studyverse_data_semester_idx": {"$or": [{"semester": {"$eq": "SS"}}, {"semester": {"$eq": "SS+"}}]},
+    "studyverse_data_tag_idx": {"tag": {"$in": ["Mo.", "Di."]}},
+    "studyverse_data_ects_idx": {"ects": {"$lte": 30}},
+}
+
+
+def create_metadata_indexes(conn) -> None:
+    cur = conn.cursor()
+    for statement in METADATA_INDEX_DDL:
+        cur.execute(statement)
+    cur.close()
+    conn.commit()
+    print("   [OK] Expression-Indizes für semester, tag und ects erstellt")
+
+
+def explain_metadata_filter(conn, filter_dict: Dict[str, Any]) -> List[str]:
+    """
+    EXPLAIN für die WHERE-Clause, die der Retriever aus filter_dict erzeugt.
+    Sequential Scans werden für diese Transaktion deaktiviert: auf der kleinen Tabelle
+    würde der Planner sonst oft einen Seq Scan wählen, geprüft wird hier, ob die
+    Prädikate die Indizes überhaupt treffen können.
+    """
+    from backend.app.retrieval.hybrid_retriever import HybridRetriever
+
+    where_clause, params = HybridRetriever._build_metadata_sql_filter(filter_dict)
+    cur = conn.cursor()
+    cur.execute("SET LOCAL enable_seqscan = off;")
+    cur.execute(f"EXPLAIN SELECT id FROM studyverse_data WHERE {where_clause}", params)
+    plan = [row[0] for row in cur.fetchall()]
+    cur.close()
+    conn.rollback()
+    return plan
+
+
+def check_metadata_filter_plans(conn) -> bool:
+    """Gibt die Pläne aus und prüft, dass jedes Prädikat seinen Expression-Index verwendet."""
+    ok = True
+    for index_name, filter_dict in SAMPLE_FILTERS.items():
+        plan = explain_metadata_filter(conn, filter_dict)
+        print(f"\n--- {filter_dict} ---")
+        print("\n".join(plan))
+
+        if index_name not in "\n".join(plan):
+            print(f"[FEHLER] {index_name} wird nicht verwendet")
+            ok = False
+
+    if ok:
+        print("\n[OK] Alle Metadaten-Prädikate nutzen ihre Expression-Indizes")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Expression-Indizes für studyverse_data.metadata")
+    parser.add_argument("--explain", action="store_true", help="nur EXPLAIN-Check, keine Migration")
+    args = parser.parse_args()
+
+    neon_db_url = os.getenv("DATABASE_URL")
+    if not neon_db_url:
+        print("ERROR: DATABASE_URL nicht gesetzt!")
+        exit(1)
+
+    connection = psycopg2.connect(neon_db_url)
+    try:
+        if not args.explain:
+            create_metadata_indexes(connection)
+        ok = check_metadata_filter_plans(connection)
+    finally:
+        connection.close()
+
+    exit(0 if ok else 1)
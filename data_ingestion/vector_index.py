@@ -0,0 +1,126 @@
+"""
+Vektor-Index für studyverse_data.embedding anlegen (HNSW oder IVFFlat).
+
+- HNSW: kann auch auf einer leeren Tabelle angelegt werden, gute Recall/Latenz-Balance,
+        Suche über hnsw.ef_search steuerbar
+- IVFFlat: Listen werden beim Anlegen aus den vorhandenen Daten trainiert -> erst NACH
+           der ETL-Pipeline anlegen, Suche über ivfflat.probes steuerbar
+
+Aufruf (vom Repo-Root):
+    python -m data_ingestion.vector_index hnsw --m 16 --ef-construction 64
+    python -m data_ingestion.vector_index ivfflat --lists 50
+"""
+
+import argparse
+import math
+import os
+from typing import Optional
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TABLE_NAME = "studyverse_data"
+INDEX_NAMES = {
+    "hnsw": "studyverse_data_embedding_hnsw_idx",
+    "ivfflat": "studyverse_data_embedding_ivfflat_idx",
+}
+# Index aus älteren Versionen von fix_vector_dimension.py (ivfflat, lists = 100 auf leerer Tabelle)
+LEGACY_INDEX_NAME = "studyverse_data_embedding_idx"
+
+
+def default_ivfflat_lists(row_count: int) -> int:
+    """pgvector-Empfehlung: rows / 1000 bis 1M Zeilen, mindestens 1."""
+    if row_count <= 1_000_000:
+        return max(1, row_count // 1000)
+    return max(1, int(math.sqrt(row_count)))
+
+
+def drop_vector_indexes(conn) -> None:
+    """Entfernt alle bekannten Vektor-Indizes auf studyverse_data."""
+    cur = conn.cursor()
+    for index_name in [LEGACY_INDEX_NAME, *INDEX_NAMES.values()]:
+        cur.execute(f"DROP INDEX IF EXISTS {index_name};")
+    cur.close()
+
+
+def create_vector_index(
+    conn,
+    method: str = "hnsw",
+    m: int = 16,
+    ef_construction: int = 64,
+    lists: Optional[int] = None,
+    replace: bool = True,
+) -> str:
+    """
+    Legt einen HNSW- oder IVFFlat-Index (cosine distance) auf studyverse_data.embedding an.
+
+    Args:
+        conn: psycopg2 Verbindung
+        method: "hnsw" oder "ivfflat"
+        m, ef_construction: HNSW Build-Parameter
+        lists: IVFFlat Listen (None = aus Zeilenanzahl berechnet)
+        replace: vorhandene Vektor-Indizes vorher löschen
+
+    Returns:
+        Name des angelegten Index
+    """
+    if method not in INDEX_NAMES:
+        raise ValueError(f"Unknown index method '{method}', expected one of {list(INDEX_NAMES)}")
+
+    index_name = INDEX_NAMES[method]
+    cur = conn.cursor()
+
+    if replace:
+        drop_vector_indexes(conn)
+
+    if method == "hnsw":
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS {index_name}
+            ON {TABLE_NAME}
+            USING hnsw (embedding vector_cosine_ops)
+            WITH (m = %s, ef_construction = %s);
+        """, [m, ef_construction])
+        print(f"   [OK] HNSW Index erstellt (m = {m}, ef_construction = {ef_construction})")
+    else:
+        if lists is None:
+            cur.execute(f"SELECT COUNT(*) FROM {TABLE_NAME} WHERE embedding IS NOT NULL;")
+            lists = default_ivfflat_lists(cur.fetchone()[0])
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS {index_name}
+            ON {TABLE_NAME}
+            USING ivfflat (embedding vector_cosine_ops)
+            WITH (lists = %s);
+        """, [lists])
+        print(f"   [OK] IVFFlat Index erstellt (lists = {lists})")
+
+    cur.execute(f"ANALYZE {TABLE_NAME};")
+    cur.close()
+    conn.commit()
+    return index_name
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vektor-Index für studyverse_data anlegen")
+    parser.add_argument("method", choices=sorted(INDEX_NAMES))
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--lists", type=int, default=None)
+    args = parser.parse_args()
+
+    neon_db_url = os.getenv("DATABASE_URL")
+    if not neon_db_url:
+        print("ERROR: DATABASE_URL nicht gesetzt!")
+        exit(1)
+
+    connection = psycopg2.connect(neon_db_url)
+    try:
+        create_vector_index(
+            connection,
+            method=args.method,
+            m=args.m,
+            ef_construction=args.ef_construction,
+            lists=args.lists,
+        )
+    finally:
+        connection.close()